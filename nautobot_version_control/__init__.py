@@ -1,5 +1,9 @@
 """Plugin declaration for nautobot_version_control."""
 # Metadata is inherited from Nautobot. If not including Nautobot in the environment, this should be added
+from types import MappingProxyType
+
+from django.apps import apps
+from django.core.signals import request_finished, setting_changed
 from django.db.models.signals import pre_migrate, post_migrate
 import django_tables2
 from nautobot.extras.plugins import PluginConfig
@@ -31,6 +35,59 @@ class NautobotVersionControl(PluginConfig):
         ],
         "SESSION_ENGINE": "django.contrib.sessions.backends.signed_cookies",
         "CACHEOPS_ENABLED": False,
+        # diffs between two commit hashes never change, they are cached in
+        # the `diff_cache_alias` cache and the oldest entries are evicted first.
+        # set `diff_cache_max_entries` to 0 to disable the diff cache.
+        "diff_cache_alias": "default",
+        "diff_cache_max_entries": 256,
+        "diff_cache_timeout": 60 * 60 * 24,
+        # number of diff rows fetched per query when streaming large diffs.
+        "diff_chunk_size": 1000,
+        # generate the diff tables of all registered models at startup.
+        "warm_diff_tables": True,
+        # answer merge base and ahead/behind questions from an
+        # in-process index of the commit graph, rather than Dolt.
+        "commit_graph_index": True,
+        # "time-travel" database aliases used to query past commits, the
+        # least-recently-used and idle aliases are closed and unregistered.
+        "time_travel_max_aliases": 32,
+        "time_travel_idle_timeout": 5 * 60,
+        # "checkout" runs `dolt_checkout` on the default connection for every
+        # request. "alias" routes versioned models to a "nautobot/<branch>"
+        # database alias instead, at most `branch_max_aliases` at once.
+        "branch_routing": "checkout",
+        "branch_max_aliases": 16,
+        # build merge candidates, and count their conflicts, in a background
+        # task whenever the head of a pull request's branch changes. a task
+        # is no longer considered in flight after `merge_candidate_task_timeout`.
+        # requires a celery worker, conflicts are counted when viewed otherwise.
+        "merge_candidate_background": False,
+        "merge_candidate_task_timeout": 10 * 60,
+        # count conflicts by merging in a transaction that is rolled back,
+        # rather than on a merge candidate branch, where the server allows it.
+        "merge_preview": True,
+        # number of row-level conflicts fetched per query, and shown per page.
+        "conflict_chunk_size": 100,
+        # merge candidate branches are deleted by the `collect_merge_candidates`
+        # command or job once they are past `merge_candidate_max_count`, or
+        # `merge_candidate_max_age` seconds, or their pull request is closed.
+        # candidates built less than `merge_candidate_gc_grace_period` seconds
+        # ago, or partly resolved with their pull request open, are kept.
+        "merge_candidate_max_count": 50,
+        "merge_candidate_max_age": 7 * 24 * 60 * 60,
+        "merge_candidate_gc_batch_size": 100,
+        "merge_candidate_gc_grace_period": 60 * 60,
+        # merge pull requests in a background task, one at a time in the order
+        # they were enqueued, rather than in the request. up to
+        # `merge_queue_batch_size` pull requests into the same branch are
+        # merged with a single merge commit. a worker is no longer considered
+        # to process the queue after `merge_queue_lock_timeout`. requires a
+        # celery worker, pull requests are merged in the request otherwise.
+        "merge_queue": False,
+        "merge_queue_batch_size": 1,
+        "merge_queue_lock_timeout": 10 * 60,
+        # the directory of the Dolt database, used to measure reclaimed storage.
+        "dolt_data_dir": None,
     }
     middleware = [
         "nautobot_version_control.middleware.dolt_health_check_intercept_middleware",
@@ -48,6 +105,38 @@ class NautobotVersionControl(PluginConfig):
         # make a Dolt commit to save database migrations.
         post_migrate.connect(auto_dolt_commit_migration, sender=self)
 
+        # the router looks up whether each queried model is versioned.
+        compile_versioned_models()
+
+        # pylint: disable=import-outside-toplevel,unused-import
+        from nautobot_version_control.catalogue import catalogue
+        from nautobot_version_control.time_travel import branch_connections, time_travel
+        from nautobot_version_control.utils import get_plugin_setting, load_branch_routing
+
+        # the router reads the `branch_routing` mode on every query, read it once.
+        load_branch_routing()
+        setting_changed.connect(load_branch_routing, dispatch_uid="nautobot_version_control.branch_routing")
+
+        for pool in (time_travel, branch_connections):
+            uid = f"nautobot_version_control.{type(pool).__name__}"
+            # the alias pools read their settings once, as branch aliases are looked up on every query.
+            setting_changed.connect(pool.load_settings, dispatch_uid=uid)
+            # close this thread's connections to evicted "time-travel" and branch aliases.
+            request_finished.connect(pool.close_evicted, dispatch_uid=uid)
+
+        # migrations may add or remove models from the catalogue.
+        post_migrate.connect(catalogue.invalidate, dispatch_uid="nautobot_version_control.catalogue")
+
+        if get_plugin_setting("warm_diff_tables"):
+            # importing `diffs` registers the default diff tables
+            from nautobot_version_control import diffs  # noqa: F401
+            from nautobot_version_control.dynamic.diff_factory import warm_diff_table_models
+
+            warm_diff_table_models()
+
+        # build the catalogue of models, unless warming the diff tables did
+        catalogue.entries()
+
 
 config = NautobotVersionControl  # pylint: disable=C0103
 
@@ -137,13 +226,31 @@ __VERSIONED_MODEL_REGISTRY___ = {
 }
 
 
+# `__VERSIONED_MODEL_REGISTRY___` compiled to a lookup of model class to
+# whether it is versioned, by `compile_versioned_models`.
+__VERSIONED_MODEL_LOOKUP__ = MappingProxyType({})
+
+
 def is_versioned_model(model):
     """
     Determines whether a model's is under version control.
     See __MODELS_UNDER_VERSION_CONTROL__ for more info.
     """
-    registry = __VERSIONED_MODEL_REGISTRY___
-    return bool(query_registry(model, registry))
+    try:
+        return __VERSIONED_MODEL_LOOKUP__[model]
+    except KeyError:
+        # models created after the registry was compiled
+        return bool(query_registry(model, __VERSIONED_MODEL_REGISTRY___))
+
+
+def compile_versioned_models():
+    """Compiles `__VERSIONED_MODEL_REGISTRY___` into a lookup of every installed model class."""
+    global __VERSIONED_MODEL_LOOKUP__  # pylint: disable=global-statement
+    lookup = {
+        model: bool(query_registry(model, __VERSIONED_MODEL_REGISTRY___))
+        for model in apps.get_models(include_auto_created=True)
+    }
+    __VERSIONED_MODEL_LOOKUP__ = MappingProxyType(lookup)
 
 
 def register_versioned_models(registry):
@@ -180,6 +287,9 @@ def register_versioned_models(registry):
                 # inner_val must be bool
                 raise err
     __VERSIONED_MODEL_REGISTRY___.update(registry)
+    if apps.models_ready:
+        compile_versioned_models()
+    _invalidate_catalogue()
 
 
 __DIFF_TABLE_REGISTRY__ = {}
@@ -225,6 +335,14 @@ def register_diff_tables(registry):
                 # inner_val must be Table
                 raise err
     __DIFF_TABLE_REGISTRY__.update(registry)
+    _invalidate_catalogue()
+
+
+def _invalidate_catalogue():
+    """Drops the catalogue of models after a registry changed."""
+    from nautobot_version_control.catalogue import catalogue  # pylint: disable=import-outside-toplevel
+
+    catalogue.invalidate()
 
 
 __GLOBAL_ROUTER_SWITCH__ = True
@@ -6,6 +6,8 @@ from nautobot_version_control.models import Branch, Commit, PullRequest, PullReq
 class BranchSerializer(serializers.ModelSerializer):
     """BranchSerializer serializes a Branch."""
 
+    diff_stats = serializers.ReadOnlyField()
+
     class Meta:
         """Set Meta Data for BranchSerializer, will serialize all fields."""
 
@@ -26,6 +28,8 @@ class CommitSerializer(serializers.ModelSerializer):
 class PullRequestSerializer(serializers.ModelSerializer):
     """PullRequestSerializer serializes a PullRequest."""
 
+    diff_stats = serializers.ReadOnlyField()
+
     class Meta:
         """Set Meta Data for PullRequestSerializer, will serialize all fields."""
 
@@ -1,5 +1,6 @@
 """API urls for version_control app."""
 
+from django.urls import path
 from nautobot.core.api.routers import OrderedDefaultRouter
 from . import views
 
@@ -14,4 +15,8 @@ router.register("pull_requests", views.PullRequestViewSet)
 router.register("pull_requests_reviews", views.PullRequestReviewViewSet)
 
 app_name = "nautobot_version_control-api"
-urlpatterns = router.urls
+urlpatterns = [
+    path("diffs/", views.DiffView.as_view(), name="diff"),
+    path("conflicts/", views.ConflictView.as_view(), name="conflict"),
+]
+urlpatterns += router.urls
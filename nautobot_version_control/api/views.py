@@ -1,10 +1,24 @@
 """Django views for Nautobot Version Control."""
 
+import base64
+import binascii
+import itertools
+import json
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 from rest_framework.routers import APIRootView
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.views import APIView
+from nautobot.core.utils.permissions import get_permission_for_model
 from nautobot.extras.api.views import CustomFieldModelViewSet
 
-from nautobot_version_control import filters
+from nautobot_version_control import diffs, filters, merge, resolution
 from nautobot_version_control.models import Branch, Commit, PullRequest, PullRequestReview
+from nautobot_version_control.utils import DoltError, get_plugin_setting, is_commit_hash
 
 from . import serializers
 
@@ -67,3 +81,270 @@ class PullRequestReviewViewSet(CustomFieldModelViewSet):  # pylint: disable=too-
     queryset = PullRequestReview.objects.all()
     serializer_class = serializers.PullRequestReviewSerializer
     filterset_class = filters.PullRequestReviewFilterSet
+
+
+#
+# Diffs
+#
+
+
+class DiffView(APIView):
+    """
+    DiffView returns the rows changed between two commits or branches.
+
+    Query parameters:
+        from_commit, to_commit: the commit hashes or branch names to diff.
+        table: optionally limits the diff to one table, as "<app_label>.<model>".
+        cursor: the `next` cursor returned by the previous page.
+        limit: the number of rows per page, at most `diff_chunk_size`.
+        stream: if true, every row after the cursor is streamed as newline-delimited JSON.
+
+    Rows are ordered by table and then by primary key, so pages are read with keyset
+    pagination and stay stable while new commits are made. Only the rows of models the
+    user has the "view" permission for are returned.
+    """
+
+    permission_classes = [IsAuthenticated]
+    ndjson_content_type = "application/x-ndjson"
+
+    def get_view_name(self):
+        """Returns the name of the view."""
+        return "Diff"
+
+    def get(self, request):
+        """Returns one page of diff rows, or streams every diff row as NDJSON."""
+        from_commit = self._resolve(request.query_params, "from_commit")
+        to_commit = self._resolve(request.query_params, "to_commit")
+        cursor = self._decode_cursor(request.query_params.get("cursor"))
+
+        summaries = diffs.diff_summaries(from_commit=from_commit, to_commit=to_commit)
+        table = request.query_params.get("table")
+        if table:
+            summaries = [s for s in summaries if self._table_label(s["content_type"]) == table]
+            if summaries and not self._can_view(request.user, summaries[0]["content_type"]):
+                raise PermissionDenied()
+        # rows of models the user can't view are left out of the diff
+        summaries = [s for s in summaries if self._can_view(request.user, s["content_type"])]
+        self._validate_cursor(cursor, summaries)
+        records = self._records(summaries, from_commit, to_commit, cursor)
+
+        if request.query_params.get("stream", "").lower() in ("true", "1"):
+            lines = (json.dumps(record) + "\n" for record in records)
+            return StreamingHttpResponse(lines, content_type=self.ndjson_content_type)
+
+        limit = self._limit(request.query_params)
+        page = list(itertools.islice(records, limit + 1))
+        next_url = None
+        if len(page) > limit:
+            page = page[:limit]
+            next_url = replace_query_param(request.build_absolute_uri(), "cursor", self._encode_cursor(page[-1]))
+        return Response(
+            {
+                "from_commit": from_commit,
+                "to_commit": to_commit,
+                "next": next_url,
+                "results": page,
+            }
+        )
+
+    def _records(self, summaries, from_commit, to_commit, cursor):
+        """Yields the diff records of each table after the cursor."""
+        for summary in summaries:
+            content_type = summary["content_type"]
+            after_pk = None
+            if cursor:
+                if self._table_label(content_type) != cursor["table"]:
+                    # tables before the cursor were read by previous pages
+                    continue
+                after_pk = cursor["pk"]
+                cursor = None
+            rows = diffs.DiffRows(content_type, from_commit, to_commit, summary["count"])
+            yield from rows.records(after_pk)
+
+    @staticmethod
+    def _can_view(user, content_type):
+        """Returns whether `user` may view the rows of the model of `content_type`."""
+        return user.has_perm(get_permission_for_model(content_type.model_class(), "view"))
+
+    def _validate_cursor(self, cursor, summaries):
+        """Rejects cursors naming a table outside of the diff, or holding a primary key that isn't valid."""
+        if not cursor:
+            return
+        for summary in summaries:
+            content_type = summary["content_type"]
+            if self._table_label(content_type) == cursor["table"]:
+                try:
+                    content_type.model_class()._meta.pk.to_python(cursor["pk"])
+                except (DjangoValidationError, TypeError) as err:
+                    raise ValidationError({"cursor": "Invalid cursor."}) from err
+                return
+        raise ValidationError({"cursor": "The cursor's table is not part of the diff."})
+
+    @staticmethod
+    def _resolve(params, name):
+        """Returns the commit hash of a query parameter holding a commit hash or a branch name."""
+        ref = params.get(name)
+        if not ref:
+            raise ValidationError({name: "This query parameter is required."})
+        if is_commit_hash(ref):
+            return ref
+        try:
+            return Branch.objects.get(name=ref).hash
+        except Branch.DoesNotExist as err:
+            raise ValidationError({name: f"{ref} is not a commit hash or branch name."}) from err
+
+    @staticmethod
+    def _limit(params):
+        """Returns the page size requested by the client."""
+        max_limit = get_plugin_setting("diff_chunk_size")
+        try:
+            limit = int(params.get("limit", max_limit))
+        except ValueError as err:
+            raise ValidationError({"limit": "A valid integer is required."}) from err
+        return max(1, min(limit, max_limit))
+
+    @staticmethod
+    def _table_label(content_type):
+        return f"{content_type.app_label}.{content_type.model}"
+
+    @staticmethod
+    def _encode_cursor(record):
+        cursor = json.dumps({"table": record["table"], "pk": record["pk"]})
+        return base64.urlsafe_b64encode(cursor.encode()).decode()
+
+    @staticmethod
+    def _decode_cursor(cursor):
+        if not cursor:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return {"table": cursor["table"], "pk": cursor["pk"]}
+        except (binascii.Error, KeyError, TypeError, ValueError) as err:
+            raise ValidationError({"cursor": "Invalid cursor."}) from err
+
+
+#
+# Conflicts
+#
+
+
+class ConflictView(APIView):
+    """
+    ConflictView returns the row-level conflicts and constraint violations of merging two branches, and resolves them.
+
+    Query parameters:
+        source_branch, destination_branch: the names of the branches to merge.
+        table: optionally limits the rows to one table, as its database table name e.g. "dcim_device".
+        cursor: the `next` cursor returned by the previous page.
+        limit: the number of rows per page, at most `conflict_chunk_size`.
+        stream: if true, the conflict summary of each table, then every row after the cursor,
+            is streamed as newline-delimited JSON.
+
+    Conflicts are listed before constraint violations, each ordered by table and then by
+    key, so pages are read with keyset pagination. Each page merges the branches again,
+    in a transaction that is rolled back or on a merge candidate branch.
+    """
+
+    permission_classes = [IsAuthenticated]
+    ndjson_content_type = "application/x-ndjson"
+
+    def get_view_name(self):
+        """Returns the name of the view."""
+        return "Conflicts"
+
+    def get(self, request):
+        """Returns the conflict summary and one page of conflict rows, or streams every row as NDJSON."""
+        src = self._branch(request.query_params, "source_branch")
+        dest = self._branch(request.query_params, "destination_branch")
+        cursor = self._decode_cursor(request.query_params.get("cursor"))
+        table = request.query_params.get("table")
+
+        if request.query_params.get("stream", "").lower() in ("true", "1"):
+            lines = (json.dumps(record) + "\n" for record in self._stream(src, dest, cursor, table))
+            return StreamingHttpResponse(lines, content_type=self.ndjson_content_type)
+
+        limit = self._limit(request.query_params)
+        with merge.merge_conflicts(src, dest) as conflicts:
+            summary = conflicts.make_conflict_summary_table()
+            records = conflicts.records(cursor, table, chunk_size=limit + 1)
+            page = list(itertools.islice(records, limit + 1))
+        next_url = None
+        if len(page) > limit:
+            page = page[:limit]
+            next_url = replace_query_param(request.build_absolute_uri(), "cursor", self._encode_cursor(page[-1]))
+        return Response(
+            {
+                "source_branch": src.name,
+                "destination_branch": dest.name,
+                "summary": summary,
+                "next": next_url,
+                "results": page,
+            }
+        )
+
+    def post(self, request):
+        """
+        Resolves conflicts in bulk, taking whole tables or sets of rows from either branch.
+
+        The body holds the `source_branch`, the `destination_branch` and a list of `resolutions`,
+        each with a `table`, the side to `take`, "ours" for the destination or "theirs" for the
+        source, and optionally the `keys` of the conflicts to resolve.
+        """
+        if not request.user.has_perm("nautobot_version_control.change_branch"):
+            raise PermissionDenied()
+        src = self._branch(request.data, "source_branch")
+        dest = self._branch(request.data, "destination_branch")
+        resolutions = request.data.get("resolutions")
+        if not isinstance(resolutions, list) or not all(
+            isinstance(res, dict) and isinstance(res.get("keys") or [], list) for res in resolutions
+        ):
+            raise ValidationError({"resolutions": "A list of resolutions, with lists of keys, is required."})
+        try:
+            result = resolution.resolve_conflicts(src, dest, resolutions, user=request.user)
+        except DoltError as err:
+            raise ValidationError({"resolutions": str(err)}) from err
+        return Response({"source_branch": src.name, "destination_branch": dest.name, **result})
+
+    @staticmethod
+    def _stream(src, dest, cursor, table):
+        """Yields the conflict summary of each table, then the conflict rows after the cursor, in one merge."""
+        with merge.merge_conflicts(src, dest) as conflicts:
+            if cursor is None:
+                for summary in conflicts.make_conflict_summary_table():
+                    yield {"kind": "summary", **summary}
+            yield from conflicts.records(cursor, table)
+
+    @staticmethod
+    def _branch(params, name):
+        """Returns the branch named by a query parameter."""
+        ref = params.get(name)
+        if not ref:
+            raise ValidationError({name: "This query parameter is required."})
+        try:
+            return Branch.objects.get(name=ref)
+        except Branch.DoesNotExist as err:
+            raise ValidationError({name: f"{ref} is not a branch name."}) from err
+
+    @staticmethod
+    def _limit(params):
+        """Returns the page size requested by the client."""
+        max_limit = get_plugin_setting("conflict_chunk_size")
+        try:
+            limit = int(params.get("limit", max_limit))
+        except ValueError as err:
+            raise ValidationError({"limit": "A valid integer is required."}) from err
+        return max(1, min(limit, max_limit))
+
+    @staticmethod
+    def _encode_cursor(record):
+        return merge.encode_cursor({"kind": record["kind"], "table": record["table"], "key": record["key"]})
+
+    @staticmethod
+    def _decode_cursor(cursor):
+        if not cursor:
+            return None
+        try:
+            cursor = merge.decode_cursor(cursor)
+            return {"kind": cursor["kind"], "table": cursor["table"], "key": cursor["key"]}
+        except (KeyError, TypeError, ValueError) as err:
+            raise ValidationError({"cursor": "Invalid cursor."}) from err
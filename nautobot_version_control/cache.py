@@ -0,0 +1,180 @@
+"""Cache.py contains caches for Dolt data that is immutable once written, such as diffs between two commits."""
+
+from collections import OrderedDict
+import hashlib
+import threading
+
+from django.core.cache import caches
+from django.db import connections, DEFAULT_DB_ALIAS
+
+from nautobot_version_control.utils import get_plugin_setting, is_branch_name, is_commit_hash
+
+
+class DiffCache:
+    """
+    DiffCache is a content-addressed cache of diffs between two commits.
+
+    Dolt commit hashes are immutable, so any result computed from a pair of
+    hashes is valid forever. Entries are stored in a Django cache and the
+    oldest entries are evicted once `diff_cache_max_entries` is reached.
+    Diffs between branch names are never cached, even for branches named
+    like a commit hash.
+    """
+
+    prefix = "nautobot_version_control.diff"
+    index_key = f"{prefix}.index"
+
+    @property
+    def cache(self):
+        """Returns the Django cache backing the diff cache."""
+        return caches[get_plugin_setting("diff_cache_alias")]
+
+    @property
+    def max_entries(self):
+        """Returns the maximum number of cached entries."""
+        return get_plugin_setting("diff_cache_max_entries")
+
+    @property
+    def enabled(self):
+        """Returns whether the diff cache is enabled."""
+        return self.max_entries > 0
+
+    def key(self, kind, from_commit, to_commit, *parts):
+        """Returns the cache key of a `kind` of result between two commits."""
+        return ".".join([self.prefix, kind, str(from_commit), str(to_commit), *parts])
+
+    def cacheable(self, from_commit, to_commit):
+        """Returns whether results between `from_commit` and `to_commit` can be cached."""
+        return self.enabled and is_commit_hash(from_commit) and is_commit_hash(to_commit)
+
+    def get(self, kind, from_commit, to_commit, *parts):
+        """Returns a cached result, or `None` if it was not found."""
+        if not self.cacheable(from_commit, to_commit):
+            return None
+        return self.cache.get(self.key(kind, from_commit, to_commit, *parts))
+
+    def set(self, kind, from_commit, to_commit, value, *parts):
+        """Stores a result and evicts the oldest entries over the limit."""
+        # a branch's head moves, so make sure a hash-like name isn't a branch before
+        # storing. Only entries stored this way can be found by `get`.
+        if not self.cacheable(from_commit, to_commit) or is_branch_name(from_commit, to_commit):
+            return
+        key = self.key(kind, from_commit, to_commit, *parts)
+        self.cache.set(key, value, get_plugin_setting("diff_cache_timeout"))
+        self._index(key)
+
+    def get_or_set(self, kind, from_commit, to_commit, func, *parts):
+        """Returns a cached result, computing and storing it with `func()` on a miss."""
+        value = self.get(kind, from_commit, to_commit, *parts)
+        if value is None:
+            value = func()
+            self.set(kind, from_commit, to_commit, value, *parts)
+        return value
+
+    def clear(self):
+        """Removes every entry from the diff cache."""
+        self.cache.delete_many(self.cache.get(self.index_key, []))
+        self.cache.delete(self.index_key)
+
+    def _index(self, key):
+        """Adds `key` as the newest entry of the index, evicting the oldest entries over the limit."""
+        # the index is shared by all processes using the cache, so it is only
+        # written when an entry is stored, never on reads. Concurrent updates
+        # are best-effort, entries dropped from the index still expire after
+        # `diff_cache_timeout`.
+        index = [k for k in self.cache.get(self.index_key, []) if k != key]
+        index.append(key)
+        evicted = index[: -self.max_entries]
+        if evicted:
+            self.cache.delete_many(evicted)
+            index = index[-self.max_entries :]  # noqa: E203
+        self.cache.set(self.index_key, index, None)
+
+
+class SchemaCache:
+    """
+    SchemaCache is an in-process cache of the column names of tables, such as Dolt's diff and conflict tables.
+
+    Columns are keyed by table name and a fingerprint of the database schema
+    at a commit, so introspection only runs again when the schema changes.
+    Fingerprints are themselves cached per commit hash, as the schema at a
+    commit never changes.
+    """
+
+    def __init__(self, max_entries=1024):
+        """Inits the class vars."""
+        self.max_entries = max_entries
+        self._fingerprints = OrderedDict()
+        self._columns = OrderedDict()
+        # diffs may be computed on several threads at once
+        self._lock = threading.Lock()
+
+    def columns(self, table, commit=None, using=DEFAULT_DB_ALIAS):
+        """
+        Returns the column names of `table`, as seen through the connection `using`.
+
+        `commit` is the commit whose schema is visible on `using`. Without a
+        commit hash the schema can't be fingerprinted and the table is
+        always introspected.
+        """
+        fingerprint = self.fingerprint(commit, using) if commit else None
+        key = (table, fingerprint)
+        if fingerprint:
+            cols = self._get(self._columns, key)
+            if cols is not None:
+                return cols
+
+        with connections[using].cursor() as cursor:
+            cursor.execute(f"DESCRIBE {table}")  # TODO: not safe
+            cols = [col[0] for col in cursor.fetchall()]
+        if fingerprint:
+            self._set(self._columns, key, cols)
+        return cols
+
+    def fingerprint(self, commit, using=DEFAULT_DB_ALIAS):
+        """Returns a fingerprint of the schema of every table at `commit`, or `None` if it isn't a commit hash."""
+        commit = str(commit)
+        if not is_commit_hash(commit):
+            return None
+        fingerprint = self._get(self._fingerprints, commit)
+        if fingerprint is not None:
+            return fingerprint
+        if is_branch_name(commit):
+            return None
+
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                """SELECT table_name, column_name, column_type
+                    FROM information_schema.columns
+                    WHERE table_schema = DATABASE()
+                    ORDER BY table_name, ordinal_position"""
+            )
+            rows = cursor.fetchall()
+        # fall back to the commit itself if the schema can't be introspected
+        fingerprint = hashlib.sha1(repr(rows).encode()).hexdigest() if rows else commit  # nosec
+        self._set(self._fingerprints, commit, fingerprint)
+        return fingerprint
+
+    def clear(self):
+        """Removes every entry from the schema cache."""
+        with self._lock:
+            self._fingerprints.clear()
+            self._columns.clear()
+
+    def _get(self, entries, key):
+        with self._lock:
+            value = entries.get(key)
+            if value is not None:
+                entries.move_to_end(key)
+            return value
+
+    def _set(self, entries, key, value):
+        with self._lock:
+            entries[key] = value
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+
+diff_cache = DiffCache()
+schema_cache = SchemaCache()
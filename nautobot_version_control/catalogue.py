@@ -0,0 +1,85 @@
+"""Catalogue.py contains a process-wide catalogue of the installed models, used by diffs and merge conflicts."""
+
+from collections import namedtuple
+import threading
+
+from django.apps import apps
+
+from nautobot_version_control import diff_table_for_model
+
+Entries = namedtuple("Entries", ["models_by_table", "diff_tables", "diffable_tables"])
+
+
+class Catalogue:
+    """
+    Catalogue maps database tables to models, and models to their registered diff table.
+
+    The catalogue is built when the app is ready, then rebuilt on first use after it is
+    invalidated by `register_versioned_models`, `register_diff_tables` or a migration.
+    It replaces scanning every ContentType, and calling `model_class()` on each, per request.
+    """
+
+    def __init__(self):
+        """Inits the class vars."""
+        self._lock = threading.Lock()
+        self._entries = None
+
+    @property
+    def models_by_table(self):
+        """Returns a mapping of database table name to model, for every installed model."""
+        return self.entries().models_by_table
+
+    @property
+    def diffable_tables(self):
+        """Returns the database table names of the models with a registered diff table."""
+        return self.entries().diffable_tables
+
+    def model_for_table(self, table):
+        """Returns the model stored in a database table, or `None`."""
+        return self.entries().models_by_table.get(table)
+
+    def diff_table(self, model):
+        """Returns the registered diff table class of `model`, or `None`."""
+        return self.entries().diff_tables.get(model)
+
+    def diffable_models(self):
+        """Returns the models with a registered diff table, ordered by app label and model name."""
+        entries = self.entries()
+        return [entries.models_by_table[table] for table in entries.diffable_tables]
+
+    def entries(self):
+        """Returns the catalogue's entries, building them if needed."""
+        entries = self._entries
+        if entries is None:
+            with self._lock:
+                if self._entries is None:
+                    self._entries = self._build()
+                entries = self._entries
+        return entries
+
+    def invalidate(self, **kwargs):  # pylint: disable=unused-argument
+        """Drops the catalogue's entries, also connected to `post_migrate`."""
+        with self._lock:
+            self._entries = None
+
+    @staticmethod
+    def _build():
+        models_by_table = {}
+        diff_tables = {}
+        for model in apps.get_models(include_auto_created=True):
+            if model._meta.proxy:
+                # proxies share the table of their concrete model
+                continue
+            models_by_table[model._meta.db_table] = model
+            diff_table = diff_table_for_model(model)
+            if diff_table:
+                diff_tables[model] = diff_table
+        diffable = sorted(diff_tables, key=lambda model: (model._meta.app_label, model._meta.model_name))
+        return Entries(
+            models_by_table=models_by_table,
+            diff_tables=diff_tables,
+            diffable_tables=tuple(model._meta.db_table for model in diffable),
+        )
+
+
+catalogue = Catalogue()
@@ -3,6 +3,8 @@
 # TODO: move these to settings?
 
 
+PLUGIN_NAME = "nautobot_version_control"
+
 DB_NAME = "nautobot"
 
 GLOBAL_DB = "global"
@@ -1,9 +1,11 @@
 """Diffs.py contains a set of utilities for producing Dolt diffs."""
 
+import json
+
 from django.contrib.contenttypes.models import ContentType
-from django.db import connection
-from django.db import models
-from django.db.models.expressions import RawSQL
+from django.core.exceptions import ValidationError
+from django.db import connection, connections, DEFAULT_DB_ALIAS
+from django.urls import reverse
 
 from nautobot.circuits import tables as circuits_tables
 from nautobot.dcim.tables import cables, devices, devicetypes, power, racks, locations
@@ -12,112 +14,396 @@ from nautobot.ipam import tables as ipam_tables
 from nautobot.tenancy import tables as tenancy_tables
 from nautobot.virtualization import tables as virtualization_tables
 
-from nautobot_version_control.dynamic.diff_factory import DiffListViewFactory
-from nautobot_version_control.models import Commit
-from nautobot_version_control.utils import db_for_commit
+from nautobot_version_control.cache import diff_cache, schema_cache
+from nautobot_version_control.catalogue import catalogue
+from nautobot_version_control.dynamic.diff_factory import DiffListViewFactory, StreamingTableData
+from nautobot_version_control.utils import db_for_commit, get_plugin_setting
+
+from . import register_diff_tables
+
+
+def table_diff(content_type, from_commit, to_commit):
+    """Returns the diff of the table of content_type between from_commit and to_commit, or `None` if it has no diffs."""
+    from_commit, to_commit = str(from_commit), str(to_commit)
+    db_for_commit(from_commit)
+    db_for_commit(to_commit)
+
+    diff = diff_cache.get_or_set(
+        "table", from_commit, to_commit, lambda: _table_diff(content_type, from_commit, to_commit), str(content_type.pk)
+    )
+    return _with_table(diff) if diff else None
 
-from . import diff_table_for_model, register_diff_tables
 
+def diff_summaries(from_commit=None, to_commit=None):
+    """
+    Returns the diff summary of each table changed between from_commit and to_commit, without fetching any rows.
 
-def three_dot_diffs(from_commit=None, to_commit=None):
-    """Returns a diff between the ancestor of from_to_commit with to_commit."""
+    Each summary links to `diff_table_url`, which renders one page of the table's diff rows.
+    """
     if not (from_commit and to_commit):
         raise ValueError("must specify both a to_commit and from_commit")
-    merge_base = Commit.merge_base(from_commit, to_commit)
-    return two_dot_diffs(from_commit=merge_base, to_commit=to_commit)
+    from_commit, to_commit = str(from_commit), str(to_commit)
+    return diff_cache.get_or_set("summaries", from_commit, to_commit, lambda: _diff_summaries(from_commit, to_commit))
+
+
+def _diff_summaries(from_commit, to_commit):
+    table_summaries = diff_summaries_by_table(from_commit, to_commit)
+    summaries = []
+    for content_type in _changed_content_types(table_summaries):
+        ct_meta = content_type.model_class()._meta
+        summary = table_summaries[ct_meta.db_table]
+        count = sum(summary.values())
+        summaries.append(
+            {
+                "content_type": content_type,
+                "name": f"{ct_meta.verbose_name.capitalize()} Diffs",
+                "count": count,
+                "url": diff_table_url(content_type, from_commit, to_commit),
+                **summary,
+            }
+        )
+    return summaries
+
 
+def diff_stats(from_commit=None, to_commit=None):
+    """
+    Returns the total number of rows added, modified and removed in diffable tables between from_commit and to_commit.
 
-def two_dot_diffs(from_commit=None, to_commit=None):
-    """Returns the diff between from_commit and to_commit via the dolt diff table interface."""
+    Diff stats are computed from a single query and never fetch rows, for use in branch and pull request lists.
+    """
     if not (from_commit and to_commit):
         raise ValueError("must specify both a to_commit and from_commit")
+    return diff_stats_for_pairs([(from_commit, to_commit)])[0]
 
-    diff_results = []
-    for content_type in ContentType.objects.all():
-        model = content_type.model_class()
-        if not model:
-            continue
-        if not diff_table_for_model(model):
-            continue
 
-        ct_meta = content_type.model_class()._meta
-        tbl_name = ct_meta.db_table
-        verbose_name = str(ct_meta.verbose_name.capitalize())
-
-        to_queryset = (
-            content_type.model_class()
-            .objects.filter(
-                pk__in=RawSQL(  # nosec
-                    f"""SELECT to_id FROM dolt_commit_diff_{tbl_name}
-                        WHERE to_commit = %s
-                        AND from_commit = %s""",  # nosec
-                    (to_commit, from_commit),
-                )
-            )
-            .annotate(
-                # Annotate each row with a JSON-ified diff
-                diff=RawSQL(  # nosec
-                    f"""SELECT JSON_OBJECT("root", "to", {json_diff_fields(tbl_name)})
-                        FROM dolt_commit_diff_{tbl_name}
-                        WHERE to_commit = %s AND from_commit = %s
-                        AND to_id = {tbl_name}.id """,  # nosec
-                    (to_commit, from_commit),
-                    output_field=models.JSONField(),
-                )
-            )
-            # "time-travel" query the database at `to_commit`
-            .using(db_for_commit(to_commit))
+def diff_stats_for_pairs(pairs):
+    """
+    Returns the diff stats of each (from_commit, to_commit) pair, in order, or `None` for pairs missing a commit.
+
+    Cached stats are reused, the others are computed together with a single query over `dolt_diff_stat`.
+    """
+    pairs = [(str(left), str(right)) if left and right else None for left, right in pairs]
+    stats = [diff_cache.get("stats", *pair) if pair else None for pair in pairs]
+    missing = sorted({pair for pair, pair_stats in zip(pairs, stats) if pair and pair_stats is None})
+    if not missing:
+        return stats
+
+    summaries = {pair: {} for pair in missing}
+    selects = """SELECT %s, table_name,
+                    COALESCE(rows_added, 0), COALESCE(rows_modified, 0), COALESCE(rows_deleted, 0)
+                FROM dolt_diff_stat(%s, %s)"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            " UNION ALL ".join([selects] * len(missing)),
+            [param for i, pair in enumerate(missing) for param in (i, *pair)],
         )
+        for i, table, added, modified, removed in cursor.fetchall():
+            if added or modified or removed:
+                summaries[missing[i]][table] = {"added": added, "modified": modified, "removed": removed}
+    for pair, table_summaries in summaries.items():
+        summaries[pair] = _diff_stats(table_summaries)
+        diff_cache.set("stats", *pair, summaries[pair])
+    return [summaries[pair] if pair and pair_stats is None else pair_stats for pair, pair_stats in zip(pairs, stats)]
 
-        from_queryset = (
-            content_type.model_class()
-            .objects.filter(
-                # add the `diff_type = 'removed'` clause, because we only want deleted
-                # rows in this queryset. modified rows come from the `to_queryset`
-                pk__in=RawSQL(  # nosec
-                    f"""SELECT from_id FROM dolt_commit_diff_{tbl_name}
-                        WHERE to_commit = %s AND from_commit = %s
-                        AND diff_type = 'removed' """,  # nosec
-                    (to_commit, from_commit),
-                )
-            )
-            .annotate(
-                # Annotate each row with a JSON-ified diff
-                diff=RawSQL(  # nosec
-                    f"""SELECT JSON_OBJECT("root", "from", {json_diff_fields(tbl_name)})
-                        FROM dolt_commit_diff_{tbl_name}
-                        WHERE to_commit = %s AND from_commit = %s
-                        AND from_id = {tbl_name}.id """,  # nosec
-                    (to_commit, from_commit),
-                    output_field=models.JSONField(),
-                )
+
+def _diff_stats(table_summaries):
+    """Returns the diff stats of the diffable tables in `table_summaries`, see `diff_summaries_by_table`."""
+    stats = {"tables": 0, "added": 0, "modified": 0, "removed": 0}
+    for content_type in _changed_content_types(table_summaries):
+        summary = table_summaries[content_type.model_class()._meta.db_table]
+        stats["tables"] += 1
+        for diff_type, count in summary.items():
+            stats[diff_type] += count
+    return stats
+
+
+def diff_table_url(content_type, from_commit, to_commit):
+    """Returns the url of the view rendering the diff rows of content_type between from_commit and to_commit."""
+    return reverse(
+        "plugins:nautobot_version_control:diff_table",
+        kwargs={
+            "from_commit": str(from_commit),
+            "to_commit": str(to_commit),
+            "app_label": content_type.app_label,
+            "model": content_type.model,
+        },
+    )
+
+
+def _with_table(diff):
+    """Returns a table diff result with a diff table built over its rows."""
+    rows = diff["rows"]
+    if isinstance(rows, DiffRows):
+        # don't let the table load streamed rows into a list
+        rows = StreamingTableData(rows)
+    return {
+        "content_type": diff["content_type"],
+        "name": diff["name"],
+        "table": DiffListViewFactory(diff["content_type"]).get_table_model()(rows),
+        "count": len(diff["rows"]),
+        "added": diff["added"],
+        "modified": diff["modified"],
+        "removed": diff["removed"],
+    }
+
+
+def _changed_content_types(changed):
+    """
+    Returns the content types of diffable models whose tables are in `changed`.
+
+    Content types are ordered by app label and model name, as in the catalogue. Diffs used
+    to be listed in the database order of ContentTypes, which depended on install order.
+    """
+    # ContentTypes are cached by Django, this doesn't query the database once warm
+    return [
+        ContentType.objects.get_for_model(catalogue.model_for_table(table))
+        for table in catalogue.diffable_tables
+        if table in changed
+    ]
+
+
+def _table_diff(content_type, from_commit, to_commit, summary=None):
+    """Returns the diff rows and summary of the table of content_type, or `None` if it has no diffs."""
+    ct_meta = content_type.model_class()._meta
+    tbl_name = ct_meta.db_table
+    verbose_name = str(ct_meta.verbose_name.capitalize())
+
+    if summary is None:
+        # the diff tables are read on the "time-travel" connection for
+        # `to_commit` rather than the branch checked out on "default"
+        summary = diff_summary_for_table(tbl_name, from_commit, to_commit, using=db_for_commit(to_commit))
+    count = sum(summary.values())
+    if count == 0:
+        return None
+
+    rows = DiffRows(content_type, from_commit, to_commit, count)
+    if count <= rows.chunk_size:
+        # small diffs are materialized so that their rows can be cached
+        rows = list(rows)
+
+    return {
+        "content_type": content_type,
+        "name": f"{verbose_name} Diffs",
+        "rows": rows,
+        **summary,
+    }
+
+
+class DiffRows:
+    """
+    DiffRows lazily streams the diff rows of a table, ordered by primary key.
+
+    Each chunk of `diff_chunk_size` rows is read in a single pass over the
+    table's `dolt_commit_diff_<table>` system table, returning the primary
+    key together with the JSON-ified diff. The rows are then hydrated with one
+    bulk "time-travel" query per commit: added and modified rows as of
+    `to_commit`, removed rows as of `from_commit`. Memory use is bounded by
+    the chunk size rather than by the size of the diff.
+    """
+
+    def __init__(self, content_type, from_commit, to_commit, count):
+        """Inits the class vars."""
+        self.content_type = content_type
+        self.from_commit = from_commit
+        self.to_commit = to_commit
+        self.count = count
+
+    @property
+    def chunk_size(self):
+        """Returns the number of rows fetched per query."""
+        return get_plugin_setting("diff_chunk_size")
+
+    def __len__(self):
+        """Returns the number of diff rows, as counted by the diff summary."""
+        return self.count
+
+    def __iter__(self):
+        """Yields the diff rows ordered by primary key."""
+        for chunk in self.chunks():
+            yield from self._hydrate(chunk)
+
+    def chunks(self, after_pk=None):
+        """Yields chunks of (pk, diff_type, diff) tuples ordered by primary key, starting after `after_pk`."""
+        chunk_size = self.chunk_size
+        while True:
+            chunk = self._diff_chunk(after_pk, chunk_size)
+            if chunk:
+                yield chunk
+            if len(chunk) < chunk_size:
+                return
+            after_pk = chunk[-1][0]
+
+    def records(self, after_pk=None):
+        """
+        Yields the diff rows as plain dicts ordered by primary key, starting after `after_pk`.
+
+        Records are built from the diff table alone, without loading any model instances. Each
+        record holds the table, the primary key, the diff type and the changed columns with
+        their `from` and `to` values.
+        """
+        model = self.content_type.model_class()
+        table = f"{self.content_type.app_label}.{self.content_type.model}"
+        for chunk in self.chunks(after_pk):
+            for pk, diff_type, diff in chunk:
+                diff = json.loads(diff) if isinstance(diff, (str, bytes)) else diff
+                python_pk = _to_pk(model, pk)
+                yield {
+                    "table": table,
+                    "pk": str(python_pk if python_pk is not None else pk),
+                    "diff_type": diff_type,
+                    "changes": _changed_columns(diff),
+                }
+
+    def __getitem__(self, key):
+        """Returns a row, or a list of rows for a slice, seeking to the first row in SQL."""
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.count)
+            rows = self._page(start, stop - start)
+            return rows[::step] if step != 1 else rows
+        if key < 0:
+            key += self.count
+        rows = self._page(key, 1) if key >= 0 else []
+        if not rows:
+            raise IndexError("diff row index out of range")
+        return rows[0]
+
+    def _page(self, offset, limit):
+        """Returns the hydrated rows `offset` to `offset + limit`, only the rows of the page are read and hydrated."""
+        chunk_size = self.chunk_size
+        rows, after_pk = [], None
+        while limit > 0:
+            size = min(limit, chunk_size)
+            # the first chunk is found by offset, the next ones by keyset
+            chunk = self._diff_chunk(after_pk, size, offset=offset if after_pk is None else 0)
+            rows.extend(self._hydrate(chunk))
+            if len(chunk) < size:
+                break
+            after_pk, limit = chunk[-1][0], limit - size
+        return rows
+
+    def _diff_chunk(self, after_pk, limit, offset=0):
+        """Returns up to `limit` (pk, diff_type, diff) tuples with a pk greater than `after_pk`, skipping `offset`."""
+        using = db_for_commit(self.to_commit)
+        tbl_name = self.content_type.model_class()._meta.db_table
+        params = [self.to_commit, self.from_commit]
+        after = ""
+        if after_pk is not None:
+            after = "AND COALESCE(to_id, from_id) > %s"
+            # `after_pk` may be a raw pk from a previous chunk, or a pk from a client's cursor
+            pk_field = self.content_type.model_class()._meta.pk
+            params.append(pk_field.get_db_prep_value(pk_field.to_python(after_pk), connections[using]))
+        params.extend([limit, offset])
+
+        with connections[using].cursor() as cursor:
+            cursor.execute(  # TODO: not safe
+                f"""SELECT COALESCE(to_id, from_id), diff_type,
+                        JSON_OBJECT(
+                            "root", IF(diff_type = 'removed', 'from', 'to'),
+                            {json_diff_fields(tbl_name, using=using, commit=self.to_commit)}
+                        )
+                    FROM dolt_commit_diff_{tbl_name}
+                    WHERE to_commit = %s AND from_commit = %s {after}
+                    ORDER BY COALESCE(to_id, from_id)
+                    LIMIT %s OFFSET %s""",  # nosec
+                params,
             )
-            # "time-travel" query the database at `from_commit`
-            .using(db_for_commit(from_commit))
-        )
-        diff_rows = sorted(list(to_queryset) + list(from_queryset), key=lambda d: d.pk)
-        if len(diff_rows) == 0:
+            return cursor.fetchall()
+
+    def _hydrate(self, chunk):
+        """
+        Yields the model instances of a chunk of diff rows, annotated with their diff.
+
+        Every row is yielded, so that pages match the diff summary's count: rows that can't
+        be loaded as of their commit are built from the values in their diff instead.
+        """
+        model = self.content_type.model_class()
+        pks = [(_to_pk(model, pk), diff_type) for pk, diff_type, _ in chunk]
+        removed = [pk for pk, diff_type in pks if diff_type == "removed" and pk is not None]
+        changed = [pk for pk, diff_type in pks if diff_type != "removed" and pk is not None]
+        # "time-travel" query removed rows at `from_commit`, others at `to_commit`
+        from_objs = model.objects.using(db_for_commit(self.from_commit)).in_bulk(removed) if removed else {}
+        to_objs = model.objects.using(db_for_commit(self.to_commit)).in_bulk(changed) if changed else {}
+
+        for (pk, diff_type), (_, _, diff) in zip(pks, chunk):
+            diff = json.loads(diff) if isinstance(diff, (str, bytes)) else diff
+            objs = from_objs if diff_type == "removed" else to_objs
+            obj = objs.get(pk) if pk is not None else None
+            if obj is None:
+                obj = _instance_from_diff(model, diff)
+            obj.diff = diff
+            yield obj
+
+
+def _to_pk(model, pk):
+    """Returns a raw primary key of a diff row as a python value, or `None` if it isn't a valid primary key."""
+    try:
+        return model._meta.pk.to_python(pk)
+    except ValidationError:
+        return None
+
+
+def _instance_from_diff(model, diff):
+    """Returns an unsaved model instance holding the column values of the root side of a diff row."""
+    root = diff.get("root", "to")
+    values = {}
+    for field in model._meta.concrete_fields:
+        key = f"{root}_{field.column}"
+        if key in diff:
+            values[field.attname] = diff[key]
+    return model(**values)
+
+
+def _changed_columns(diff):
+    """Returns the columns that differ between the `from_` and `to_` values of a dolt diff row."""
+    changes = {}
+    for key, value in diff.items():
+        if not key.startswith("to_") or key in ("to_commit", "to_commit_date"):
             continue
+        column = key[len("to_") :]  # noqa: E203
+        from_value = diff.get(f"from_{column}")
+        if from_value != value:
+            changes[column] = {"from": from_value, "to": value}
+    return changes
 
-        diff_view_table = DiffListViewFactory(content_type).get_table_model()
-        diff_results.append(
-            {
-                "name": f"{verbose_name} Diffs",
-                "table": diff_view_table(diff_rows),
-                **diff_summary_for_table(tbl_name, from_commit, to_commit),
-            }
+
+def diff_summaries_by_table(from_commit, to_commit):
+    """
+    Returns the diff summary of every table with changed rows between from_commit and to_commit, keyed by table name.
+
+    All tables are summarized by a single query over `dolt_diff_stat`.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """SELECT table_name,
+                    COALESCE(rows_added, 0), COALESCE(rows_modified, 0), COALESCE(rows_deleted, 0)
+                FROM dolt_diff_stat(%s, %s)""",
+            (str(from_commit), str(to_commit)),
         )
-    return diff_results
+        return {
+            table: {"added": added, "modified": modified, "removed": removed}
+            for table, added, modified, removed in cursor.fetchall()
+            if added or modified or removed
+        }
+
 
+def diff_summary_for_table(table, from_commit, to_commit, using=DEFAULT_DB_ALIAS):
+    """Returns the diff summary for table, for the commits from_commit and to_commit, read on the connection `using`."""
+    return diff_cache.get_or_set(
+        "summary",
+        from_commit,
+        to_commit,
+        lambda: _diff_summary_for_table(table, from_commit, to_commit, using=using),
+        table,
+    )
 
-def diff_summary_for_table(table, from_commit, to_commit):
-    """Returns the diff summary for table, for the commits from_commit and to_commit."""
+
+def _diff_summary_for_table(table, from_commit, to_commit, using=DEFAULT_DB_ALIAS):
     summary = {
         "added": 0,
         "modified": 0,
         "removed": 0,
     }
-    with connection.cursor() as cursor:
+    with connections[using].cursor() as cursor:
         cursor.execute(  # TODO: not safe
             f"""SELECT diff_type, count(diff_type) FROM dolt_commit_diff_{table}  # nosec
                 WHERE to_commit = %s AND from_commit = %s
@@ -129,12 +415,14 @@ def diff_summary_for_table(table, from_commit, to_commit):
     return summary
 
 
-def json_diff_fields(tbl_name):
-    """Returns all of the column names for a model and turns them into to_ and from_ fields."""
-    with connection.cursor() as cursor:
-        cursor.execute(f"DESCRIBE dolt_commit_diff_{tbl_name}")  # TODO: not safe
-        cols = cursor.fetchall()
-    pairs = (f"'{c[0]}', dolt_commit_diff_{tbl_name}.{c[0]}" for c in cols)
+def json_diff_fields(tbl_name, using=DEFAULT_DB_ALIAS, commit=None):
+    """
+    Returns all of the column names for a model and turns them into to_ and from_ fields.
+
+    `commit` is the commit checked out on `using`, passing it lets the columns be cached.
+    """
+    cols = schema_cache.columns(f"dolt_commit_diff_{tbl_name}", commit=commit, using=using)
+    pairs = (f"'{c}', dolt_commit_diff_{tbl_name}.{c}" for c in cols)
     return ", ".join(pairs)
 
 
@@ -2,16 +2,28 @@
 
 import copy
 
-from django.apps import apps
 from django.contrib.contenttypes.models import ContentType
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.html import format_html
 
 import django_tables2 as tables
+from django_tables2.data import TableListData
 from django_tables2.utils import call_with_appropriate
 
-from nautobot_version_control import diff_table_for_model
+from nautobot_version_control.catalogue import catalogue
+
+
+# Process-wide cache of the tables generated by `DiffListViewFactory`.
+__DIFF_TABLE_MODELS__ = {}
+
+
+def warm_diff_table_models():
+    """Generates the diff table of every model with a registered diff table."""
+    for model in catalogue.diffable_models():
+        # an unsaved ContentType avoids querying the database at startup
+        content_type = ContentType(app_label=model._meta.app_label, model=model._meta.model_name)
+        DiffListViewFactory(content_type).get_table_model()
 
 
 class DiffListViewFactory:
@@ -22,11 +34,18 @@ class DiffListViewFactory:
         self.content_type = content_type
 
     def get_table_model(self):
-        """Returns the underlying the underlying model."""
+        """Returns the underlying the underlying model, generating it once per process."""
+        # generated tables are not Django models, so they're cached here rather
+        # than in the app registry. Keying on the registered table means that
+        # re-registering a diff table generates a new class.
+        model_view_table = catalogue.diff_table(self.content_type.model_class())
+        key = (self.content_type.app_label, self.content_type.model, model_view_table)
         try:
-            return apps.get_model("nautobot_version_control", self.table_model_name)
-        except LookupError:
-            return self.make_table_model()
+            return __DIFF_TABLE_MODELS__[key]
+        except KeyError:
+            table_model = self.make_table_model()
+            __DIFF_TABLE_MODELS__[key] = table_model
+            return table_model
 
     def make_table_model(self):
         """Create a DiffList of a model."""
@@ -34,7 +53,7 @@ class DiffListViewFactory:
             # lookup the list view table for this content type
             # todo: once available, use https://github.com/nautobot/nautobot/issues/747
             model = self.content_type.model_class()
-            ModelViewTable = diff_table_for_model(model)  # pylint: disable=C0103
+            ModelViewTable = catalogue.diff_table(model)  # pylint: disable=C0103
 
             return type(
                 self.table_model_name,
@@ -66,6 +85,22 @@ class DiffListViewFactory:
         return f"diff_{str(self.content_type.app_label)}_{str(self.content_type.model)}"
 
 
+class StreamingTableData(TableListData):
+    """
+    StreamingTableData feeds a lazy sequence of rows to a table without copying it into a list.
+
+    Streamed rows are always ordered by primary key, so ordering is ignored.
+    """
+
+    def __iter__(self):
+        """Iterates over the underlying rows once."""
+        return iter(self.data)
+
+    def order_by(self, aliases):
+        """Streamed rows are not re-ordered."""
+        return
+
+
 def row_attrs_for_record(record):  # pylint: disable=R1710
     """The row_attrs_for_record returns button attributes per diff type."""
     if not record.diff:
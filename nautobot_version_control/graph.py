@@ -0,0 +1,230 @@
+"""Graph.py contains an in-process index of the Dolt commit graph."""
+
+from array import array
+import heapq
+import threading
+
+from django.db import connection
+
+from nautobot_version_control.utils import is_commit_hash
+
+# painting flags used to walk the graph from two commits at once
+_LEFT = 1
+_RIGHT = 2
+_STALE = 4
+
+
+class CommitGraph:
+    """
+    CommitGraph answers questions about the commit graph, such as merge bases, without querying Dolt.
+
+    Commits are immutable, so the graph only ever grows. The first lookup loads the
+    whole `dolt_commit_ancestors` table in one scan. Later lookups of unknown commits
+    load their ancestors a generation at a time until they reach known commits.
+
+    Each commit is numbered in load order. Its parents and generation number are stored
+    in arrays indexed by that number. Dolt commits have at most two parents.
+    """
+
+    def __init__(self):
+        """Inits the class vars."""
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):  # pylint: disable=attribute-defined-outside-init
+        """Empties the index."""
+        self._ids = {}
+        self._hashes = []
+        self._first_parents = array("l")
+        self._second_parents = array("l")
+        # the length of the longest path to a root commit, 0 if not yet computed
+        self._generations = array("l")
+        self._loaded = bytearray()
+
+    def __len__(self):
+        """Returns the number of commits in the index."""
+        return len(self._hashes)
+
+    def __contains__(self, commit):
+        """Returns whether the ancestors of `commit` are in the index."""
+        node = self._ids.get(str(commit))
+        return node is not None and bool(self._loaded[node])
+
+    def merge_base(self, left, right):
+        """Returns the hash of the best common ancestor of two commits or branches, or `None` if there is none."""
+        hashes = self.resolve(left, right)
+        if not hashes:
+            return None
+        with self._lock:
+            self.load(*hashes)
+            left, right = (self._ids[h] for h in hashes)
+            bases = self._merge_bases(left, right)
+            return self._hashes[bases[0]] if bases else None
+
+    def only(self, include, exclude):
+        """Returns the hashes of the commits reachable from `include` but not from `exclude`, newest first."""
+        hashes = self.resolve(include, exclude)
+        if not hashes:
+            return None
+        with self._lock:
+            self.load(*hashes)
+            include, exclude = (self._ids[h] for h in hashes)
+            return [self._hashes[node] for node in self._only(include, exclude)]
+
+    def ahead_behind(self, commit, base):
+        """Returns the number of commits that `commit` is ahead and behind `base`."""
+        hashes = self.resolve(commit, base)
+        if not hashes:
+            return None
+        with self._lock:
+            self.load(*hashes)
+            commit, base = (self._ids[h] for h in hashes)
+            return len(self._only(commit, base)), len(self._only(base, commit))
+
+    @staticmethod
+    def resolve(*refs):
+        """Returns the commit hashes of commit hashes or branch names, or `None` if any of them is unknown."""
+        refs = [str(ref) for ref in refs]
+        names = {ref for ref in refs if not is_commit_hash(ref)}
+        if not names:
+            return refs
+        with connection.cursor() as cursor:
+            placeholders = ", ".join(["%s"] * len(names))
+            cursor.execute(f"SELECT name, hash FROM dolt_branches WHERE name IN ({placeholders})", list(names))
+            branches = dict(cursor.fetchall())
+        if not names.issubset(branches):
+            return None
+        return [branches.get(ref, ref) for ref in refs]
+
+    def load(self, *hashes):
+        """Loads the ancestors of `hashes` into the index."""
+        with self._lock:
+            if not self._hashes:
+                # the first load reads the whole graph in a single scan
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT commit_hash, parent_hash, parent_index FROM dolt_commit_ancestors")
+                    self._add(cursor.fetchall())
+
+            frontier = {h for h in hashes if h not in self}
+            while frontier:
+                # walk back from unknown commits until every parent is known
+                with connection.cursor() as cursor:
+                    placeholders = ", ".join(["%s"] * len(frontier))
+                    cursor.execute(
+                        f"""SELECT commit_hash, parent_hash, parent_index
+                            FROM dolt_commit_ancestors
+                            WHERE commit_hash IN ({placeholders})""",  # nosec
+                        list(frontier),
+                    )
+                    rows = cursor.fetchall()
+                self._add(rows)
+                for commit in frontier:
+                    # commits without ancestors rows are roots, or unknown to Dolt
+                    self._loaded[self._node(commit)] = 1
+                frontier = {parent for _, parent, _ in rows if parent and parent not in self}
+
+            for commit in hashes:
+                self._generation(self._node(commit))
+
+    def clear(self):
+        """Removes every commit from the index."""
+        with self._lock:
+            self._reset()
+
+    def _node(self, commit):
+        """Returns the number of `commit`, adding it to the index if it is new."""
+        node = self._ids.get(commit)
+        if node is None:
+            node = len(self._hashes)
+            self._ids[commit] = node
+            self._hashes.append(commit)
+            self._first_parents.append(-1)
+            self._second_parents.append(-1)
+            self._generations.append(0)
+            self._loaded.append(0)
+        return node
+
+    def _add(self, rows):
+        """Adds (commit_hash, parent_hash, parent_index) rows to the index."""
+        for commit, parent, parent_index in rows:
+            node = self._node(commit)
+            self._loaded[node] = 1
+            if not parent:
+                continue
+            parents = self._first_parents if parent_index == 0 else self._second_parents
+            parents[node] = self._node(parent)
+
+    def _parents(self, node):
+        """Returns the numbers of the parents of `node`."""
+        return [p for p in (self._first_parents[node], self._second_parents[node]) if p >= 0]
+
+    def _generation(self, node):
+        """Returns the generation number of `node`, computing it and those of its ancestors if needed."""
+        stack = [node]
+        while stack:
+            top = stack[-1]
+            if self._generations[top]:
+                stack.pop()
+                continue
+            pending = [p for p in self._parents(top) if not self._generations[p]]
+            if pending:
+                stack.extend(pending)
+                continue
+            self._generations[top] = 1 + max((self._generations[p] for p in self._parents(top)), default=0)
+            stack.pop()
+        return self._generations[node]
+
+    def _paint(self, starts, flags, stop):
+        """
+        Walks the graph from `starts` newest generation first, propagating painting flags to parents.
+
+        `stop(node, flags)` is called on each visited node and returns the flags to pass on to its
+        parents. The walk ends once every commit left to visit is stale.
+        """
+        queue = [(-self._generations[node], node) for node in starts]
+        heapq.heapify(queue)
+        while any(not flags[node] & _STALE for _, node in queue):
+            _, node = heapq.heappop(queue)
+            propagate = stop(node, flags)
+            for parent in self._parents(node):
+                if flags.get(parent, 0) & propagate == propagate:
+                    continue
+                flags[parent] = flags.get(parent, 0) | propagate
+                heapq.heappush(queue, (-self._generations[parent], parent))
+
+    def _merge_bases(self, left, right):
+        """Returns the numbers of the best common ancestors of two commits, newest first."""
+        if left == right:
+            return [left]
+        flags = {left: _LEFT, right: _RIGHT}
+        results = []
+
+        def stop(node, flags):
+            if flags[node] & (_LEFT | _RIGHT) == _LEFT | _RIGHT and not flags[node] & _STALE:
+                # ancestors of a common ancestor are not the best common ancestor
+                results.append(node)
+                flags[node] |= _STALE
+            return flags[node]
+
+        self._paint([left, right], flags, stop)
+        return results
+
+    def _only(self, include, exclude):
+        """Returns the numbers of the commits reachable from `include` but not from `exclude`, newest first."""
+        if include == exclude:
+            return []
+        flags = {include: _LEFT, exclude: _RIGHT | _STALE}
+        results = []
+
+        def stop(node, flags):
+            if not flags[node] & _STALE:
+                results.append(node)
+            return flags[node]
+
+        self._paint([include, exclude], flags, stop)
+        # commits are only reported once every newer commit has been visited,
+        # so those also reachable from `exclude` were marked stale in time
+        return [node for node in results if not flags[node] & _STALE]
+
+
+commit_graph = CommitGraph()
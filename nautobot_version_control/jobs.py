@@ -0,0 +1,56 @@
+"""Jobs.py contains the Nautobot Jobs of the nautobot version control plugin."""
+
+from nautobot.core.celery import register_jobs
+from nautobot.extras.jobs import BooleanVar, IntegerVar, Job
+
+from nautobot_version_control.retention import collect_merge_candidates
+
+
+class CollectMergeCandidates(Job):
+    """CollectMergeCandidates deletes the merge candidate branches that are past their retention policy."""
+
+    max_count = IntegerVar(
+        required=False,
+        min_value=0,
+        description="Number of most recently built candidates to keep, defaults to `merge_candidate_max_count`.",
+    )
+    max_age = IntegerVar(
+        required=False,
+        min_value=0,
+        description="Number of seconds after which a candidate is deleted, defaults to `merge_candidate_max_age`.",
+    )
+    grace_period = IntegerVar(
+        required=False,
+        min_value=0,
+        description="Number of seconds after a candidate was built during which it is kept, "
+        "defaults to `merge_candidate_gc_grace_period`.",
+    )
+    dry_run = BooleanVar(default=False, description="List the branches without deleting them.")
+    dolt_gc = BooleanVar(default=False, description="Run dolt_gc() to free the storage afterwards.")
+
+    class Meta:
+        """Meta class."""
+
+        name = "Collect merge candidates"
+        description = "Delete the merge candidate branches that are past their retention policy."
+        has_sensitive_variables = False
+
+    def run(
+        self, max_count=None, max_age=None, grace_period=None, dry_run=False, dolt_gc=False
+    ):  # pylint: disable=arguments-differ,too-many-arguments
+        """Deletes the merge candidates and reports the branches and bytes reclaimed."""
+        result = collect_merge_candidates(
+            max_count=max_count, max_age=max_age, grace_period=grace_period, dry_run=dry_run, dolt_gc=dolt_gc
+        )
+        if dry_run:
+            self.logger.info("Would delete %s merge candidate branches: %s", len(result["deleted"]), result["deleted"])
+            return result
+        for name in result["failed"]:
+            self.logger.warning("Failed to delete %s", name)
+        reclaimed = "an unknown number of" if result["bytes"] is None else result["bytes"]
+        self.logger.info("Reclaimed %s branches and %s bytes.", len(result["deleted"]), reclaimed)
+        return result
+
+
+jobs = [CollectMergeCandidates]
+register_jobs(*jobs)
@@ -0,0 +1,42 @@
+"""Management command to delete the merge candidate branches that are no longer needed."""
+
+from django.core.management.base import BaseCommand
+
+from nautobot_version_control.retention import collect_merge_candidates
+
+
+class Command(BaseCommand):
+    """Delete the merge candidate branches that are no longer needed."""
+
+    help = "Delete the merge candidate branches that are past their retention policy."
+
+    def add_arguments(self, parser):
+        """Adds arguments overriding the `merge_candidate_*` plugin settings."""
+        parser.add_argument("--max-count", type=int, help="Number of most recently built candidates to keep.")
+        parser.add_argument("--max-age", type=int, help="Number of seconds after which a candidate is deleted.")
+        parser.add_argument("--batch-size", type=int, help="Number of branches deleted per query.")
+        parser.add_argument(
+            "--grace-period", type=int, help="Number of seconds after a candidate was built during which it is kept."
+        )
+        parser.add_argument("--dry-run", action="store_true", help="List the branches without deleting them.")
+        parser.add_argument("--dolt-gc", action="store_true", help="Run dolt_gc() to free the storage afterwards.")
+
+    def handle(self, *args, **kwargs):
+        """Deletes the merge candidates and reports the branches and bytes reclaimed."""
+        result = collect_merge_candidates(
+            max_count=kwargs["max_count"],
+            max_age=kwargs["max_age"],
+            batch_size=kwargs["batch_size"],
+            grace_period=kwargs["grace_period"],
+            dry_run=kwargs["dry_run"],
+            dolt_gc=kwargs["dolt_gc"],
+        )
+        if kwargs["dry_run"]:
+            for name in result["deleted"]:
+                self.stdout.write(f"would delete {name}")
+            self.stdout.write(f"Would reclaim {len(result['deleted'])} branches.")
+            return
+        for name in result["failed"]:
+            self.stderr.write(f"failed to delete {name}")
+        reclaimed = "an unknown number of" if result["bytes"] is None else result["bytes"]
+        self.stdout.write(f"Reclaimed {len(result['deleted'])} branches and {reclaimed} bytes.")
@@ -1,28 +1,50 @@
 """Merge.py contains utilities for the merging two branches and detecting any conflicts."""
 
+import base64
+import binascii
+from contextlib import contextmanager
 import json
+import logging
 
-from django.core.exceptions import ObjectDoesNotExist
-from django.db import connection
-from django.db.models import Sum
-from django.contrib.contenttypes.models import ContentType
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.db import connection, connections, DatabaseError, DEFAULT_DB_ALIAS, transaction
+from django.db.models import Q, Sum
 from django.utils.safestring import mark_safe
 
+from nautobot_version_control.cache import schema_cache
+from nautobot_version_control.catalogue import catalogue
 from nautobot_version_control.models import (
     Branch,
     Conflicts,
     ConstraintViolations,
-    Commit,
+    MergeCandidate,
+    PullRequest,
+)
+from nautobot_version_control.utils import (
+    active_branch_db,
+    author_from_user,
+    db_for_branch,
+    get_plugin_setting,
 )
-from nautobot_version_control.utils import author_from_user, query_on_branch
 from nautobot_version_control.tables import (
     ConflictsTable,
     ConstraintViolationsTable,
+    ResolvableConflictsTable,
 )
 
 
 # TODO: this file should be named "conflicts.py"
 
+logger = logging.getLogger(__name__)
+
+MERGE_CANDIDATE_PREFIX = "xxx-merge-candidate--"
+MERGE_PENDING_PREFIX = "nautobot_version_control.merge_pending"
+
+# the kinds of row-level conflicts
+CONFLICT = "conflict"
+VIOLATION = "violation"
+
 
 def get_conflicts_count_for_merge(src, dest):
     """
@@ -33,36 +55,147 @@ def get_conflicts_count_for_merge(src, dest):
         constraint violations.
     """
     try:
-        merge_candidate = get_or_make_merge_candidate(src, dest)
-        with query_on_branch(merge_candidate):
-            _conflicts = Conflicts.objects.all().aggregate(Sum("num_conflicts"))
-            violations = ConstraintViolations.objects.all().aggregate(Sum("num_violations"))
-            num_conflicts = _conflicts["num_conflicts__sum"] if _conflicts["num_conflicts__sum"] else 0
-            num_violations = violations["num_violations__sum"] if violations["num_violations__sum"] else 0
-            return num_conflicts + num_violations
+        summary = compute_merge_summary(src, dest)
+        return summary["conflicts"] + summary["violations"]
     except Exception:  # pylint: disable=broad-except
         # best effort
         # TODO: fix dolt merge bug
         return 0
 
 
-def get_conflicts_for_merge(src, dest):
+def compute_merge_summary(src, dest):
+    """Previews the merge of `src` into `dest`, or gathers a merge-candidate, then returns its conflict counts."""
+    meta = get_merge_candidate_meta(src, dest)
+    if meta is not None:
+        return meta.summary
+    summary = _previewed(preview_merge_summary, src, dest)
+    if summary is None:
+        make_merge_candidate(src, dest)
+        return MergeCandidate.objects.get(branch=_merge_candidate_name(src, dest)).summary
+    record_merge_candidate(src, dest, summary["conflicts"], summary["violations"])
+    return summary
+
+
+@contextmanager
+def merge_preview(src, dest):
     """
-    Gather a merge-candidate for `src` and `dest`, then return Conflicts created by the merge.
+    Merges `src` into `dest` in a transaction that is rolled back, without creating a branch or a commit.
 
-    TODO: currently we return conflicts summary,
-        we need granular row-level conflicts and
-        constraint violations.
+    Yields the database alias of `dest`, on which the conflicts and constraint
+    violations of the merge can be queried until the transaction is rolled back.
     """
+    using = db_for_branch(dest.name)
+    with transaction.atomic(using=using):
+        try:
+            with connections[using].cursor() as cursor:
+                # conflicts are left in the working set, as autocommit is off
+                cursor.execute("""CALL dolt_merge('--no-ff', '--no-commit', %s);""", [src.hash])
+            yield using
+        finally:
+            transaction.set_rollback(True, using=using)
+
+
+def preview_merge_summary(src, dest):
+    """Returns the number of conflicts and violations of merging `src` into `dest`, without a merge candidate."""
+    with merge_preview(src, dest) as using:
+        return _merge_summary(using)
+
+
+def _merge_summary(using):
+    """Returns the number of conflicts and violations of the merge in progress on the database alias `using`."""
+    num_conflicts = Conflicts.objects.using(using).aggregate(Sum("num_conflicts"))["num_conflicts__sum"]
+    num_violations = ConstraintViolations.objects.using(using).aggregate(Sum("num_violations"))["num_violations__sum"]
+    return {"conflicts": num_conflicts or 0, "violations": num_violations or 0}
+
+
+def _previewed(func, src, dest):
+    """Returns `func(src, dest)` if merges are previewed, or `None` to fall back to a merge candidate."""
+    if not get_plugin_setting("merge_preview"):
+        return None
     try:
-        merge_candidate = get_or_make_merge_candidate(src, dest)
-        with query_on_branch(merge_candidate):
-            conflicts = MergeConflicts(src, dest)
-            return {
-                "summary": conflicts.make_conflict_summary_table(),
-                "conflicts": conflicts.make_conflict_table(),
-                "violations": conflicts.make_constraint_violations_table(),
-            }
+        return func(src, dest)
+    except DatabaseError:
+        # the server can't merge in a transaction, or `dest` has uncommitted changes
+        logger.warning("failed to preview the merge of %s into %s", src, dest, exc_info=True)
+        return None
+
+
+def get_merge_summary(src, dest):
+    """
+    Returns the number of conflicts and violations of merging `src` into `dest`.
+
+    Summaries are computed in a background task whenever the head of `src` or `dest`
+    changes. Returns `None` while the summary of the current heads is being computed.
+    """
+    meta = get_merge_candidate_meta(src, dest)
+    if meta is not None:
+        return meta.summary
+    if not get_plugin_setting("merge_candidate_background"):
+        try:
+            return compute_merge_summary(src, dest)
+        except Exception:  # pylint: disable=broad-except
+            # best effort
+            return {"conflicts": 0, "violations": 0}
+    schedule_merge_summary(src, dest)
+    return None
+
+
+def schedule_merge_summary(src, dest):
+    """Enqueues a background task computing the merge summary of `src` and `dest`, unless one is in flight."""
+    cache = _merge_pending_cache()
+    pending = _merge_pending_key(src, dest)
+    if not cache.add(pending, True, get_plugin_setting("merge_candidate_task_timeout")):
+        # a task is in flight for these heads
+        return
+    from nautobot_version_control.tasks import build_merge_candidate  # pylint: disable=import-outside-toplevel
+
+    try:
+        build_merge_candidate.delay(src.name, dest.name, src.hash, dest.hash)
+    except Exception:  # pylint: disable=broad-except
+        # retry on the next page load
+        cache.delete(pending)
+        logger.exception("failed to enqueue the merge candidate of %s and %s", src, dest)
+
+
+def schedule_merge_summaries(branch):
+    """
+    Enqueues background tasks computing the merge summaries of open pull requests from or into `branch`.
+
+    Called by `branch_head_changed` when `merge_candidate_background` is enabled.
+    """
+    branch = str(branch)
+    if branch.startswith(MERGE_CANDIDATE_PREFIX):
+        return
+    try:
+        pull_requests = PullRequest.objects.filter(state=PullRequest.OPEN).filter(
+            Q(source_branch=branch) | Q(destination_branch=branch)
+        )
+        for pull_request in pull_requests:
+            schedule_merge_summary(*pull_request.get_src_dest_branches())
+    except Exception:  # pylint: disable=broad-except
+        # best effort, summaries are also scheduled when a pull request is viewed
+        logger.exception("failed to schedule the merge candidates of %s", branch)
+
+
+def clear_merge_summary(src_hash, dest_hash):
+    """Marks the merge summary of two heads as no longer in flight."""
+    _merge_pending_cache().delete(_merge_pending_key(src_hash, dest_hash))
+
+
+def get_conflicts_for_merge(
+    src, dest, table=None, conflicts_after=None, violations_after=None, resolvable=False
+):  # pylint: disable=too-many-arguments
+    """
+    Returns the conflict summary of merging `src` into `dest`, and a page of the row-level conflicts of one table.
+
+    `table` defaults to the first table with conflicts, or else with constraint violations.
+    Pages of conflicts and of violations start after the encoded cursors `conflicts_after`
+    and `violations_after`, the cursors of the next pages are returned with the tables.
+    Conflicts can be selected for resolution if `resolvable` is true.
+    """
+    try:
+        with merge_conflicts(src, dest) as conflicts:
+            return _conflict_tables(conflicts, table, conflicts_after, violations_after, resolvable)
 
     except Exception:  # pylint: disable=broad-except
         # best effort
@@ -70,55 +203,177 @@ def get_conflicts_for_merge(src, dest):
         return {}
 
 
+@contextmanager
+def merge_conflicts(src, dest):
+    """
+    Yields the MergeConflicts of merging `src` into `dest`.
+
+    The merge is read from its merge candidate branch if one was built, which holds any
+    partial resolution of its conflicts. Otherwise the merge is previewed in a transaction
+    that is rolled back on exit, or else a merge candidate branch is built. Rows can be read
+    chunk by chunk until the context is exited.
+    """
+    merge_candidate = get_merge_candidate(src, dest)
+    if merge_candidate is None and get_plugin_setting("merge_preview"):
+        previewed = False
+        try:
+            with merge_preview(src, dest) as using:
+                previewed = True
+                yield MergeConflicts(src, dest, using=using)
+            return
+        except DatabaseError:
+            if previewed:
+                raise
+            # the server can't merge in a transaction, or `dest` has uncommitted changes
+            logger.warning("failed to preview the merge of %s into %s", src, dest, exc_info=True)
+    merge_candidate = merge_candidate or get_or_make_merge_candidate(src, dest)
+    yield MergeConflicts(src, dest, merge_candidate=merge_candidate, using=db_for_branch(merge_candidate.name))
+
+
+def _conflict_tables(
+    conflicts, table=None, conflicts_after=None, violations_after=None, resolvable=False
+):  # pylint: disable=too-many-arguments
+    """Returns the summary of a MergeConflicts, and a page of the conflicts and violations tables of `table`."""
+    summary = conflicts.make_conflict_summary_table()
+    counts = {tbl["table"]: tbl for tbl in summary}
+    if table not in counts:
+        with_conflicts = [tbl["table"] for tbl in summary if tbl["num_conflicts"]]
+        table = (with_conflicts or list(counts) or [None])[0]
+
+    pages = {}
+    for kind, after in ((CONFLICT, conflicts_after), (VIOLATION, violations_after)):
+        rows, next_key = [], None
+        after_key = _decode_page_cursor(after)
+        if table is not None and counts[table][f"num_{kind}s"]:
+            rows, next_key = conflicts.page(kind, table, after_key)
+        pages[kind] = (
+            rows,
+            after if after_key is not None else None,
+            encode_cursor(next_key) if next_key is not None else None,
+        )
+
+    return {
+        "summary": summary,
+        "table": table,
+        "num_conflicts": sum(tbl["num_conflicts"] for tbl in summary),
+        "num_violations": sum(tbl["num_violations"] for tbl in summary),
+        "conflicts": (ResolvableConflictsTable if resolvable else ConflictsTable)(pages[CONFLICT][0]),
+        "conflicts_after": pages[CONFLICT][1],
+        "conflicts_next": pages[CONFLICT][2],
+        "violations": ConstraintViolationsTable(pages[VIOLATION][0]),
+        "violations_after": pages[VIOLATION][1],
+        "violations_next": pages[VIOLATION][2],
+    }
+
+
+def _decode_page_cursor(value):
+    """Returns the key of a page cursor from a query string, or `None` for the first page."""
+    if not value:
+        return None
+    try:
+        return decode_cursor(value)
+    except ValueError:
+        return None
+
+
+def encode_cursor(cursor):
+    """Encodes a JSON-serializable keyset cursor as an opaque url-safe string."""
+    return base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+
+
+def decode_cursor(value):
+    """Decodes a cursor encoded by `encode_cursor`, raises ValueError if it is invalid."""
+    try:
+        return json.loads(base64.urlsafe_b64decode(value.encode()))
+    except (binascii.Error, TypeError, ValueError) as err:
+        raise ValueError(f"invalid cursor {value}") from err
+
+
 def merge_candidate_exists(src, dest):
     """Returns true if there exist a merge_candidate branch between src and dest."""
-    name = _merge_candidate_name(src, dest)
-    try:
-        merge_candidate = Branch.objects.get(name=name)
-        return merge_candidate_is_fresh(merge_candidate, src, dest)
-    except Branch.DoesNotExist:
-        return False
+    return get_merge_candidate_meta(src, dest) is not None
 
 
-def merge_candidate_is_fresh(merge_candidate, src, dest):
-    """A merge candidate (MC) is considered "fresh" if the source and destination branches used to create the MC are unchanged since the MC was created."""
-    if not merge_candidate:
-        return False
-    src_stable = Commit.merge_base(merge_candidate, src) == src.hash
-    dest_stable = Commit.merge_base(merge_candidate, dest) == dest.hash
-    return src_stable and dest_stable
+def merge_candidate_is_fresh(meta, src, dest):
+    """A merge candidate (MC) is considered "fresh" if the source and destination heads are those it was built from."""
+    return meta is not None and meta.is_fresh(src, dest)
+
+
+def get_merge_candidate_meta(src, dest):
+    """Returns the MergeCandidate of the branches `src` and `dest` if it is fresh."""
+    meta = MergeCandidate.objects.filter(branch=_merge_candidate_name(src, dest)).first()
+    return meta if merge_candidate_is_fresh(meta, src, dest) else None
 
 
 def get_merge_candidate(src, dest):
-    """Returns a merge candidate branch if it exists."""
-    if merge_candidate_exists(src, dest):
-        name = _merge_candidate_name(src, dest)
-        return Branch.objects.get(name=name)
-    return None
+    """Returns the merge candidate branch of `src` and `dest` if it was built from their current heads."""
+    meta = get_merge_candidate_meta(src, dest)
+    if meta is None or not meta.built:
+        # previewed merges don't update the branch, which may hold the merge of older heads
+        return None
+    try:
+        return Branch.objects.get(name=meta.branch)
+    except Branch.DoesNotExist:
+        # the branch was deleted
+        return None
 
 
 def make_merge_candidate(src, dest):
-    """Create a merge candidate branch between src and dest."""
+    """Create a merge candidate branch between src and dest, and record the heads it was built from."""
     name = _merge_candidate_name(src, dest)
-    # force updates the merge-candidate branch
-    Branch(name=name, starting_branch=dest).save()
     with connection.cursor() as cursor:
+        # the branch checked out by the session, which isn't the active branch in the "alias" `branch_routing` mode
+        cursor.execute("SELECT active_branch();")
+        prev = cursor.fetchone()[0]
+        # force updates the merge-candidate branch, the recorded heads are merged
+        # even if either branch moves while the merge candidate is built.
+        cursor.execute("""CALL dolt_branch('--force', %s, %s);""", [name, dest.hash])
         cursor.execute("SET @@dolt_force_transaction_commit = 1;")
         cursor.execute("""CALL dolt_checkout(%s);""", [name])
-        cursor.execute("""CALL dolt_merge(%s);""", [src])
-        cursor.execute("""CALL dolt_add("-A");""")
-        msg = f"""creating merge candidate with src: "{src}" and dest: "{dest}"."""
-        cursor.execute(  # TODO: not safe
-            f"""CALL dolt_commit(
-                    '--force',
-                    '--all',
-                    '--allow-empty',
-                    '--message', '{msg}',
-                    '--author', '{author_from_user(None)}');"""
-        )
+        try:
+            cursor.execute("""CALL dolt_merge(%s);""", [src.hash])
+            cursor.execute("""CALL dolt_add("-A");""")
+            msg = f"""creating merge candidate with src: "{src}" and dest: "{dest}"."""
+            cursor.execute(  # TODO: not safe
+                f"""CALL dolt_commit(
+                        '--force',
+                        '--all',
+                        '--allow-empty',
+                        '--message', '{msg}',
+                        '--author', '{author_from_user(None)}');"""
+            )
+            summary = _merge_summary(DEFAULT_DB_ALIAS)
+        finally:
+            # check the session's branch back out, the request's active branch and the router still expect it
+            cursor.execute("""CALL dolt_checkout(%s);""", [prev])
+    record_merge_candidate(src, dest, summary["conflicts"], summary["violations"], built=True)
     return Branch.objects.get(name=name)
 
 
+def record_merge_candidate(
+    src, dest, num_conflicts, num_violations, built=False, resolving=False
+):  # pylint: disable=too-many-arguments
+    """
+    Records the heads the merge of `src` into `dest` was computed from, and its conflict counts.
+
+    `built` is true if the merge candidate branch holds the merge of these heads, rather than
+    the merge being previewed. `resolving` is true if some of its conflicts were resolved.
+    """
+    MergeCandidate.objects.update_or_create(
+        branch=_merge_candidate_name(src, dest),
+        defaults={
+            "source_branch": src.name,
+            "destination_branch": dest.name,
+            "source_hash": src.hash,
+            "destination_hash": dest.hash,
+            "num_conflicts": num_conflicts,
+            "num_violations": num_violations,
+            "built": built,
+            "resolving": resolving,
+        },
+    )
+
+
 def get_or_make_merge_candidate(src, dest):
     """Gets or creates a merge candidate branch between src and dest."""
     merge_candidate = get_merge_candidate(src, dest)
@@ -129,73 +384,176 @@ def get_or_make_merge_candidate(src, dest):
 
 def _merge_candidate_name(src, dest):
     """Returns the formatted name of a merge candidate branch."""
-    return f"xxx-merge-candidate--{src}--{dest}"
+    return f"{MERGE_CANDIDATE_PREFIX}{src}--{dest}"
+
+
+def _merge_pending_cache():
+    """Returns the Django cache marking merge candidates in flight, shared with the diff cache."""
+    return caches[get_plugin_setting("diff_cache_alias")]
+
+
+def _merge_pending_key(src, dest):
+    """Returns the cache key marking the merge candidate of the heads of `src` and `dest` in flight."""
+    src_hash = getattr(src, "hash", src)
+    dest_hash = getattr(dest, "hash", dest)
+    return f"{MERGE_PENDING_PREFIX}.{src_hash}.{dest_hash}"
 
 
 class MergeConflicts:
     """Must run under the mc branch."""
 
-    def __init__(self, src, dest):
+    # number of ids per query when looking up the names of conflicted objects
+    name_chunk_size = 1000
+
+    def __init__(self, src, dest, merge_candidate=None, using=None):
         """Inits the class vars."""
         self.src = src
         self.dest = dest
-        self.model_map = self._model_map()
-
-    @staticmethod
-    def _model_map():
-        return {ct.model_class()._meta.db_table: ct.model_class() for ct in ContentType.objects.all()}
+        # the commit of the mc branch lets conflict table schemas be cached
+        self.commit = merge_candidate.hash if merge_candidate else None
+        # the database alias the merge is visible on, e.g. that of a merge preview
+        self.using = using or active_branch_db()
+        self.model_map = catalogue.models_by_table
+
+    @property
+    def chunk_size(self):
+        """Returns the number of conflict rows fetched per query."""
+        return get_plugin_setting("conflict_chunk_size")
+
+    def conflicted_tables(self):
+        """Returns the names of the tables with conflicts, in order."""
+        return list(Conflicts.objects.using(self.using).order_by("table").values_list("table", flat=True))
+
+    def violated_tables(self):
+        """Returns the names of the tables with constraint violations, in order."""
+        violations = ConstraintViolations.objects.using(self.using)
+        return list(violations.order_by("table").values_list("table", flat=True))
 
     def make_conflict_summary_table(self):
         """Creates the conflict summary table for merge conflicts."""
-        conflicts = Conflicts.objects.all()
-        violations = ConstraintViolations.objects.all()
+        conflicts = Conflicts.objects.using(self.using).order_by("table")
+        violations = ConstraintViolations.objects.using(self.using).order_by("table")
         summary = {
             c.table: {
+                "table": c.table,
                 "model": self._model_from_table(c.table),
                 "num_conflicts": c.num_conflicts,
+                "num_violations": 0,
             }
             for c in conflicts
         }
         for val in violations:
             if val.table not in summary:
-                summary[val.table] = {"model": self._model_from_table(val.table)}
+                summary[val.table] = {
+                    "table": val.table,
+                    "model": self._model_from_table(val.table),
+                    "num_conflicts": 0,
+                }
             summary[val.table]["num_violations"] = val.num_violations
         return list(summary.values())
 
     def make_conflict_table(self):
         """Create a table that represents conflicts on a table between src and dest."""
         rows = []
-        for conflict in Conflicts.objects.all():
-            rows.extend(self.get_rows_level_conflicts(conflict))
+        for table in self.conflicted_tables():
+            for chunk in self.chunks(CONFLICT, table):
+                rows.extend(chunk)
         return ConflictsTable(rows)
 
     def make_constraint_violations_table(self):
         """Creates a table to store constraint violations between two tables."""
         rows = []
-        for val in ConstraintViolations.objects.all():
-            rows.extend(self.get_rows_level_violations(val))
+        for table in self.violated_tables():
+            for chunk in self.chunks(VIOLATION, table):
+                rows.extend(chunk)
         return ConstraintViolationsTable(rows)
 
+    def page(self, kind, table, after=None):
+        """Returns a page of the `kind` rows of a table after the key `after`, and the next page key or `None`."""
+        limit = self.chunk_size
+        rows = self._fetch(kind)(table, after, limit + 1)
+        if len(rows) > limit:
+            return rows[:limit], rows[limit - 1]["key"]
+        return rows, None
+
+    def chunks(self, kind, table, after=None, chunk_size=None):
+        """Yields chunks of the `kind` rows of a table, ordered by key, starting after the key `after`."""
+        fetch = self._fetch(kind)
+        chunk_size = chunk_size or self.chunk_size
+        while True:
+            chunk = fetch(table, after, chunk_size)
+            if chunk:
+                yield chunk
+            if len(chunk) < chunk_size:
+                return
+            after = chunk[-1]["key"]
+
+    def records(self, cursor=None, table=None, chunk_size=None):
+        """
+        Yields the conflict rows, then the constraint violation rows, of every table.
+
+        Rows are ordered by table and then by key, starting after `cursor`, a dict holding
+        the kind, table and key of the last row read. `table` limits the rows to one table.
+        """
+        for kind, tables in ((CONFLICT, self.conflicted_tables()), (VIOLATION, self.violated_tables())):
+            for tbl in tables:
+                if table and tbl != table:
+                    continue
+                after = None
+                if cursor:
+                    if (kind, tbl) != (cursor["kind"], cursor["table"]):
+                        # tables before the cursor were read by previous pages
+                        continue
+                    after = cursor["key"]
+                    cursor = None
+                for chunk in self.chunks(kind, tbl, after, chunk_size):
+                    yield from chunk
+
+    def _fetch(self, kind):
+        """Returns the method fetching the rows of a kind of conflict."""
+        return self.conflict_rows if kind == CONFLICT else self.violation_rows
+
     def get_rows_level_conflicts(self, conflict):
         """Returns each conflict row in a table as a JSON object."""
-        with connection.cursor() as cursor:
-            # introspect table schema to query conflict data as json
-            cursor.execute(f"DESCRIBE dolt_conflicts_{conflict.table}")  # TODO: not safe
-            fields = ",".join([f"'{tup[0]}', {tup[0]}" for tup in cursor.fetchall()])
-
+        return [row for chunk in self.chunks(CONFLICT, conflict.table) for row in chunk]
+
+    def conflict_rows(self, table, after=None, limit=None):
+        """
+        Returns up to `limit` conflict rows of a table, ordered by primary key, after the primary key `after`.
+
+        Rows are read with keyset pagination on the primary key of the conflicted row,
+        whichever of the base, our or their row exists.
+        """
+        # introspect table schema to query conflict data as json
+        cols = schema_cache.columns(f"dolt_conflicts_{table}", commit=self.commit, using=self.using)
+        fields = ",".join([f"'{col}', {col}" for col in cols])
+        where, params = "", []
+        if after is not None:
+            where = "WHERE COALESCE(base_id, our_id, their_id) > %s"
+            params.append(after)
+        params.append(limit or self.chunk_size)
+        with connections[self.using].cursor() as cursor:
             cursor.execute(  # TODO: not safe
-                f"""SELECT base_id, JSON_OBJECT({fields})
-                    FROM dolt_conflicts_{conflict.table};"""  # nosec
+                f"""SELECT COALESCE(base_id, our_id, their_id), JSON_OBJECT({fields})
+                    FROM dolt_conflicts_{table} {where}
+                    ORDER BY COALESCE(base_id, our_id, their_id)
+                    LIMIT %s;""",  # nosec
+                params,
             )
-            model_name = self._model_from_table(conflict.table)
-            return [
-                {
-                    "model": model_name,
-                    "id": self._object_name_from_id(conflict.table, tup[0]),
-                    "conflicts": self._transform_conflicts_obj(tup[1]),
-                }
-                for tup in cursor.fetchall()
-            ]
+            rows = cursor.fetchall()
+        model_name = self._model_from_table(table)
+        names = self._object_names_from_ids(table, [tup[0] for tup in rows])
+        return [
+            {
+                "kind": CONFLICT,
+                "table": table,
+                "key": tup[0],
+                "model": model_name,
+                "id": names.get(tup[0], tup[0]),
+                "conflicts": self._transform_conflicts_obj(tup[1]),
+            }
+            for tup in rows
+        ]
 
     def _transform_conflicts_obj(self, obj):
         if isinstance(obj, str):
@@ -221,38 +579,77 @@ class MergeConflicts:
 
     def get_rows_level_violations(self, violation):
         """Returns each constrain violation in a JSON row."""
-        with connection.cursor() as cursor:
-            rows = []
-            model_name = self._model_from_table(violation.table)
+        return [row for chunk in self.chunks(VIOLATION, violation.table) for row in chunk]
+
+    def violation_rows(self, table, after=None, limit=None):
+        """
+        Returns up to `limit` constraint violation rows of a table after the key `after`.
+
+        A row can violate several constraints, even several of the same type, e.g. two foreign
+        keys. Rows are keyed and ordered by their primary key, the violation type and then
+        the violation info, which tells violations of the same type apart.
+        """
+        info = "CAST(violation_info AS CHAR)"
+        where, params = "", []
+        if after is not None:
+            # cursors of older pages only hold the primary key and violation type
+            pk, v_type, v_info = (list(after) + [""])[:3]
+            where = f"""WHERE id > %s OR (id = %s AND violation_type > %s)
+                OR (id = %s AND violation_type = %s AND {info} > %s)"""
+            params.extend([pk, pk, v_type, pk, v_type, v_info])
+        params.append(limit or self.chunk_size)
+        with connections[self.using].cursor() as cursor:
             cursor.execute(  # TODO: not safe
                 mark_safe(
-                    """SELECT id, violation_type, violation_info
-                    FROM dolt_constraint_violations_{violation.table};"""
-                )
+                    f"""SELECT id, violation_type, {info}
+                    FROM dolt_constraint_violations_{table} {where}
+                    ORDER BY id, violation_type, {info}
+                    LIMIT %s;"""  # nosec
+                ),
+                params,
+            )
+            v_rows = cursor.fetchall()
+        model_name = self._model_from_table(table)
+        names = self._object_names_from_ids(table, [v_row[0] for v_row in v_rows])
+        rows = []
+        for v_row in v_rows:
+            obj_name = names.get(v_row[0], v_row[0])
+            rows.append(
+                {
+                    "kind": VIOLATION,
+                    "table": table,
+                    "key": [v_row[0], v_row[1], v_row[2]],
+                    "model": model_name,
+                    "id": obj_name,
+                    "violation_type": v_row[1],
+                    "violations": self._fmt_violation(v_row, model_name, obj_name),
+                }
             )
-            for v_row in cursor.fetchall():
-                obj_name = self._object_name_from_id(violation.table, v_row[0])
-                rows.append(
-                    {
-                        "model": model_name,
-                        "id": obj_name,
-                        "violation_type": v_row[1],
-                        "violations": self._fmt_violation(v_row, model_name, obj_name),
-                    }
-                )
-            return rows
+        return rows
 
     def _model_from_table(self, tbl_name):
         model = self.model_map[tbl_name]
-        return model._meta.verbose_name
+        return str(model._meta.verbose_name)
 
-    def _object_name_from_id(self, tbl_name, id_):
-        try:
-            model = self.model_map[tbl_name]
-            obj = model.objects.get(id=id_)
-            return str(obj)
-        except ObjectDoesNotExist:
-            return id_
+    def _object_names_from_ids(self, tbl_name, ids):
+        """Returns the names of the objects of a table by id, `name_chunk_size` ids per query."""
+        model = self.model_map[tbl_name]
+        pk_field = model._meta.pk
+        pks = {}
+        for id_ in ids:
+            if id_ is None:
+                continue
+            try:
+                pks[id_] = pk_field.to_python(id_)
+            except ValidationError:
+                continue
+
+        objs = {}
+        unique_pks = list(set(pks.values()))
+        for i in range(0, len(unique_pks), self.name_chunk_size):
+            chunk = unique_pks[i : i + self.name_chunk_size]  # noqa: E203
+            objs.update(model.objects.using(self.using).in_bulk(chunk))
+        return {id_: str(objs[pk]) for id_, pk in pks.items() if pk in objs}
 
     def _fmt_violation(self, v_row, model_name, obj_name):
         v_type = v_row[1]
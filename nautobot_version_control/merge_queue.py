@@ -0,0 +1,341 @@
+"""Merge_queue.py contains the queue that serializes, and optionally batches, the merges of pull requests."""
+
+from datetime import timedelta
+import logging
+import uuid
+
+from django.core.cache import caches
+from django.db import connection, connections, DatabaseError, transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from nautobot_version_control.merge import compute_merge_summary
+from nautobot_version_control.models import Branch, branch_head_changed, MergeQueueEntry, PullRequest
+from nautobot_version_control.utils import (
+    author_from_user,
+    db_for_branch,
+    dolt_merge_result,
+    DoltError,
+    get_plugin_setting,
+)
+
+logger = logging.getLogger(__name__)
+
+MERGE_QUEUE_LOCK = "nautobot_version_control.merge_queue"
+MERGE_QUEUE_BATCH_PREFIX = "xxx-merge-queue--"
+
+
+def enqueue_merge(pull_request, user=None, squash=False):
+    """Enqueues the merge of an open pull request, unless it is already queued, and returns its queue entry."""
+    if pull_request.state != PullRequest.OPEN:
+        raise DoltError(f"""Pull request "{pull_request}" is not open and cannot be merged""")
+    pending = pull_request.merge_queue_entries.filter(state__in=[MergeQueueEntry.QUEUED, MergeQueueEntry.MERGING])
+    entry = pending.first()
+    if entry is None:
+        entry = MergeQueueEntry.objects.create(pull_request=pull_request, user=user, squash=squash)
+    schedule_merge_queue()
+    return entry
+
+
+def schedule_merge_queue():
+    """Enqueues a background task processing the merge queue."""
+    from nautobot_version_control.tasks import process_merge_queue  # pylint: disable=import-outside-toplevel
+
+    try:
+        process_merge_queue.delay()
+    except Exception:  # pylint: disable=broad-except
+        # entries stay queued until the queue is processed again
+        logger.exception("failed to enqueue the merge queue task")
+
+
+def process_queue():
+    """
+    Merges the queued pull requests in order until the queue is empty, returns the number of entries processed.
+
+    Only one worker processes the queue at a time, the others return immediately. The
+    worker holding the lock checks the queue again once it is released, in case an
+    entry was enqueued after the queue was drained but before the lock was released.
+
+    The lock holds a token of the worker holding it. A worker whose lock timed out stops
+    after its current batch, and only releases the lock if it still holds it. Entries
+    left merging are queued again once their heartbeat is older than the lock timeout,
+    never while the worker merging them is still alive.
+    """
+    cache = _merge_queue_cache()
+    timeout = get_plugin_setting("merge_queue_lock_timeout")
+    token = uuid.uuid4().hex
+    processed = 0
+    while cache.add(MERGE_QUEUE_LOCK, token, timeout):
+        try:
+            # entries left merging by a worker that died are merged again
+            lost = timezone.now() - timedelta(seconds=timeout)
+            MergeQueueEntry.objects.filter(
+                Q(heartbeat_at__lt=lost) | Q(heartbeat_at__isnull=True), state=MergeQueueEntry.MERGING
+            ).update(state=MergeQueueEntry.QUEUED, started_at=None, heartbeat_at=None)
+            batch = next_batch()
+            while batch and _holds_lock(cache, token, timeout):
+                processed += merge_batch(batch)
+                batch = next_batch()
+        finally:
+            if cache.get(MERGE_QUEUE_LOCK) == token:
+                cache.delete(MERGE_QUEUE_LOCK)
+        if not MergeQueueEntry.objects.filter(state=MergeQueueEntry.QUEUED).exists():
+            break
+    return processed
+
+
+def _holds_lock(cache, token, timeout):
+    """Returns whether the worker of `token` still holds the merge queue lock, refreshing it if so."""
+    if cache.get(MERGE_QUEUE_LOCK) != token:
+        logger.warning("lost the merge queue lock, another worker processes the queue")
+        return False
+    cache.touch(MERGE_QUEUE_LOCK, timeout)
+    return True
+
+
+def next_batch():
+    """
+    Returns the next queued entries to merge.
+
+    The oldest entry is always merged first. If `merge_queue_batch_size` is more than one,
+    the queued entries merging into the same branch are merged with it, in order, up to
+    the first squash merge, which is merged on its own.
+    """
+    queued = MergeQueueEntry.objects.filter(state=MergeQueueEntry.QUEUED).select_related("pull_request")
+    head = queued.first()
+    if head is None:
+        return []
+    batch_size = get_plugin_setting("merge_queue_batch_size")
+    if batch_size <= 1 or head.squash:
+        return [head]
+    batch = []
+    for entry in queued.filter(pull_request__destination_branch=head.pull_request.destination_branch):
+        if entry.squash or len(batch) >= batch_size:
+            break
+        batch.append(entry)
+    return batch
+
+
+def merge_batch(entries):
+    """
+    Pre-checks and merges a batch of entries into their destination branch, returns the number of entries processed.
+
+    Each pull request is checked for conflicts against the current head of the destination.
+    A batch of pull requests is merged into a batch branch one by one, pull requests that
+    conflict with an earlier one are queued again, then the batch branch is merged into the
+    destination with a single merge commit.
+    """
+    started = timezone.now()
+    pks = [entry.pk for entry in entries]
+    MergeQueueEntry.objects.filter(pk__in=pks).update(
+        state=MergeQueueEntry.MERGING, started_at=started, heartbeat_at=started
+    )
+    for entry in entries:
+        entry.state, entry.started_at = MergeQueueEntry.MERGING, started
+
+    try:
+        return _merge_batch(entries)
+    except Exception as err:  # pylint: disable=broad-except
+        # never leave entries merging, they would be merged again, and fail again, on every run
+        logger.exception("failed to merge a batch of the merge queue")
+        merging = MergeQueueEntry.objects.filter(pk__in=pks, state=MergeQueueEntry.MERGING)
+        _finish(list(merging.select_related("pull_request")), MergeQueueEntry.FAILED, error=str(err))
+        return len(entries)
+
+
+def _merge_batch(entries):
+    """Merges a batch of merging entries, see merge_batch."""
+    dest_name = entries[0].pull_request.destination_branch
+    try:
+        dest = Branch.objects.get(name=dest_name)
+    except Branch.DoesNotExist:
+        _finish(entries, MergeQueueEntry.FAILED, error=f"the destination branch {dest_name} no longer exists.")
+        return len(entries)
+
+    ready = []
+    for entry in entries:
+        _heartbeat(entries)
+        try:
+            ready.append((entry, _precheck(entry, dest)))
+        except (DoltError, DatabaseError) as err:
+            _finish([entry], MergeQueueEntry.FAILED, error=str(err))
+        except Exception as err:  # pylint: disable=broad-except
+            logger.exception("failed to pre-check the merge of %s", entry.pull_request)
+            _finish([entry], MergeQueueEntry.FAILED, error=f"the merge pre-check failed: {err}")
+    if len(ready) > 1:
+        return len(entries) - _merge_together(dest, ready)
+
+    for entry, src in ready:
+        _heartbeat([entry])
+        try:
+            commit = _merge(dest, src, user=entry.user, squash=entry.squash)
+        except (DoltError, DatabaseError) as err:
+            _finish([entry], MergeQueueEntry.FAILED, error=str(err))
+        else:
+            _finish([entry], MergeQueueEntry.MERGED, commit_hash=commit)
+            branch_head_changed(dest.name)
+    return len(entries)
+
+
+def _precheck(entry, dest):
+    """Returns the source branch of an entry, raises DoltError if it doesn't merge cleanly into the head of `dest`."""
+    src_name = entry.pull_request.source_branch
+    if entry.pull_request.state != PullRequest.OPEN:
+        raise DoltError(f"""Pull request "{entry.pull_request}" is no longer open.""")
+    try:
+        src = Branch.objects.get(name=src_name)
+    except Branch.DoesNotExist as err:
+        raise DoltError(f"the source branch {src_name} no longer exists.") from err
+    summary = compute_merge_summary(src, dest)
+    if summary["conflicts"] or summary["violations"]:
+        raise DoltError(
+            f"""Merging {src} into {dest} creates {summary["conflicts"]} conflicts and """
+            f"""{summary["violations"]} constraint violations. Resolve them to reattempt the merge."""
+        )
+    return src
+
+
+def _merge_together(dest, ready):
+    """Merges pre-checked (entry, source branch) pairs into `dest` in one merge commit, returns the number requeued."""
+    name = f"{MERGE_QUEUE_BATCH_PREFIX}{dest}"
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("CALL dolt_branch('--force', %s, %s);", [name, dest.hash])
+        batch_branch = Branch.objects.get(name=name)
+    except (DatabaseError, Branch.DoesNotExist) as err:
+        _finish([entry for entry, _ in ready], MergeQueueEntry.FAILED, error=f"can't create the batch branch: {err}")
+        return 0
+    try:
+        return _merge_into_batch_branch(dest, batch_branch, ready)
+    finally:
+        _delete_batch_branch(name)
+
+
+def _merge_into_batch_branch(dest, batch_branch, ready):
+    """Merges pre-checked pairs into `batch_branch`, then `batch_branch` into `dest`, returns the number requeued."""
+    merged, deferred = [], []
+    for entry, src in ready:
+        _heartbeat([pending for pending, _ in ready])
+        try:
+            _merge(batch_branch, src, user=entry.user)
+            merged.append(entry)
+        except (DoltError, DatabaseError) as err:
+            if merged:
+                # conflicts with an earlier pull request of the batch, merged on its own later
+                deferred.append(entry)
+            else:
+                _finish([entry], MergeQueueEntry.FAILED, error=str(err))
+    MergeQueueEntry.objects.filter(pk__in=[entry.pk for entry in deferred]).update(
+        state=MergeQueueEntry.QUEUED, started_at=None, heartbeat_at=None
+    )
+    if not merged:
+        return len(deferred)
+
+    _heartbeat(merged)
+    sources = ", ".join(f'"{entry.pull_request.source_branch}"' for entry in merged)
+    try:
+        commit = _merge(
+            dest,
+            Branch.objects.get(name=batch_branch.name),
+            user=merged[0].user,
+            message=f"""merged {sources} into "{dest}".""",
+        )
+    except (DoltError, DatabaseError) as err:
+        _finish(merged, MergeQueueEntry.FAILED, error=str(err))
+    else:
+        _finish(merged, MergeQueueEntry.MERGED, commit_hash=commit)
+        branch_head_changed(dest.name)
+    return len(deferred)
+
+
+def _delete_batch_branch(name):
+    """Deletes a batch branch, closing this thread's connection to it first."""
+    connections[db_for_branch(name)].close()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("CALL dolt_branch('-D', %s);", [name])
+    except DatabaseError:
+        # the branch is force-reset by the next batch
+        logger.exception("failed to delete the merge queue batch branch %s", name)
+
+
+def _merge(dest, src, user=None, squash=False, message=None):
+    """
+    Merges `src` into `dest` in a transaction on the database alias of `dest`, returns the new head of `dest`.
+
+    Unlike Branch.merge, `dest` isn't checked out on the shared connection, and the
+    transaction is rolled back rather than committed if the merge has conflicts.
+    """
+    message = message or f"""merged "{src}" into "{dest}"."""
+    author = author_from_user(user)
+    using = db_for_branch(dest.name)
+    with transaction.atomic(using=using):
+        with connections[using].cursor() as cursor:
+            if squash:
+                cursor.execute("CALL dolt_merge('--squash', %s);", [src.hash])
+            else:
+                cursor.execute(
+                    "CALL dolt_merge('--no-ff', '--message', %s, '--author', %s, %s);", [message, author, src.hash]
+                )
+            if dolt_merge_result(cursor).conflicts:
+                raise DoltError(f"Merging {src} into {dest} created merge conflicts.")
+            if squash:
+                cursor.execute(
+                    "CALL dolt_commit('--all', '--allow-empty', '--message', %s, '--author', %s);", [message, author]
+                )
+            cursor.execute("SELECT HASHOF('HEAD');")
+            return cursor.fetchone()[0]
+
+
+def _heartbeat(entries):
+    """Records that the worker merging `entries` is alive, so that they are not queued again."""
+    MergeQueueEntry.objects.filter(pk__in=[entry.pk for entry in entries], state=MergeQueueEntry.MERGING).update(
+        heartbeat_at=timezone.now()
+    )
+
+
+def _finish(entries, state, commit_hash="", error=""):
+    """Records the outcome of merging entries, and the time they waited in the queue and took to merge."""
+    now = timezone.now()
+    for entry in entries:
+        entry.state = state
+        entry.finished_at = now
+        entry.commit_hash = commit_hash
+        entry.error = error
+        entry.wait_seconds = (entry.started_at - entry.enqueued_at).total_seconds()
+        entry.merge_seconds = (now - entry.started_at).total_seconds()
+        entry.save()
+        if state == MergeQueueEntry.MERGED:
+            entry.pull_request.state = PullRequest.MERGED
+            entry.pull_request.save()
+        else:
+            logger.warning("failed to merge %s: %s", entry.pull_request, error)
+
+
+def queue_stats():
+    """
+    Returns the metrics of the merge queue.
+
+    The depth of the queue per destination branch, the number of entries being merged,
+    and the number, total wait time and total merge time of the merged and failed entries.
+    """
+    queued = MergeQueueEntry.objects.filter(state=MergeQueueEntry.QUEUED).order_by()
+    processed = (
+        MergeQueueEntry.objects.filter(state__in=[MergeQueueEntry.MERGED, MergeQueueEntry.FAILED])
+        .order_by()
+        .values_list("state")
+        .annotate(Count("id"), Sum("wait_seconds"), Sum("merge_seconds"))
+    )
+    return {
+        "depth": dict(queued.values_list("pull_request__destination_branch").annotate(Count("id"))),
+        "merging": MergeQueueEntry.objects.filter(state=MergeQueueEntry.MERGING).count(),
+        "processed": {
+            state: {"count": count, "wait_seconds": wait or 0.0, "merge_seconds": merge or 0.0}
+            for state, count, wait, merge in processed
+        },
+    }
+
+
+def _merge_queue_cache():
+    """Returns the Django cache holding the merge queue lock, shared with the diff cache."""
+    return caches[get_plugin_setting("diff_cache_alias")]
@@ -0,0 +1,79 @@
+"""Metrics.py contains the Prometheus metrics of the nautobot version control plugin."""
+
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, SummaryMetricFamily
+
+from nautobot_version_control.merge_queue import queue_stats
+from nautobot_version_control.time_travel import branch_connections, time_travel
+
+
+def metric_merge_queue():
+    """
+    Yields the metrics of the merge queue.
+
+    The depth of the queue per destination branch, the number of pull requests being
+    merged, and the time merged and failed pull requests waited in the queue and took to merge.
+    """
+    stats = queue_stats()
+
+    depth = GaugeMetricFamily(
+        "nautobot_version_control_merge_queue_depth",
+        "Number of pull requests queued to merge, per destination branch",
+        labels=["destination_branch"],
+    )
+    for branch, count in sorted(stats["depth"].items()):
+        depth.add_metric([branch], count)
+    yield depth
+
+    yield GaugeMetricFamily(
+        "nautobot_version_control_merge_queue_merging",
+        "Number of pull requests being merged",
+        value=stats["merging"],
+    )
+
+    wait = SummaryMetricFamily(
+        "nautobot_version_control_merge_queue_wait_seconds",
+        "Time pull requests waited in the merge queue before they were merged",
+        labels=["state"],
+    )
+    merge = SummaryMetricFamily(
+        "nautobot_version_control_merge_queue_merge_seconds",
+        "Time pull requests took to pre-check and merge",
+        labels=["state"],
+    )
+    for state, processed in sorted(stats["processed"].items()):
+        wait.add_metric([state], count_value=processed["count"], sum_value=processed["wait_seconds"])
+        merge.add_metric([state], count_value=processed["count"], sum_value=processed["merge_seconds"])
+    yield wait
+    yield merge
+
+
+def metric_database_aliases():
+    """
+    Yields the metrics of the database aliases of this process, per kind of alias.
+
+    "commit" aliases query the database as of a commit, "branch" aliases query a branch
+    without checking it out. Hits, misses and evictions are counted since the process started.
+    """
+    pools = (("commit", time_travel.stats()), ("branch", branch_connections.stats()))
+
+    aliases = GaugeMetricFamily(
+        "nautobot_version_control_database_aliases",
+        "Number of registered database aliases",
+        labels=["kind"],
+    )
+    for kind, stats in pools:
+        aliases.add_metric([kind], stats["aliases"])
+    yield aliases
+
+    for name, documentation in (
+        ("hits", "Number of lookups of an already registered database alias"),
+        ("misses", "Number of lookups that registered a database alias"),
+        ("evictions", "Number of database aliases evicted"),
+    ):
+        counter = CounterMetricFamily(f"nautobot_version_control_database_alias_{name}", documentation, labels=["kind"])
+        for kind, stats in pools:
+            counter.add_metric([kind], stats[name])
+        yield counter
+
+
+metrics = [metric_merge_queue, metric_database_aliases]
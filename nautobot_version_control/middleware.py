@@ -14,7 +14,7 @@ from nautobot_version_control.constants import (
     DOLT_DEFAULT_BRANCH,
 )
 from nautobot_version_control.models import Branch, Commit
-from nautobot_version_control.utils import DoltError
+from nautobot_version_control.utils import DoltError, reset_active_branch, routes_by_branch_alias, set_active_branch
 
 
 def dolt_health_check_intercept_middleware(get_response):
@@ -38,7 +38,13 @@ class DoltBranchMiddleware:
 
     def __call__(self, request):
         """Override __call__."""
-        return self.get_response(request)
+        try:
+            return self.get_response(request)
+        finally:
+            token = getattr(request, "_active_branch_token", None)
+            if token is not None:
+                # responses are rendered after `process_view`, keep the active branch until done
+                reset_active_branch(token)
 
     def process_view(self, request, view_func, view_args, view_kwargs):  # pylint: disable=R0201
         """This maintains the dolt branch session cookie and verifies authentication. It then returns the view that needs to be rendered."""
@@ -50,11 +56,17 @@ class DoltBranchMiddleware:
             return redirect(request.path)
 
         branch = DoltBranchMiddleware.get_branch(request)
-        try:
-            branch.checkout()
-        except Exception as err:  # pylint: disable=broad-except
-            msg = f"could not checkout branch {branch}: {str(err)}"
-            messages.error(request, mark_safe(msg))
+        if routes_by_branch_alias():
+            # versioned models are routed to the branch's own database alias, see `GlobalStateRouter`
+            request._active_branch_token = set_active_branch(branch.name)  # pylint: disable=protected-access
+        else:
+            try:
+                branch.checkout()
+                # later calls to `active_branch()` in this request don't need a query
+                request._active_branch_token = set_active_branch(branch.name)  # pylint: disable=protected-access
+            except Exception as err:  # pylint: disable=broad-except
+                msg = f"could not checkout branch {branch}: {str(err)}"
+                messages.error(request, mark_safe(msg))
 
         try:
             return view_func(request, *view_args, **view_kwargs)
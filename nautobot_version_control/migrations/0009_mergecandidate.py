@@ -0,0 +1,29 @@
+# Generated by Django 3.2.23 on 2026-10-16 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("nautobot_version_control", "0008_charfield_max_length"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MergeCandidate",
+            fields=[
+                ("branch", models.CharField(max_length=1024, primary_key=True, serialize=False)),
+                ("source_branch", models.CharField(max_length=1024)),
+                ("destination_branch", models.CharField(max_length=1024)),
+                ("source_hash", models.CharField(max_length=32)),
+                ("destination_hash", models.CharField(max_length=32)),
+                ("num_conflicts", models.IntegerField(default=0)),
+                ("num_violations", models.IntegerField(default=0)),
+                ("built_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "db_table": "nautobot_version_control_merge_candidate",
+            },
+        ),
+    ]
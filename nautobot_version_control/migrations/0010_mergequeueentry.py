@@ -0,0 +1,65 @@
+# Generated by Django 3.2.23 on 2026-10-16 12:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("nautobot_version_control", "0009_mergecandidate"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MergeQueueEntry",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("squash", models.BooleanField(default=False)),
+                (
+                    "state",
+                    models.CharField(
+                        choices=[
+                            ("queued", "Queued"),
+                            ("merging", "Merging"),
+                            ("merged", "Merged"),
+                            ("failed", "Failed"),
+                        ],
+                        default="queued",
+                        max_length=16,
+                    ),
+                ),
+                ("enqueued_at", models.DateTimeField(auto_now_add=True)),
+                ("started_at", models.DateTimeField(blank=True, null=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                ("wait_seconds", models.FloatField(blank=True, null=True)),
+                ("merge_seconds", models.FloatField(blank=True, null=True)),
+                ("commit_hash", models.CharField(blank=True, max_length=32)),
+                ("error", models.TextField(blank=True)),
+                (
+                    "pull_request",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="merge_queue_entries",
+                        to="nautobot_version_control.pullrequest",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "merge queue entries",
+                "db_table": "nautobot_version_control_merge_queue",
+                "ordering": ["id"],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.23 on 2026-10-16 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("nautobot_version_control", "0012_mergecandidate_resolving"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mergequeueentry",
+            name="heartbeat_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -15,8 +15,18 @@ from nautobot.extras.utils import extras_features
 from nautobot.users.models import User
 from nautobot.core.models.querysets import RestrictedQuerySet
 
-from nautobot_version_control.utils import author_from_user, DoltError, db_for_commit, active_branch
+from nautobot_version_control.utils import (
+    active_branch,
+    active_branch_db,
+    author_from_user,
+    db_for_commit,
+    dolt_merge_result,
+    DoltError,
+    get_plugin_setting,
+    note_checkout,
+)
 from nautobot_version_control.constants import DOLT_DEFAULT_BRANCH
+from nautobot_version_control.graph import commit_graph
 
 
 class DoltSystemTable(models.Model):
@@ -63,6 +73,8 @@ class Branch(DoltSystemTable):
         super().__init__(*args, **kwargs)
         self.starting_branch = starting_branch
         self.creator = creator
+        self._ahead_behind = None
+        self._diff_stats = None
 
     def __str__(self):
         """Return a simple string if model is called."""
@@ -92,14 +104,71 @@ class Branch(DoltSystemTable):
         branch. Behind represents how many commits are on main that have diverged passed this branch.
         :return: ahead/behind string.
         """
-        merge_base = Commit.merge_base(self.name, DOLT_DEFAULT_BRANCH)
-        merge_base_commit = Commit.objects.using(db_for_commit(self.hash)).get(commit_hash=merge_base)
-        main_hash = Branch.objects.get(name=DOLT_DEFAULT_BRANCH).hash
+        if self._ahead_behind is None:
+            Branch.load_ahead_behind([self])
+        ahead, behind = self._ahead_behind
+        return f"{ahead} ahead / {behind} behind"
 
-        ahead = Commit.objects.filter(date__gt=merge_base_commit.date).using(db_for_commit(self.hash)).count()
-        behind = Commit.objects.filter(date__gt=merge_base_commit.date).using(db_for_commit(main_hash)).count()
+    @staticmethod
+    def load_ahead_behind(branches, base=DOLT_DEFAULT_BRANCH):
+        """
+        Computes the ahead/behind counts of `branches` relative to `base`.
 
-        return f"{ahead} ahead / {behind} behind"
+        Counts come from the commit graph index, or from a single query if it is disabled.
+
+        Ahead counts the commits reachable from the branch but not from `base`, behind
+        counts the commits reachable from `base` but not from the branch. The counts are
+        stored on each branch and returned by `ahead_behind` without further queries.
+        """
+        branches = list(branches)
+        if not branches:
+            return
+        base_hashes = commit_graph.resolve(base) if get_plugin_setting("commit_graph_index") else None
+        if base_hashes:
+            for branch in branches:
+                ahead_behind = commit_graph.ahead_behind(branch.hash, base_hashes[0])
+                branch._ahead_behind = ahead_behind  # pylint: disable=protected-access
+            return
+
+        selects = []
+        params = []
+        for branch in branches:
+            selects.append(
+                """SELECT %s,
+                    (SELECT COUNT(*) FROM dolt_log(%s, %s)),
+                    (SELECT COUNT(*) FROM dolt_log(%s, %s))"""
+            )
+            params.extend([branch.name, branch.name, f"^{base}", base, f"^{branch.name}"])
+        with connection.cursor() as cursor:
+            cursor.execute(" UNION ALL ".join(selects), params)
+            counts = {name: (ahead, behind) for name, ahead, behind in cursor.fetchall()}
+        for branch in branches:
+            branch._ahead_behind = counts.get(branch.name, (0, 0))  # pylint: disable=protected-access
+
+    @property
+    def diff_stats(self):
+        """Returns the number of rows added, modified and removed on this branch since it diverged from main."""
+        if self._diff_stats is None:
+            Branch.load_diff_stats([self])
+        return self._diff_stats
+
+    @staticmethod
+    def load_diff_stats(branches, base=DOLT_DEFAULT_BRANCH):
+        """
+        Computes the diff stats of `branches` since they diverged from `base`.
+
+        The merge bases and the stats of every branch are computed with at most one query each.
+        The stats are stored on each branch and returned by `diff_stats` without further queries.
+        """
+        from nautobot_version_control.diffs import diff_stats_for_pairs  # pylint: disable=import-outside-toplevel
+
+        branches = list(branches)
+        if not branches:
+            return
+        merge_bases = Commit.merge_bases([(base, branch.name) for branch in branches])
+        stats = diff_stats_for_pairs(zip(merge_bases, (branch.hash for branch in branches)))
+        for branch, branch_stats in zip(branches, stats):
+            branch._diff_stats = branch_stats  # pylint: disable=protected-access
 
     @property
     def created_by(self):
@@ -123,6 +192,7 @@ class Branch(DoltSystemTable):
         """Checkout performs a checkout operation to this branch making it the active_branch."""
         with connection.cursor() as cursor:
             cursor.execute(f"""CALL dolt_checkout("{self.name}");""")  # TODO: not safe
+        note_checkout(self.name)
 
     def _branch_meta(self):
         try:
@@ -161,11 +231,8 @@ class Branch(DoltSystemTable):
                         '{merge_branch}'
                     );"""
                 )
-            res = cursor.fetchone()
-            # dolt_merge returns a signature that is at the time of this writing:
-            # ws, h.String(), noConflictsOrViolations, fastForwardMerge, str, nil
-            # test the noConflictsOrViolations and fastForwardMerge is good 
-            if res[1] == 0 and res[2] == 0:  # magic???
+            result = dolt_merge_result(cursor)
+            if not result.fast_forward and not result.conflicts:
                 # only commit merged data on success
                 msg = f"""merged "{merge_branch}" into "{self.name}"."""
                 cursor.execute(  # TODO: not safe
@@ -176,6 +243,7 @@ class Branch(DoltSystemTable):
                         '--author', '{author}'
                     );"""
                 )
+                branch_head_changed(self.name)
             else:
                 cursor.execute("CALL dolt_merge('--abort');")  # nosec
                 raise DoltError(
@@ -198,6 +266,19 @@ class Branch(DoltSystemTable):
             cursor.execute(f"""CALL dolt_branch('-D','{self.name}');""")  # nosec  # TODO: not safe
 
 
+def branch_head_changed(branch):
+    """
+    Schedules the merge candidates of the open pull requests from or into `branch`, after a commit to it.
+
+    Does nothing unless `merge_candidate_background` is enabled, every change to a branch's head calls it.
+    """
+    if not get_plugin_setting("merge_candidate_background"):
+        return
+    from nautobot_version_control.merge import schedule_merge_summaries  # pylint: disable=import-outside-toplevel
+
+    schedule_merge_summaries(branch)
+
+
 @receiver(pre_delete, sender=Branch)
 def delete_branch_pre_hook(sender, instance, using, **kwargs):  # pylint: disable=W0613
     """
@@ -241,6 +322,48 @@ class BranchMeta(models.Model):
         db_table = "nautobot_version_control_branchmeta"
 
 
+class MergeCandidate(models.Model):
+    """
+    MergeCandidate records how a merge candidate branch was built.
+
+    A merge candidate is a branch where a pull request's source branch was merged into its destination
+    branch, to find the conflicts of the merge. It is up to date as long as the heads of both branches
+    are those it was built from. Merges previewed in a rolled back transaction are recorded without
+    a branch, `built` tells whether the branch holds the merge of the recorded heads, and `resolving`
+    whether some of its conflicts were resolved on the branch.
+    """
+
+    branch = models.CharField(primary_key=True, max_length=1024)
+    source_branch = models.CharField(max_length=1024)
+    destination_branch = models.CharField(max_length=1024)
+    source_hash = models.CharField(max_length=32)
+    destination_hash = models.CharField(max_length=32)
+    num_conflicts = models.IntegerField(default=0)
+    num_violations = models.IntegerField(default=0)
+    built = models.BooleanField(default=False)
+    resolving = models.BooleanField(default=False)
+    built_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        """Meta class."""
+
+        # table name cannot start with "dolt"
+        db_table = "nautobot_version_control_merge_candidate"
+
+    def __str__(self):
+        """Return a simple string if model is called."""
+        return self.branch
+
+    def is_fresh(self, src, dest):
+        """Returns whether the heads of the branches `src` and `dest` are those the merge candidate was built from."""
+        return self.source_hash == src.hash and self.destination_hash == dest.hash
+
+    @property
+    def summary(self):
+        """Returns the number of conflicts and violations of the merge."""
+        return {"conflicts": self.num_conflicts, "violations": self.num_violations}
+
+
 #
 # Commits
 #
@@ -273,18 +396,38 @@ class Commit(DoltSystemTable):
     @staticmethod
     def merge_base(left, right):
         """Returns the ancestor commit between two commits."""
+        if get_plugin_setting("commit_graph_index"):
+            merge_base = commit_graph.merge_base(left, right)
+            if merge_base:
+                return merge_base
         with connection.cursor() as conn:
             # author credentials not set
             conn.execute(f"SELECT dolt_merge_base('{left}', '{right}');")
             return conn.fetchone()[0]
 
+    @staticmethod
+    def merge_bases(pairs):
+        """Returns the ancestor commit of each (left, right) pair, in order, with at most one query."""
+        pairs = [(str(left), str(right)) for left, right in pairs]
+        bases = [None] * len(pairs)
+        if get_plugin_setting("commit_graph_index"):
+            bases = [commit_graph.merge_base(left, right) for left, right in pairs]
+        missing = [i for i, merge_base in enumerate(bases) if not merge_base]
+        if missing:
+            params = [param for i in missing for param in (i, *pairs[i])]
+            with connection.cursor() as cursor:
+                cursor.execute(" UNION ALL ".join(["SELECT %s, dolt_merge_base(%s, %s)"] * len(missing)), params)
+                for i, merge_base in cursor.fetchall():
+                    bases[i] = merge_base
+        return bases
+
     @staticmethod
     def revert(commits, user):
         """Revert executes a revert command on a commit which undoes it from the commit log."""
         args = ", ".join([f"'{commit}'" for commit in commits])
         author = author_from_user(user)
         args += f", '--author', '{author}'"
-        with connection.cursor() as conn:
+        with connections[active_branch_db()].cursor() as conn:
             conn.execute(f"CALL dolt_revert({args});")
             return conn.fetchone()[0]
 
@@ -319,6 +462,7 @@ class Commit(DoltSystemTable):
                 '--message', "{msg}",
                 '--author', "{author}")"""
             )
+        branch_head_changed(active_branch())
 
 
 class CommitAncestor(DoltSystemTable):
@@ -474,6 +618,11 @@ class PullRequest(BaseModel):
     @property
     def commits(self):
         """Returns a queryset of Commit objects that come after the ancestor between the src and des branch."""
+        if get_plugin_setting("commit_graph_index"):
+            commits = commit_graph.only(self.source_branch, self.destination_branch)
+            if commits is not None:
+                database = db_for_commit(Branch.objects.get(name=self.source_branch).hash)
+                return Commit.objects.filter(commit_hash__in=commits).using(database)
         merge_base = Commit.objects.get(commit_hash=Commit.merge_base(self.source_branch, self.destination_branch))
         database = db_for_commit(Branch.objects.get(name=self.source_branch).hash)
         return Commit.objects.filter(date__gt=merge_base.date).using(database)
@@ -483,6 +632,36 @@ class PullRequest(BaseModel):
         """Returns the number of commits that are considered in the pull requests."""
         return self.commits.count()
 
+    @property
+    def diff_stats(self):
+        """Returns the number of rows added, modified and removed by merging the src branch, or `None` if it is gone."""
+        if not hasattr(self, "_diff_stats"):
+            PullRequest.load_diff_stats([self])
+        return self._diff_stats
+
+    @staticmethod
+    def load_diff_stats(pull_requests):
+        """
+        Computes the diff stats of `pull_requests`, see Branch.load_diff_stats.
+
+        The stats are stored on each pull request and returned by `diff_stats` without further queries.
+        """
+        from nautobot_version_control.diffs import diff_stats_for_pairs  # pylint: disable=import-outside-toplevel
+
+        pull_requests = list(pull_requests)
+        sources = {pr.source_branch for pr in pull_requests}
+        heads = dict(Branch.objects.filter(name__in=sources).values_list("name", "hash"))
+        for pull_request in pull_requests:
+            # the source branch may be gone
+            pull_request._diff_stats = None  # pylint: disable=protected-access
+        found = [pr for pr in pull_requests if pr.source_branch in heads]
+        if not found:
+            return
+        merge_bases = Commit.merge_bases([(pr.destination_branch, pr.source_branch) for pr in found])
+        stats = diff_stats_for_pairs(zip(merge_bases, (heads[pr.source_branch] for pr in found)))
+        for pull_request, pr_stats in zip(found, stats):
+            pull_request._diff_stats = pr_stats  # pylint: disable=protected-access
+
     @property
     def num_reviews(self):
         """Returns the number of PullRRequestReview(s) created on top of the PR."""
@@ -540,3 +719,62 @@ class PullRequestReview(BaseModel):
     def get_absolute_url(self):
         """Returns a link to a view of a pull request review."""
         return reverse("plugins:nautobot_version_control:pull_request", args=[self.pull_request.id])
+
+
+#
+# Merge Queue
+#
+
+
+class MergeQueueEntry(models.Model):
+    """
+    MergeQueueEntry is a pull request waiting in, or processed by, the merge queue.
+
+    Merges are processed one at a time in the order they were enqueued. The time spent
+    waiting in the queue and merging is recorded once an entry is merged or has failed.
+    The worker merging an entry refreshes its `heartbeat_at` as it goes.
+    """
+
+    QUEUED = "queued"
+    MERGING = "merging"
+    MERGED = "merged"
+    FAILED = "failed"
+    STATE_CHOICES = [
+        (QUEUED, "Queued"),
+        (MERGING, "Merging"),
+        (MERGED, "Merged"),
+        (FAILED, "Failed"),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    pull_request = models.ForeignKey(PullRequest, on_delete=CASCADE, related_name="merge_queue_entries")
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True)
+    squash = models.BooleanField(default=False)
+    state = models.CharField(max_length=16, choices=STATE_CHOICES, default=QUEUED)
+    enqueued_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    heartbeat_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    wait_seconds = models.FloatField(blank=True, null=True)
+    merge_seconds = models.FloatField(blank=True, null=True)
+    commit_hash = models.CharField(max_length=32, blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        """Meta class."""
+
+        # table name cannot start with "dolt"
+        db_table = "nautobot_version_control_merge_queue"
+        ordering = ["id"]
+        verbose_name_plural = "merge queue entries"
+
+    def __str__(self):
+        """Return a simple string if model is called."""
+        return f"{self.pull_request} ({self.state})"
+
+    @property
+    def position(self):
+        """Returns the 1-based position of a queued entry in the queue, or `None` once it is processed."""
+        if self.state != MergeQueueEntry.QUEUED:
+            return None
+        return MergeQueueEntry.objects.filter(state=MergeQueueEntry.QUEUED, id__lte=self.id).count()
@@ -0,0 +1,137 @@
+"""Resolution.py contains the bulk resolution of merge conflicts on merge candidate branches."""
+
+from django.db import connections, DatabaseError, transaction
+
+from nautobot_version_control.cache import schema_cache
+from nautobot_version_control.merge import (
+    get_merge_candidate_meta,
+    get_or_make_merge_candidate,
+    MergeConflicts,
+    record_merge_candidate,
+)
+from nautobot_version_control.models import Branch, branch_head_changed
+from nautobot_version_control.utils import author_from_user, db_for_branch, DoltError
+
+# take the conflicting rows of the destination ("ours") or of the source ("theirs") branch
+OURS = "ours"
+THEIRS = "theirs"
+
+# number of conflict keys per statement when resolving a set of rows
+RESOLVE_BATCH_SIZE = 1000
+
+CONFLICT_KEY = "COALESCE(base_id, our_id, their_id)"
+
+
+def resolve_conflicts(src, dest, resolutions, user=None):
+    """
+    Resolves the conflicts of merging `src` into `dest` in bulk, on their merge candidate branch.
+
+    Each resolution holds a `table`, the side to `take`, "ours" for the rows of `dest` or
+    "theirs" for the rows of `src`, and optionally the `keys` of the conflicts to resolve, as
+    listed by MergeConflicts. Without keys every conflict of the table is resolved.
+
+    Resolutions are kept in the working set of the merge candidate until every conflict and
+    constraint violation is resolved. The merge is then committed on the merge candidate
+    in a single commit, and `src` is fast-forwarded to it so that it merges cleanly.
+
+    Returns the number of conflicts resolved per table, the number of conflicts and
+    violations left, and the resolution commit if it was made.
+    """
+    for resolution in resolutions:
+        if resolution.get("take") not in (OURS, THEIRS):
+            raise DoltError(f"""can't resolve conflicts of {resolution.get("table")}: take "ours" or "theirs".""")
+
+    # resolve the merge of the current heads, never that of an older merge candidate
+    src, dest = Branch.objects.get(name=src.name), Branch.objects.get(name=dest.name)
+    merge_candidate = get_or_make_merge_candidate(src, dest)
+    meta = get_merge_candidate_meta(src, dest)
+    if meta is None or not meta.built:
+        raise DoltError(f"can't resolve conflicts of {src} and {dest}: either branch moved, reload the conflicts.")
+    using = db_for_branch(merge_candidate.name)
+    conflicts = MergeConflicts(src, dest, merge_candidate=merge_candidate, using=using)
+    with transaction.atomic(using=using):
+        with connections[using].cursor() as cursor:
+            # keep partial resolutions, the merge can't be committed until conflicts are resolved
+            cursor.execute("SET @@dolt_force_transaction_commit = 1;")
+            tables = set(conflicts.conflicted_tables())
+            resolved = {}
+            for resolution in resolutions:
+                table = resolution.get("table")
+                if table not in tables:
+                    raise DoltError(f"can't resolve conflicts of {table}: the table has no conflicts.")
+                num = _resolve_table(cursor, conflicts, table, resolution["take"], resolution.get("keys"))
+                resolved[table] = resolved.get(table, 0) + num
+
+            summary = conflicts.make_conflict_summary_table()
+            num_conflicts = sum(tbl["num_conflicts"] for tbl in summary)
+            num_violations = sum(tbl["num_violations"] for tbl in summary)
+            commit = None
+            if not num_conflicts and not num_violations:
+                msg = f"""resolved the conflicts of merging "{src}" into "{dest}"."""
+                cursor.execute(
+                    "CALL dolt_commit('--all', '--message', %s, '--author', %s);", [msg, author_from_user(user)]
+                )
+                commit = cursor.fetchone()[0]
+
+    if commit is None:
+        record_merge_candidate(src, dest, num_conflicts, num_violations, built=True, resolving=True)
+    else:
+        _fast_forward(src, commit)
+    return {"resolved": resolved, "conflicts": num_conflicts, "violations": num_violations, "commit": commit}
+
+
+def _resolve_table(cursor, conflicts, table, take, keys):
+    """Resolves the conflicts of a table, or of the conflicts with `keys`, returns the number of conflicts resolved."""
+    if keys is None:
+        cursor.execute(f"SELECT COUNT(*) FROM dolt_conflicts_{table};")  # nosec
+        num = cursor.fetchone()[0]
+        # Dolt's conflict resolution procedure resolves a whole table at once
+        cursor.execute(f"CALL dolt_conflicts_resolve('--{take}', %s);", [table])  # nosec
+        return num
+
+    cols = schema_cache.columns(table, commit=conflicts.commit, using=conflicts.using)
+    num = 0
+    keys = list(keys)
+    for i in range(0, len(keys), RESOLVE_BATCH_SIZE):
+        batch = keys[i : i + RESOLVE_BATCH_SIZE]  # noqa: E203
+        where = f"{CONFLICT_KEY} IN ({', '.join(['%s'] * len(batch))})"
+        cursor.execute(f"SELECT {CONFLICT_KEY}, their_diff_type FROM dolt_conflicts_{table} WHERE {where};", batch)
+        rows = cursor.fetchall()
+        num += len(rows)
+        if take == THEIRS and rows:
+            # the working set holds our rows, replace them with theirs
+            _take_theirs(cursor, table, cols, rows)
+        cursor.execute(f"DELETE FROM dolt_conflicts_{table} WHERE {where};", batch)  # nosec
+    return num
+
+
+def _take_theirs(cursor, table, cols, rows):
+    """Replaces our rows of a table with their rows, for the conflicts `rows` of (key, their_diff_type) tuples."""
+    removed = [key for key, diff_type in rows if diff_type == "removed"]
+    changed = [key for key, diff_type in rows if diff_type != "removed"]
+    if removed:
+        placeholders = ", ".join(["%s"] * len(removed))
+        cursor.execute(f"DELETE FROM {table} WHERE id IN ({placeholders});", removed)  # nosec
+    if changed:
+        placeholders = ", ".join(["%s"] * len(changed))
+        # update rows in place rather than REPLACE, which deletes rows referenced by foreign keys
+        cursor.execute(  # nosec
+            f"""INSERT INTO {table} ({", ".join(cols)})
+                SELECT {", ".join(f"their_{col}" for col in cols)} FROM dolt_conflicts_{table}
+                WHERE {CONFLICT_KEY} IN ({placeholders})
+                ON DUPLICATE KEY UPDATE {", ".join(f"{col} = VALUES({col})" for col in cols)};""",
+            changed,
+        )
+
+
+def _fast_forward(src, commit):
+    """Fast-forwards the branch `src` to the resolved merge `commit`, which descends from its head."""
+    using = db_for_branch(src.name)
+    try:
+        with transaction.atomic(using=using):
+            with connections[using].cursor() as cursor:
+                # never creates a merge commit on `src`
+                cursor.execute("CALL dolt_merge('--ff-only', %s);", [commit])
+    except DatabaseError as err:
+        raise DoltError(f"can't fast-forward {src} to the resolved merge, it moved while resolving conflicts.") from err
+    branch_head_changed(src.name)
@@ -0,0 +1,117 @@
+"""Retention.py contains the retention policy of merge candidate branches."""
+
+from datetime import timedelta
+from pathlib import Path
+
+from django.db import connection, DatabaseError
+from django.utils import timezone
+
+from nautobot_version_control.merge import MERGE_CANDIDATE_PREFIX
+from nautobot_version_control.models import Branch, MergeCandidate, PullRequest
+from nautobot_version_control.utils import get_plugin_setting
+
+
+def collect_merge_candidates(
+    max_count=None, max_age=None, batch_size=None, dry_run=False, dolt_gc=False, grace_period=None
+):  # pylint: disable=too-many-arguments
+    """
+    Deletes the merge candidate branches that are no longer needed.
+
+    A merge candidate is deleted if it is older than `max_age` seconds, if it isn't one of the
+    `max_count` most recently built candidates, or if every pull request between its branches
+    was merged or closed. Its metadata is deleted with it, previewed merges only have metadata.
+    Candidates with partly resolved conflicts are kept while their pull request is open.
+
+    Branches are only deleted once their metadata records them as built, and at least
+    `grace_period` seconds ago, so candidates that are being built are never deleted.
+    Candidate branches without metadata are left alone. Arguments default to the
+    `merge_candidate_*` plugin settings.
+
+    Dolt only frees storage when it garbage collects, `dolt_gc` runs `dolt_gc()` once the
+    branches are deleted. Bytes reclaimed are only measured if `dolt_data_dir` is set.
+
+    Returns the names of the deleted branches, the names of the branches that could not be
+    deleted, and the number of bytes reclaimed or `None`.
+    """
+    max_count = get_plugin_setting("merge_candidate_max_count") if max_count is None else max_count
+    max_age = get_plugin_setting("merge_candidate_max_age") if max_age is None else max_age
+    batch_size = batch_size or get_plugin_setting("merge_candidate_gc_batch_size")
+    grace_period = get_plugin_setting("merge_candidate_gc_grace_period") if grace_period is None else grace_period
+
+    branches, metadata = expired_merge_candidates(max_count, max_age, grace_period)
+    if dry_run:
+        return {"deleted": branches, "failed": [], "bytes": None}
+
+    size = storage_size()
+    deleted, failed = delete_branches(branches, batch_size)
+    # keep the metadata of branches that could not be deleted
+    metadata = [name for name in metadata if name not in failed]
+    for i in range(0, len(metadata), batch_size):
+        MergeCandidate.objects.filter(branch__in=metadata[i : i + batch_size]).delete()  # noqa: E203
+    if dolt_gc:
+        with connection.cursor() as cursor:
+            cursor.execute("CALL dolt_gc();")
+
+    reclaimed = size - storage_size() if size is not None else None
+    return {"deleted": deleted, "failed": failed, "bytes": reclaimed}
+
+
+def expired_merge_candidates(max_count, max_age, grace_period=0):
+    """Returns the names of the merge candidate branches, and of the MergeCandidate metadata, to delete."""
+    branches = set(Branch.objects.filter(name__startswith=MERGE_CANDIDATE_PREFIX).values_list("name", flat=True))
+    pull_requests = list(PullRequest.objects.values_list("source_branch", "destination_branch", "state"))
+    open_pairs = {(src, dest) for src, dest, state in pull_requests if state == PullRequest.OPEN}
+    done_pairs = {(src, dest) for src, dest, state in pull_requests if state != PullRequest.OPEN} - open_pairs
+    now = timezone.now()
+    built_after = now - timedelta(seconds=max_age) if max_age is not None else None
+    settled_before = now - timedelta(seconds=grace_period)
+
+    expired, metadata = [], []
+    for i, meta in enumerate(MergeCandidate.objects.order_by("-built_at")):
+        pair = (meta.source_branch, meta.destination_branch)
+        if meta.built_at >= settled_before or (meta.resolving and pair in open_pairs):
+            continue
+        if (
+            (max_count is not None and i >= max_count)
+            or (built_after is not None and meta.built_at < built_after)
+            or pair in done_pairs
+        ):
+            if not meta.built:
+                # the branch, if any, holds an older merge and may be being built again
+                if meta.branch not in branches:
+                    metadata.append(meta.branch)
+                continue
+            expired.append(meta.branch)
+            metadata.append(meta.branch)
+    return sorted(name for name in expired if name in branches), metadata
+
+
+def delete_branches(names, batch_size):
+    """Deletes branches `batch_size` at a time, returns the names of the deleted branches and of those that failed."""
+    deleted, failed = [], []
+    with connection.cursor() as cursor:
+        for i in range(0, len(names), batch_size):
+            batch = names[i : i + batch_size]  # noqa: E203
+            placeholders = ", ".join(["%s"] * len(batch))
+            try:
+                cursor.execute(f"CALL dolt_branch('-D', {placeholders});", batch)  # nosec
+                deleted.extend(batch)
+                continue
+            except DatabaseError:
+                # a branch of the batch may be checked out, retry them one by one
+                pass
+            for name in batch:
+                try:
+                    cursor.execute("CALL dolt_branch('-D', %s);", [name])
+                    deleted.append(name)
+                except DatabaseError:
+                    failed.append(name)
+    return deleted, failed
+
+
+def storage_size():
+    """Returns the number of bytes used by the Dolt database in `dolt_data_dir`, or `None` if it is not set."""
+    data_dir = get_plugin_setting("dolt_data_dir")
+    if not data_dir:
+        return None
+    return sum(path.stat().st_size for path in Path(data_dir).rglob("*") if path.is_file())
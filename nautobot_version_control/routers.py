@@ -2,7 +2,7 @@
 
 from django.utils.safestring import mark_safe
 from nautobot_version_control.constants import DOLT_DEFAULT_BRANCH, GLOBAL_DB
-from nautobot_version_control.utils import DoltError, is_dolt_model, active_branch
+from nautobot_version_control.utils import DoltError, is_dolt_model, active_branch, db_for_branch, routed_branch
 
 from . import is_global_router_enabled, is_versioned_model
 
@@ -17,13 +17,14 @@ class GlobalStateRouter:
         Directs read queries to the global state db for non-versioned models.
 
         Versioned models use the 'default' database and the Dolt branch that
-        was checked out in `DoltBranchMiddleware`.
+        was checked out in `DoltBranchMiddleware`, or the database alias of
+        the request's branch in the "alias" `branch_routing` mode.
         """
         if not is_global_router_enabled():
             return None
 
         if is_versioned_model(model):
-            return None
+            return self.branch_db()
 
         return self.global_db
 
@@ -32,7 +33,8 @@ class GlobalStateRouter:
         Directs write queries to the global state db for non-versioned models.
 
         Versioned models use the 'default' database and the Dolt branch that
-        was checked out in `DoltBranchMiddleware`.
+        was checked out in `DoltBranchMiddleware`, or the database alias of
+        the request's branch in the "alias" `branch_routing` mode.
         Prevents writes of non-versioned models on non-primary branches.
         """
         if not is_global_router_enabled():
@@ -44,7 +46,7 @@ class GlobalStateRouter:
             return self.global_db
 
         if is_versioned_model(model):
-            return None
+            return self.branch_db()
 
         if self.branch_is_not_primary():
             # non-versioned models can only be edited on "main"
@@ -63,6 +65,12 @@ class GlobalStateRouter:
         """Allow a relation between obj1 and obj2 too exist."""
         return True
 
+    @staticmethod
+    def branch_db():
+        """Returns the database alias of the branch versioned models are routed to, or `None` for 'default'."""
+        branch = routed_branch()
+        return db_for_branch(branch) if branch else None
+
     @staticmethod
     def branch_is_not_primary():
         """Returns whether the active_branch is the default branch."""
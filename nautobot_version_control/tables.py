@@ -36,6 +36,19 @@ BRANCH_TABLE_BADGES = """
 """
 
 
+DIFF_STATS = """
+{% with stats=record.diff_stats %}
+    {% if stats %}
+        <span class="text-success" title="added">+{{ stats.added }}</span>
+        <span class="text-warning" title="modified">~{{ stats.modified }}</span>
+        <span class="text-danger" title="removed">-{{ stats.removed }}</span>
+    {% else %}
+        &mdash;
+    {% endif %}
+{% endwith %}
+"""
+
+
 ACTIVE_BRANCH_BADGE = """
 {% if record.active %}
     <div class="btn btn-xs btn-success" title="active">
@@ -59,6 +72,7 @@ class BranchTable(BaseTable):
         prepend_template=BRANCH_TABLE_BADGES,
     )
     ahead_behind = tables.Column(accessor=A("ahead_behind"), verbose_name="Ahead / Behind")
+    diff_stats = tables.TemplateColumn(DIFF_STATS, verbose_name="Changes", orderable=False)
     starting_branch = tables.Column(accessor=A("source_branch"), verbose_name="Starting Branch")
 
     class Meta(BaseTable.Meta):
@@ -71,6 +85,7 @@ class BranchTable(BaseTable):
             "hash",
             "status",
             "ahead_behind",
+            "diff_stats",
             "created_by",
             "latest_committer",
             "latest_commit_date",
@@ -82,6 +97,7 @@ class BranchTable(BaseTable):
             "name",
             "status",
             "ahead_behind",
+            "diff_stats",
             "created_by",
             "latest_committer",
             "latest_commit_date",
@@ -89,6 +105,14 @@ class BranchTable(BaseTable):
             "actions",
         )
 
+    def before_render(self, request):
+        """Loads the ahead/behind counts and the diff stats of every branch on the current page in one query each."""
+        rows = self.page.object_list if hasattr(self, "page") else self.rows
+        branches = [row.record for row in rows]
+        Branch.load_ahead_behind(branches)
+        if self.columns["diff_stats"].visible:
+            Branch.load_diff_stats(branches)
+
 
 #
 # Commits
@@ -179,6 +203,21 @@ class ConflictsTable(BaseTable):
         default_columns = fields
 
 
+CONFLICT_SELECT = """<input type="checkbox" name="key" value="{{ record.key }}" />"""
+
+
+class ResolvableConflictsTable(ConflictsTable):
+    """ResolvableConflictsTable renders the conflict list view with a checkbox to select conflicts to resolve."""
+
+    select = tables.TemplateColumn(template_code=CONFLICT_SELECT, verbose_name="", orderable=False)
+
+    class Meta(ConflictsTable.Meta):
+        """Metaclass attributes of ResolvableConflictsTable."""
+
+        fields = ("select",) + ConflictsTable.Meta.fields
+        default_columns = fields
+
+
 class ConstraintViolationsTable(BaseTable):
     """ConstraintViolations renders the table in the constraint violations table."""
 
@@ -228,6 +267,7 @@ class PullRequestTable(BaseTable):
         verbose_name="Status",
     )
     title = tables.LinkColumn()
+    diff_stats = tables.TemplateColumn(DIFF_STATS, verbose_name="Changes", orderable=False)
 
     class Meta(BaseTable.Meta):
         """Metaclass attributes of PullRequestTable."""
@@ -239,7 +279,14 @@ class PullRequestTable(BaseTable):
             "status",
             "source_branch",
             "destination_branch",
+            "diff_stats",
             "creator",
             "created_at",
         )
         default_columns = fields
+
+    def before_render(self, request):
+        """Loads the diff stats of every pull request on the current page in one query."""
+        if self.columns["diff_stats"].visible:
+            rows = self.page.object_list if hasattr(self, "page") else self.rows
+            PullRequest.load_diff_stats(row.record for row in rows)
@@ -0,0 +1,38 @@
+"""Tasks.py contains the background tasks of the nautobot version control plugin."""
+
+from nautobot.core.celery import nautobot_task
+
+from nautobot_version_control import merge_queue
+from nautobot_version_control.constants import DOLT_DEFAULT_BRANCH
+from nautobot_version_control.merge import clear_merge_summary, compute_merge_summary
+from nautobot_version_control.models import Branch
+from nautobot_version_control.utils import query_on_branch
+
+
+@nautobot_task
+def build_merge_candidate(source_branch, destination_branch, source_hash, destination_hash):
+    """
+    Builds the merge candidate of two branches and stores its number of conflicts and violations.
+
+    `source_hash` and `destination_hash` are the heads the task was enqueued for, it
+    is no longer in flight once it is done, even if either branch has moved since.
+    """
+    try:
+        src = Branch.objects.get(name=source_branch)
+        dest = Branch.objects.get(name=destination_branch)
+        # building the merge candidate checks it out, check the worker's branch back out afterwards
+        with query_on_branch(DOLT_DEFAULT_BRANCH):
+            compute_merge_summary(src, dest)
+    except Branch.DoesNotExist:
+        # either branch was deleted since
+        pass
+    finally:
+        clear_merge_summary(source_hash, destination_hash)
+
+
+@nautobot_task
+def process_merge_queue():
+    """Merges the queued pull requests in order, unless another worker is already processing the merge queue."""
+    # pre-checks may build merge candidates, which check them out
+    with query_on_branch(DOLT_DEFAULT_BRANCH):
+        return merge_queue.process_queue()
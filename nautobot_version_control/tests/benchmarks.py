@@ -0,0 +1,168 @@
+"""
+Benchmarks for the nautobot version control plugin.
+
+Benchmarks are not collected by the default test run, run them explicitly with:
+
+    invoke unittest --label nautobot_version_control.tests.benchmarks
+"""
+
+import time
+from types import MappingProxyType
+from unittest import mock
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test import override_settings, SimpleTestCase
+
+from nautobot.dcim.models import Device, DeviceType, Location, Manufacturer, Platform, Rack
+from nautobot.extras.models import ComputedField, CustomField, Relationship, Role, Status, Tag
+from nautobot.tenancy.models import Tenant
+from nautobot.users.models import ObjectPermission, User
+
+from nautobot_version_control.constants import DOLT_DEFAULT_BRANCH
+from nautobot_version_control.dynamic.diff_factory import DiffListViewFactory
+from nautobot_version_control.graph import commit_graph
+from nautobot_version_control.models import Branch, Commit
+from nautobot_version_control.routers import GlobalStateRouter
+from nautobot_version_control.tests.test_doltapi import DoltTestCase
+
+
+def timed(func, repeat=5):
+    """Returns the best wall-clock time of `repeat` calls to `func`, in seconds."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def report(name, **timings):
+    """Prints the timings of a benchmark."""
+    results = ", ".join(f"{label}: {seconds * 1000:.1f}ms" for label, seconds in timings.items())
+    print(f"\n[benchmark] {name}: {results}")
+
+
+class DiffTableBenchmarks(SimpleTestCase):
+    """DiffTableBenchmarks measures the cost of building diff tables for repeated diff renders."""
+
+    renders = 1000
+
+    def test_diff_table_models(self):
+        """Compares generating a diff table class on every render with the process-wide cache."""
+        content_type = ContentType(app_label="dcim", model="device")
+
+        def uncached():
+            for _ in range(self.renders):
+                DiffListViewFactory(content_type).make_table_model()([])
+
+        def cached():
+            for _ in range(self.renders):
+                DiffListViewFactory(content_type).get_table_model()([])
+
+        report(f"{self.renders} device diff tables", uncached=timed(uncached), cached=timed(cached))
+
+
+class CommitGraphBenchmarks(DoltTestCase):
+    """CommitGraphBenchmarks compares the commit graph index with Dolt's graph queries on a long history."""
+
+    default = DOLT_DEFAULT_BRANCH
+    # creating the history takes a while, lower this for quick runs
+    commits = 100_000
+    main_commits = 10
+
+    def setUp(self):
+        """setUp commits a long history on a branch, and a few commits on main."""
+        self.main = Branch.objects.get(name=self.default)
+        Branch(name="graph-bench", starting_branch=self.default).save()
+        Branch.objects.get(name="graph-bench").checkout()
+        self.commit_many(self.commits)
+        self.main.checkout()
+        self.commit_many(self.main_commits)
+        commit_graph.clear()
+
+    def tearDown(self):
+        """tearDown is ran after every benchmark."""
+        self.main.checkout()
+        commit_graph.clear()
+        # Branch QuerySet deletes are not supported, delete branches individually.
+        for branch in Branch.objects.exclude(name=self.default):
+            branch.delete()
+
+    @staticmethod
+    def commit_many(count):
+        """Makes `count` empty commits on the active branch."""
+        with connection.cursor() as cursor:
+            for i in range(count):
+                cursor.execute("CALL dolt_commit('--allow-empty', '--message', %s)", [f"benchmark commit {i}"])
+
+    def test_merge_base(self):
+        """Compares merge bases and ahead/behind counts from Dolt and from the commit graph index."""
+        branch = Branch.objects.get(name="graph-bench")
+
+        def ahead_behind():
+            branch._ahead_behind = None  # pylint: disable=protected-access
+            return branch.ahead_behind
+
+        with override_settings(PLUGINS_CONFIG={"nautobot_version_control": {"commit_graph_index": False}}):
+            sql_merge_base = timed(lambda: Commit.merge_base(self.default, "graph-bench"))
+            sql_ahead_behind = timed(ahead_behind)
+            expected = (Commit.merge_base(self.default, "graph-bench"), ahead_behind())
+
+        load = timed(lambda: (commit_graph.clear(), commit_graph.load(branch.hash)), repeat=1)
+        graph_merge_base = timed(lambda: Commit.merge_base(self.default, "graph-bench"))
+        graph_ahead_behind = timed(ahead_behind)
+        self.assertEqual((Commit.merge_base(self.default, "graph-bench"), ahead_behind()), expected)
+
+        report(
+            f"merge base over {self.commits} commits",
+            sql=sql_merge_base,
+            graph_load=load,
+            graph=graph_merge_base,
+        )
+        report(f"ahead/behind over {self.commits} commits", sql=sql_ahead_behind, graph=graph_ahead_behind)
+
+
+class RouterBenchmarks(SimpleTestCase):
+    """RouterBenchmarks measures the overhead of the GlobalStateRouter on a device list page."""
+
+    # the models queried for each row of a device list page, and for the page itself
+    models = (
+        Device,
+        DeviceType,
+        Location,
+        Manufacturer,
+        Platform,
+        Rack,
+        Role,
+        Status,
+        Tag,
+        Tenant,
+        ComputedField,
+        CustomField,
+        Relationship,
+        ObjectPermission,
+        User,
+    )
+    rows_per_page = 50
+    pages = 100
+
+    def test_router_overhead(self):
+        """Compares routing with the registry of versioned models and with its compiled lookup."""
+        router = GlobalStateRouter()
+        queries = self.models * self.rows_per_page
+
+        def render_pages():
+            for _ in range(self.pages):
+                for model in queries:
+                    router.db_for_read(model)
+
+        compiled = timed(render_pages)
+        with mock.patch("nautobot_version_control.__VERSIONED_MODEL_LOOKUP__", MappingProxyType({})):
+            registry = timed(render_pages)
+        report(
+            f"routing {self.pages} device list pages of {len(queries)} queries",
+            registry=registry,
+            compiled=compiled,
+        )
@@ -0,0 +1,367 @@
+"""Tests for the diff utilities of the nautobot version control plugin."""
+
+import base64
+import json
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import connections
+from django.db.models import QuerySet
+from django.test import override_settings, SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse_lazy
+
+from nautobot.users.models import User
+from nautobot.dcim.models import Manufacturer
+from nautobot.tenancy.models import Tenant
+
+from nautobot_version_control import diffs, register_diff_tables
+from nautobot_version_control.cache import diff_cache, schema_cache
+from nautobot_version_control.catalogue import catalogue
+from nautobot_version_control.constants import DOLT_DEFAULT_BRANCH
+from nautobot_version_control.models import Branch, Commit
+from nautobot_version_control.tests.test_doltapi import DoltTestCase
+from nautobot_version_control.utils import db_for_commit
+
+DIFF_CACHE_SETTINGS = {
+    "CACHES": {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "default"},
+        "diffs": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "diffs"},
+    },
+    "PLUGINS_CONFIG": {
+        "nautobot_version_control": {
+            "diff_cache_alias": "diffs",
+            "diff_cache_max_entries": 2,
+        },
+    },
+}
+
+
+class TestDiffs(DoltTestCase):
+    """TestDiffs tests the diffs produced between two commits."""
+
+    default = DOLT_DEFAULT_BRANCH
+
+    def setUp(self):
+        """setUp is ran before every testcase."""
+        self.user, _ = User.objects.get_or_create(
+            username="diff-test", email="diff-test@example.com", is_superuser=True
+        )
+        self.main = Branch.objects.get(name=self.default)
+        Branch(name="diffs", starting_branch=self.default).save()
+        self.other = Branch.objects.get(name="diffs")
+
+    def tearDown(self):
+        """tearDown is ran after every testcase."""
+        self.main.checkout()
+        # Branch QuerySet deletes are not supported, delete branches individually.
+        for branch in Branch.objects.exclude(name=self.default):
+            branch.delete()
+
+    def make_change(self):
+        """Commits a new Manufacturer on the `diffs` branch and returns the (from, to) commit hashes."""
+        self.other.checkout()
+        Manufacturer.objects.create(name="diff-m1")
+        Commit(message="added a manufacturer").save(user=self.user)
+        head = Branch.objects.get(name="diffs").hash
+        return Commit.merge_base(self.default, "diffs"), head
+
+    def test_diff_summaries_only_changed_tables(self):
+        """test_diff_summaries_only_changed_tables asserts that untouched tables produce no results."""
+        from_commit, to_commit = self.make_change()
+        results = diffs.diff_summaries(from_commit=from_commit, to_commit=to_commit)
+        self.assertEqual([r["name"] for r in results], ["Manufacturer Diffs"])
+        self.assertEqual(results[0]["added"], 1)
+
+    def test_diff_summaries(self):
+        """test_diff_summaries asserts that summaries link to a paginated table of diff rows."""
+        from_commit, to_commit = self.make_change()
+        summaries = diffs.diff_summaries(from_commit=from_commit, to_commit=to_commit)
+        self.assertEqual(len(summaries), 1)
+        self.assertEqual(summaries[0]["count"], 1)
+        url = diffs.diff_table_url(summaries[0]["content_type"], from_commit, to_commit)
+        self.assertEqual(summaries[0]["url"], url)
+
+        table = diffs.table_diff(summaries[0]["content_type"], from_commit, to_commit)["table"]
+        table.paginate(page=1, per_page=25)
+        self.assertEqual([row.record.name for row in table.page.object_list], ["diff-m1"])
+
+    @override_settings(DATABASE_ROUTERS=["nautobot_version_control.routers.GlobalStateRouter"])
+    def test_diff_table_view_not_found(self):
+        """test_diff_table_view_not_found asserts that branch names and models without diffs are not found."""
+        from_commit, to_commit = self.make_change()
+        self.main.checkout()
+        self.client.force_login(self.user)
+        url = diffs.diff_table_url(ContentType.objects.get_for_model(Manufacturer), from_commit, to_commit)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        not_found = [
+            diffs.diff_table_url(ContentType.objects.get_for_model(Manufacturer), self.default, to_commit),
+            diffs.diff_table_url(ContentType.objects.get_for_model(User), from_commit, to_commit),
+        ]
+        for url in not_found:
+            self.assertEqual(self.client.get(url).status_code, 404)
+
+    @override_settings(
+        DATABASE_ROUTERS=["nautobot_version_control.routers.GlobalStateRouter"], EXEMPT_VIEW_PERMISSIONS=[]
+    )
+    def test_diff_table_view_permission(self):
+        """test_diff_table_view_permission asserts that diff rows are only shown to users who can view the model."""
+        from_commit, to_commit = self.make_change()
+        self.main.checkout()
+        user, _ = User.objects.get_or_create(username="diff-viewer", email="diff-viewer@example.com")
+        self.client.force_login(user)
+        url = diffs.diff_table_url(ContentType.objects.get_for_model(Manufacturer), from_commit, to_commit)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+    def test_diff_summaries_by_table(self):
+        """test_diff_summaries_by_table asserts that every changed table is summarized in a single query."""
+        self.other.checkout()
+        Manufacturer.objects.create(name="diff-m1")
+        Tenant.objects.create(name="diff-t1")
+        Commit(message="added a manufacturer and a tenant").save(user=self.user)
+        from_commit = Commit.merge_base(self.default, "diffs")
+        to_commit = Branch.objects.get(name="diffs").hash
+
+        with CaptureQueriesContext(connections["default"]) as queries:
+            summaries = diffs.diff_summaries_by_table(from_commit, to_commit)
+        self.assertEqual(len(queries.captured_queries), 1)
+        self.assertEqual(summaries[Manufacturer._meta.db_table], {"added": 1, "modified": 0, "removed": 0})
+        self.assertEqual(summaries[Tenant._meta.db_table], {"added": 1, "modified": 0, "removed": 0})
+
+    def test_diff_stats(self):
+        """test_diff_stats asserts that branches report the rows changed since they diverged from main."""
+        self.make_change()
+        stats = Branch.objects.get(name="diffs").diff_stats
+        self.assertEqual(stats, {"tables": 1, "added": 1, "modified": 0, "removed": 0})
+        self.assertEqual(self.main.diff_stats["tables"], 0)
+
+    @override_settings(PLUGINS_CONFIG={"nautobot_version_control": {"diff_cache_max_entries": 0}})
+    def test_diff_stats_batched(self):
+        """test_diff_stats_batched asserts that the diff stats of a page of branches are computed by one query."""
+        self.make_change()
+        branches = list(Branch.objects.filter(name__in=[self.default, "diffs"]).order_by("name"))
+        with CaptureQueriesContext(connections["default"]) as queries:
+            Branch.load_diff_stats(branches)
+        self.assertEqual(len([q for q in queries.captured_queries if "dolt_diff_stat" in q["sql"]]), 1)
+
+        with CaptureQueriesContext(connections["default"]) as queries:
+            stats = {branch.name: branch.diff_stats for branch in branches}
+        self.assertFalse(queries.captured_queries)
+        self.assertEqual(stats["diffs"], {"tables": 1, "added": 1, "modified": 0, "removed": 0})
+        self.assertEqual(stats[self.default]["tables"], 0)
+
+    @override_settings(**DIFF_CACHE_SETTINGS)
+    def test_table_diff_cached(self):
+        """test_table_diff_cached asserts that a repeated diff does not query the dolt diff tables."""
+        diff_cache.clear()
+        from_commit, to_commit = self.make_change()
+        content_type = ContentType.objects.get_for_model(Manufacturer)
+        first = diffs.table_diff(content_type, from_commit, to_commit)
+
+        with CaptureQueriesContext(connections[db_for_commit(to_commit)]) as queries:
+            second = diffs.table_diff(content_type, from_commit, to_commit)
+        self.assertFalse([q for q in queries.captured_queries if "dolt_commit_diff" in q["sql"]])
+        self.assertEqual(first["name"], second["name"])
+        self.assertEqual([r.pk for r in first["table"].data], [r.pk for r in second["table"].data])
+
+    @override_settings(PLUGINS_CONFIG={"nautobot_version_control": {"diff_chunk_size": 2, "diff_cache_max_entries": 0}})
+    def test_table_diff_streamed(self):
+        """test_table_diff_streamed asserts that diffs larger than a chunk are streamed in primary key order."""
+        self.other.checkout()
+        for i in range(5):
+            Manufacturer.objects.create(name=f"diff-stream-{i}")
+        Commit(message="added manufacturers").save(user=self.user)
+        from_commit = Commit.merge_base(self.default, "diffs")
+        to_commit = Branch.objects.get(name="diffs").hash
+
+        content_type = ContentType.objects.get_for_model(Manufacturer)
+        rows = diffs.table_diff(content_type, from_commit, to_commit)["table"].data.data
+        self.assertIsInstance(rows, diffs.DiffRows)
+        self.assertEqual(len(rows), 5)
+        pks = [row.pk for row in rows]
+        self.assertEqual(pks, sorted(pks))
+        self.assertEqual(len(set(pks)), 5)
+
+        # pages seek to their first row rather than reading the rows before them
+        with CaptureQueriesContext(connections[db_for_commit(to_commit)]) as queries:
+            page = rows[3:5]
+        self.assertEqual([row.pk for row in page], pks[3:5])
+        self.assertEqual(len([q for q in queries.captured_queries if "FROM dolt_commit_diff" in q["sql"]]), 1)
+        self.assertEqual(rows[-1].pk, pks[-1])
+
+        # rows that can't be loaded are built from their diff, so every counted row is yielded
+        with mock.patch.object(QuerySet, "in_bulk", return_value={}):
+            names = [row.name for row in rows]
+        self.assertEqual(sorted(names), [f"diff-stream-{i}" for i in range(5)])
+
+    def test_json_diff_fields_cached(self):
+        """test_json_diff_fields_cached asserts that diff table columns are introspected once per schema."""
+        schema_cache.clear()
+        _, to_commit = self.make_change()
+        using = db_for_commit(to_commit)
+        table = Manufacturer._meta.db_table
+        first = diffs.json_diff_fields(table, using=using, commit=to_commit)
+
+        with CaptureQueriesContext(connections[using]) as queries:
+            second = diffs.json_diff_fields(table, using=using, commit=to_commit)
+        self.assertFalse(queries.captured_queries)
+        self.assertEqual(first, second)
+        self.assertIn("'to_name'", first)
+
+    def test_changed_content_types_cached(self):
+        """test_changed_content_types_cached asserts that finding changed diffable models uses cached ContentTypes."""
+        changed = {Manufacturer._meta.db_table: {"added": 1}, "dolt_unknown": {"added": 1}}
+        diffs._changed_content_types(changed)  # pylint: disable=protected-access
+
+        with CaptureQueriesContext(connections["default"]) as queries:
+            content_types = diffs._changed_content_types(changed)  # pylint: disable=protected-access
+        self.assertFalse(queries.captured_queries)
+        self.assertEqual([ct.model_class() for ct in content_types], [Manufacturer])
+
+
+@override_settings(DATABASE_ROUTERS=["nautobot_version_control.routers.GlobalStateRouter"])
+class TestDiffsApi(DoltTestCase):
+    """TestDiffsApi tests the paginated and streamed diff api."""
+
+    default = DOLT_DEFAULT_BRANCH
+    url = reverse_lazy("plugins-api:nautobot_version_control-api:diff")
+
+    def setUp(self):
+        """setUp commits five Manufacturers on a new branch."""
+        self.user, _ = User.objects.get_or_create(
+            username="diff-api-test", email="diff-api-test@example.com", is_superuser=True
+        )
+        self.client.force_login(self.user)
+        self.main = Branch.objects.get(name=self.default)
+        Branch(name="diffs-api", starting_branch=self.default).save()
+        Branch.objects.get(name="diffs-api").checkout()
+        for i in range(5):
+            Manufacturer.objects.create(name=f"diff-api-{i}")
+        Commit(message="added manufacturers").save(user=self.user)
+        self.main.checkout()
+        self.params = {"from_commit": self.default, "to_commit": "diffs-api"}
+
+    def tearDown(self):
+        """tearDown is ran after every testcase."""
+        self.main.checkout()
+        # Branch QuerySet deletes are not supported, delete branches individually.
+        for branch in Branch.objects.exclude(name=self.default):
+            branch.delete()
+
+    def test_cursor_pagination(self):
+        """test_cursor_pagination asserts that following `next` cursors returns every row once, in pk order."""
+        response = self.client.get(self.url, {**self.params, "limit": 2})
+        self.assertEqual(response.status_code, 200)
+        pages = [response.json()]
+        while pages[-1]["next"]:
+            pages.append(self.client.get(pages[-1]["next"]).json())
+
+        self.assertEqual([len(page["results"]) for page in pages], [2, 2, 1])
+        rows = [row for page in pages for row in page["results"]]
+        self.assertEqual([row["pk"] for row in rows], sorted(row["pk"] for row in rows))
+        self.assertEqual({row["changes"]["name"]["to"] for row in rows}, {f"diff-api-{i}" for i in range(5)})
+        self.assertEqual({(row["table"], row["diff_type"]) for row in rows}, {("dcim.manufacturer", "added")})
+
+    def test_ndjson_stream(self):
+        """test_ndjson_stream asserts that every row is streamed as one line of JSON."""
+        response = self.client.get(self.url, {**self.params, "stream": "true"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(json.loads(lines[0])["diff_type"], "added")
+
+    def test_unknown_branch(self):
+        """test_unknown_branch asserts that unknown refs are rejected."""
+        response = self.client.get(self.url, {**self.params, "to_commit": "no-such-branch"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_cursor(self):
+        """test_invalid_cursor asserts that garbage, tampered and out of filter cursors are rejected."""
+        next_url = self.client.get(self.url, {**self.params, "limit": 2}).json()["next"]
+        cursor = parse_qs(urlparse(next_url).query)["cursor"][0]
+        decoded = json.loads(base64.urlsafe_b64decode(cursor))
+
+        def encode(value):
+            return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+        invalid = [
+            {"cursor": "not-a-cursor!"},
+            {"cursor": encode({**decoded, "pk": "not-a-uuid"})},
+            {"cursor": encode({**decoded, "pk": {"id": 1}})},
+            {"cursor": cursor, "table": "tenancy.tenant"},
+        ]
+        for params in invalid:
+            response = self.client.get(self.url, {**self.params, **params})
+            self.assertEqual(response.status_code, 400, params)
+
+    @override_settings(EXEMPT_VIEW_PERMISSIONS=[])
+    def test_view_permission(self):
+        """test_view_permission asserts that only the rows of models the user can view are returned."""
+        user, _ = User.objects.get_or_create(username="diff-api-viewer", email="diff-api-viewer@example.com")
+        self.client.force_login(user)
+        response = self.client.get(self.url, self.params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"], [])
+        response = self.client.get(self.url, {**self.params, "table": "dcim.manufacturer"})
+        self.assertEqual(response.status_code, 403)
+
+
+class TestCatalogue(SimpleTestCase):
+    """TestCatalogue tests the catalogue of models used by diffs and merge conflicts."""
+
+    def test_catalogue(self):
+        """test_catalogue asserts that tables map to models, and diffable models to their diff table."""
+        self.assertIs(catalogue.model_for_table(Manufacturer._meta.db_table), Manufacturer)
+        self.assertIn(Manufacturer._meta.db_table, catalogue.diffable_tables)
+        self.assertIsNotNone(catalogue.diff_table(Manufacturer))
+        self.assertNotIn(User._meta.db_table, catalogue.diffable_tables)
+
+    def test_register_invalidates(self):
+        """test_register_invalidates asserts that registering diff tables rebuilds the catalogue."""
+        entries = catalogue.entries()
+        self.assertIs(catalogue.entries(), entries)
+        register_diff_tables({"dcim": {"manufacturer": catalogue.diff_table(Manufacturer)}})
+        self.assertIsNot(catalogue.entries(), entries)
+
+
+@override_settings(**DIFF_CACHE_SETTINGS)
+class TestDiffCache(SimpleTestCase):
+    """TestDiffCache tests the eviction policy of the diff cache."""
+
+    hashes = [str(i) * 32 for i in range(4)]
+
+    def setUp(self):
+        """setUp is ran before every testcase."""
+        diff_cache.clear()
+        # none of the hashes are branch names, without querying the database
+        patcher = mock.patch("nautobot_version_control.cache.is_branch_name", return_value=False)
+        self.is_branch_name = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_branch_names_not_cached(self):
+        """test_branch_names_not_cached asserts that mutable branch names are never cached."""
+        diff_cache.set("summaries", "main", self.hashes[0], ["rows"])
+        self.assertIsNone(diff_cache.get("summaries", "main", self.hashes[0]))
+
+    def test_hash_like_branch_names_not_cached(self):
+        """test_hash_like_branch_names_not_cached asserts that branches named like a commit hash are never cached."""
+        self.is_branch_name.return_value = True
+        diff_cache.set("summaries", self.hashes[0], self.hashes[1], ["rows"])
+        self.is_branch_name.assert_called_once_with(self.hashes[0], self.hashes[1])
+        self.assertIsNone(diff_cache.get("summaries", self.hashes[0], self.hashes[1]))
+
+    def test_eviction(self):
+        """test_eviction asserts that the oldest entry is evicted first, and that reads don't write the index."""
+        diff_cache.set("summaries", self.hashes[0], self.hashes[1], "a")
+        diff_cache.set("summaries", self.hashes[1], self.hashes[2], "b")
+        with mock.patch.object(diff_cache.cache, "set") as cache_set:
+            self.assertEqual(diff_cache.get("summaries", self.hashes[0], self.hashes[1]), "a")
+        cache_set.assert_not_called()
+        diff_cache.set("summaries", self.hashes[2], self.hashes[3], "c")
+
+        self.assertIsNone(diff_cache.get("summaries", self.hashes[0], self.hashes[1]))
+        self.assertEqual(diff_cache.get("summaries", self.hashes[1], self.hashes[2]), "b")
+        self.assertEqual(diff_cache.get("summaries", self.hashes[2], self.hashes[3]), "c")
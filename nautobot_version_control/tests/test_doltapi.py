@@ -1,18 +1,33 @@
 """tests.py contains unittests for the nautobot version control plugin."""
 # pylint: disable=too-many-ancestors
+import json
+from unittest import mock
 
 from django.test import override_settings, TransactionTestCase
-from django.urls import reverse
-from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse, reverse_lazy
+from django.db import connection, connections
 
 from nautobot.core.testing import APITestCase, APIViewTestCases
 from nautobot.users.models import User
-from nautobot.dcim.models import Manufacturer
-
-from nautobot_version_control.models import Branch, Commit, PullRequest, PullRequestReview
-from nautobot_version_control.merge import get_conflicts_count_for_merge
-from nautobot_version_control.utils import active_branch
-from nautobot_version_control.constants import DOLT_DEFAULT_BRANCH
+from nautobot.dcim.models import Location, LocationType, Manufacturer
+from nautobot.extras.models import Status
+
+from nautobot_version_control.models import Branch, Commit, MergeCandidate, PullRequest, PullRequestReview
+from nautobot_version_control.merge import (
+    get_conflicts_count_for_merge,
+    get_conflicts_for_merge,
+    get_merge_candidate,
+    get_merge_summary,
+    get_or_make_merge_candidate,
+    merge_candidate_exists,
+    merge_preview,
+    MergeConflicts,
+    MERGE_CANDIDATE_PREFIX,
+)
+from nautobot_version_control.tasks import build_merge_candidate
+from nautobot_version_control.utils import active_branch, route_to_branch
+from nautobot_version_control.constants import DOLT_DEFAULT_BRANCH, GLOBAL_DB
 
 
 @override_settings(DATABASE_ROUTERS=["nautobot_version_control.routers.GlobalStateRouter"])
@@ -93,6 +108,28 @@ class TestBranches(DoltTestCase):
             branch.delete()
         self.assertEqual(Branch.objects.filter(name="todelete").count(), 0)
 
+    def test_ahead_behind(self):
+        """test_ahead_behind asserts that the ahead/behind counts of many branches are loaded in one query."""
+        main = Branch.objects.get(name=self.default)
+        Branch(name="ahead", starting_branch=self.default).save()
+        Branch(name="behind", starting_branch=self.default).save()
+        Branch.objects.get(name="ahead").checkout()
+        Commit(message="commit on ahead").save(user=self.user)
+        main.checkout()
+        Commit(message="commit on main").save(user=self.user)
+
+        with override_settings(PLUGINS_CONFIG={"nautobot_version_control": {"commit_graph_index": False}}):
+            branches = list(Branch.objects.filter(name__in=["ahead", "behind"]).order_by("name"))
+            with CaptureQueriesContext(connection) as queries:
+                Branch.load_ahead_behind(branches)
+                ahead_behind = [branch.ahead_behind for branch in branches]
+            self.assertEqual(len(queries.captured_queries), 1)
+            self.assertEqual(ahead_behind, ["1 ahead / 1 behind", "0 ahead / 1 behind"])
+
+        # the commit graph index gives the same counts
+        branches = list(Branch.objects.filter(name__in=["ahead", "behind"]).order_by("name"))
+        self.assertEqual([branch.ahead_behind for branch in branches], ahead_behind)
+
     def test_merge_ff(self):
         """test_merge_ff tests whether a ff merge works."""
         Branch(name="ff", starting_branch=self.default).save()
@@ -184,6 +221,119 @@ class TestBranches(DoltTestCase):
         self.assertEqual(get_conflicts_count_for_merge(other, main), 1)
         main.checkout()  # need this because of post truncate action with TransactionTests
 
+    def test_conflict_names_in_bulk(self):
+        """test_conflict_names_in_bulk asserts that the names of conflicted objects are queried per chunk of ids."""
+        main = Branch.objects.get(name=self.default)
+        names = [f"m-bulk-{i}" for i in range(5)]
+        for name in names:
+            Manufacturer.objects.create(name=name, description="base")
+        Commit(message="commit manufacturers").save(user=self.user)
+        Branch(name="bulk-conflicts", starting_branch=self.default).save()
+        other = Branch.objects.get(name="bulk-conflicts")
+
+        Manufacturer.objects.filter(name__in=names).update(description="main")
+        Commit(message="change manufacturers on main").save(user=self.user)
+        other.checkout()
+        Manufacturer.objects.filter(name__in=names).update(description="other")
+        Commit(message="change manufacturers on other").save(user=self.user)
+        main.checkout()
+
+        main = Branch.objects.get(name=self.default)
+        other = Branch.objects.get(name="bulk-conflicts")
+        self.assertEqual(get_conflicts_count_for_merge(other, main), 5)
+        with merge_preview(other, main) as using:
+            conflicts = MergeConflicts(other, main, using=using)
+            for chunk_size, num_queries in ((1000, 1), (2, 3)):
+                conflicts.name_chunk_size = chunk_size
+                with CaptureQueriesContext(connections[using]) as queries:
+                    rows = conflicts.make_conflict_table().data
+                name_queries = [q for q in queries.captured_queries if "FROM `dcim_manufacturer`" in q["sql"]]
+                self.assertEqual(len(name_queries), num_queries)
+                self.assertEqual(sorted(row["id"] for row in rows), names)
+        main.checkout()
+
+    def test_merge_preview(self):
+        """test_merge_preview asserts that previewing a merge finds conflicts without creating branches or commits."""
+        main = Branch.objects.get(name=self.default)
+        Manufacturer.objects.create(name="m-preview", description="base")
+        Commit(message="commit m-preview").save(user=self.user)
+        Branch(name="preview", starting_branch=self.default).save()
+        Manufacturer.objects.filter(name="m-preview").update(description="main")
+        Commit(message="change m-preview on main").save(user=self.user)
+        Branch.objects.get(name="preview").checkout()
+        Manufacturer.objects.filter(name="m-preview").update(description="preview")
+        Commit(message="change m-preview on preview").save(user=self.user)
+        main.checkout()
+
+        main = Branch.objects.get(name=self.default)
+        other = Branch.objects.get(name="preview")
+        self.assertEqual(get_conflicts_count_for_merge(other, main), 1)
+        self.assertFalse(Branch.objects.filter(name__startswith=MERGE_CANDIDATE_PREFIX).exists())
+        self.assertEqual(Branch.objects.get(name=self.default).hash, main.hash)
+        self.assertEqual(Manufacturer.objects.get(name="m-preview").description, "main")
+
+        # merge candidate branches are still built if merges are not previewed
+        MergeCandidate.objects.all().delete()
+        with override_settings(PLUGINS_CONFIG={"nautobot_version_control": {"merge_preview": False}}):
+            self.assertEqual(get_conflicts_count_for_merge(other, main), 1)
+        self.assertTrue(Branch.objects.filter(name__startswith=MERGE_CANDIDATE_PREFIX).exists())
+        main.checkout()
+
+    def test_merge_candidate_freshness(self):
+        """test_merge_candidate_freshness asserts that merge candidates are stale once either branch moves."""
+        main = Branch.objects.get(name=self.default)
+        Branch(name="fresh", starting_branch=self.default).save()
+        other = Branch.objects.get(name="fresh")
+        self.assertEqual(get_conflicts_count_for_merge(other, main), 0)
+        main.checkout()
+
+        meta = MergeCandidate.objects.get(source_branch="fresh", destination_branch=self.default)
+        self.assertEqual((meta.source_hash, meta.destination_hash), (other.hash, main.hash))
+        with CaptureQueriesContext(connections[GLOBAL_DB]) as queries:
+            self.assertTrue(merge_candidate_exists(other, main))
+        self.assertEqual(len(queries.captured_queries), 1)
+
+        other.checkout()
+        Manufacturer.objects.create(name="m-fresh")
+        Commit(message="commit m-fresh").save(user=self.user)
+        main.checkout()
+        self.assertFalse(merge_candidate_exists(Branch.objects.get(name="fresh"), main))
+
+    def test_previewed_merge_candidate(self):
+        """test_previewed_merge_candidate asserts that a preview does not make an old merge candidate current."""
+        main = Branch.objects.get(name=self.default)
+        Branch(name="stale", starting_branch=self.default).save()
+        other = Branch.objects.get(name="stale")
+        with override_settings(PLUGINS_CONFIG={"nautobot_version_control": {"merge_preview": False}}):
+            self.assertEqual(get_conflicts_count_for_merge(other, main), 0)
+        main.checkout()
+        self.assertIsNotNone(get_merge_candidate(other, main))
+
+        Manufacturer.objects.create(name="m-stale")
+        Commit(message="commit m-stale").save(user=self.user)
+        main = Branch.objects.get(name=self.default)
+        self.assertEqual(get_conflicts_count_for_merge(other, main), 0)
+        self.assertFalse(MergeCandidate.objects.get(source_branch="stale").built)
+        self.assertIsNone(get_merge_candidate(other, main))
+
+        merge_candidate = get_or_make_merge_candidate(other, main)
+        main.checkout()
+        self.assertTrue(MergeCandidate.objects.get(source_branch="stale").built)
+        self.assertEqual(Commit.merge_base(merge_candidate.hash, main.hash), main.hash)
+
+    def test_merge_candidate_keeps_active_branch(self):
+        """test_merge_candidate_keeps_active_branch asserts that building a merge candidate doesn't switch branches."""
+        main = Branch.objects.get(name=self.default)
+        Branch(name="candidate", starting_branch=self.default).save()
+        other = Branch.objects.get(name="candidate")
+        main.checkout()
+        with route_to_branch(self.default):
+            get_or_make_merge_candidate(other, main)
+            self.assertEqual(active_branch(), self.default)
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT active_branch();")
+                self.assertEqual(cursor.fetchone()[0], self.default)
+
 
 @override_settings(DATABASE_ROUTERS=["nautobot_version_control.routers.GlobalStateRouter"])
 class TestApp(DoltApiTestCase):
@@ -324,6 +474,208 @@ class TestPullRequests(DoltTestCase):
             PullRequest.objects.filter(source_branch=test_branch.name, destination_branch=self.default).count(),
         )
 
+    @override_settings(
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+        PLUGINS_CONFIG={"nautobot_version_control": {"merge_candidate_background": True}},
+    )
+    def test_merge_summary_background(self):
+        """test_merge_summary_background asserts that merge candidates are built in the background after a commit."""
+        Branch(name="test", starting_branch=self.default).save()
+        test_branch = Branch.objects.get(name="test")
+        PullRequest.objects.create(
+            title="MyPr",
+            state=PullRequest.OPEN,
+            source_branch=test_branch.name,
+            destination_branch=self.default,
+            creator=self.user,
+        )
+
+        test_branch.checkout()
+        with mock.patch.object(build_merge_candidate, "delay") as delay:
+            Manufacturer.objects.create(name="m-summary")
+            Commit(message="commit m-summary").save(user=self.user)
+            self.main.checkout()
+            src, dest = PullRequest.objects.get(title="MyPr").get_src_dest_branches()
+            delay.assert_called_once_with("test", self.default, src.hash, dest.hash)
+
+            # the task is in flight, it is not enqueued again
+            self.assertIsNone(get_merge_summary(src, dest))
+            delay.assert_called_once()
+
+        build_merge_candidate(*delay.call_args.args)
+        self.assertEqual(get_merge_summary(src, dest), {"conflicts": 0, "violations": 0})
+        self.main.checkout()
+
+    def test_merge_summary_background_disabled(self):
+        """test_merge_summary_background_disabled asserts that commits and merges don't look up pull requests."""
+        Branch(name="test", starting_branch=self.default).save()
+        test_branch = Branch.objects.get(name="test")
+        test_branch.checkout()
+        with mock.patch("nautobot_version_control.merge.schedule_merge_summaries") as schedule:
+            Manufacturer.objects.create(name="m-no-summary")
+            Commit(message="commit m-no-summary").save(user=self.user)
+            self.main.checkout()
+            self.main.merge(test_branch, user=self.user)
+        schedule.assert_not_called()
+        self.main.checkout()
+
+
+@override_settings(DATABASE_ROUTERS=["nautobot_version_control.routers.GlobalStateRouter"])
+class TestConflictsApi(DoltTestCase):
+    """TestConflictsApi tests the paginated and streamed row-level conflicts."""
+
+    default = DOLT_DEFAULT_BRANCH
+    url = reverse_lazy("plugins-api:nautobot_version_control-api:conflict")
+    names = [f"m-page-{i}" for i in range(5)]
+
+    def setUp(self):
+        """setUp changes five Manufacturers on main and on a new branch."""
+        self.user, _ = User.objects.get_or_create(
+            username="conflicts-api-test", email="conflicts-api-test@example.com", is_superuser=True
+        )
+        self.client.force_login(self.user)
+        self.main = Branch.objects.get(name=self.default)
+        for name in self.names:
+            Manufacturer.objects.create(name=name, description="base")
+        Commit(message="commit manufacturers").save(user=self.user)
+        Branch(name="paged-conflicts", starting_branch=self.default).save()
+        Manufacturer.objects.filter(name__in=self.names).update(description="main")
+        Commit(message="change manufacturers on main").save(user=self.user)
+        Branch.objects.get(name="paged-conflicts").checkout()
+        Manufacturer.objects.filter(name__in=self.names).update(description="other")
+        Commit(message="change manufacturers on other").save(user=self.user)
+        self.main.checkout()
+        self.params = {"source_branch": "paged-conflicts", "destination_branch": self.default}
+
+    def tearDown(self):
+        """tearDown is ran after every testcase."""
+        self.main.checkout()
+        MergeCandidate.objects.all().delete()
+        # Branch QuerySet deletes are not supported, delete branches individually.
+        for branch in Branch.objects.exclude(name=self.default):
+            branch.delete()
+
+    def resolve(self, resolutions):
+        """Posts conflict resolutions to the conflicts api."""
+        body = json.dumps({**self.params, "resolutions": resolutions})
+        return self.client.post(self.url, body, content_type="application/json")
+
+    def test_cursor_pagination(self):
+        """test_cursor_pagination asserts that following `next` cursors returns every conflict once, in key order."""
+        response = self.client.get(self.url, {**self.params, "limit": 2})
+        self.assertEqual(response.status_code, 200)
+        pages = [response.json()]
+        while pages[-1]["next"]:
+            pages.append(self.client.get(pages[-1]["next"]).json())
+
+        self.assertEqual([len(page["results"]) for page in pages], [2, 2, 1])
+        self.assertEqual(pages[0]["summary"][0]["table"], "dcim_manufacturer")
+        self.assertEqual(pages[0]["summary"][0]["num_conflicts"], 5)
+        rows = [row for page in pages for row in page["results"]]
+        self.assertEqual([row["key"] for row in rows], sorted(row["key"] for row in rows))
+        self.assertEqual(sorted(row["id"] for row in rows), self.names)
+        self.assertEqual({row["kind"] for row in rows}, {"conflict"})
+
+    def test_ndjson_stream(self):
+        """test_ndjson_stream asserts that the summary, then every conflict, is streamed as one line of JSON."""
+        response = self.client.get(self.url, {**self.params, "stream": "true"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([line["kind"] for line in lines], ["summary"] + ["conflict"] * 5)
+
+    def test_conflict_pages(self):
+        """test_conflict_pages asserts that the conflicts of a table are shown one page at a time."""
+        src = Branch.objects.get(name="paged-conflicts")
+        with override_settings(PLUGINS_CONFIG={"nautobot_version_control": {"conflict_chunk_size": 2}}):
+            pages = [get_conflicts_for_merge(src, self.main)]
+            while pages[-1]["conflicts_next"]:
+                pages.append(get_conflicts_for_merge(src, self.main, conflicts_after=pages[-1]["conflicts_next"]))
+        self.assertEqual([len(page["conflicts"].data) for page in pages], [2, 2, 1])
+        self.assertEqual({page["num_conflicts"] for page in pages}, {5})
+        self.assertEqual(sorted(row["id"] for page in pages for row in page["conflicts"].data), self.names)
+
+    def test_unknown_branch(self):
+        """test_unknown_branch asserts that unknown branches are rejected."""
+        response = self.client.get(self.url, {**self.params, "source_branch": "no-such-branch"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_duplicate_violation_keys(self):
+        """test_duplicate_violation_keys asserts that every violation of a row is paged, even of the same type."""
+        status = Status.objects.get(name="Active")
+        location_type = LocationType.objects.create(name="lt-violations", nestable=True)
+        parent = Location.objects.create(name="l-parent", location_type=location_type, status=status)
+        Commit(message="commit a location").save(user=self.user)
+        Branch(name="violations", starting_branch=self.default).save()
+        Branch.objects.get(name="violations").checkout()
+        Location.objects.create(name="l-child", location_type=location_type, parent=parent, status=status)
+        Commit(message="add a child location").save(user=self.user)
+        self.main.checkout()
+        parent.delete()
+        location_type.delete()
+        Commit(message="delete the location and its type").save(user=self.user)
+
+        # the child location references both a missing parent and a missing location type
+        params = {"source_branch": "violations", "destination_branch": self.default, "table": "dcim_location"}
+        pages = [self.client.get(self.url, {**params, "limit": 1}).json()]
+        while pages[-1]["next"]:
+            pages.append(self.client.get(pages[-1]["next"]).json())
+        rows = [row for page in pages for row in page["results"] if row["kind"] == "violation"]
+        self.assertEqual(len(rows), 2)
+        self.assertEqual({(row["key"][0], row["key"][1]) for row in rows}, {(rows[0]["key"][0], "foreign key")})
+        self.assertNotEqual(rows[0]["key"], rows[1]["key"])
+
+    def test_bulk_resolution(self):
+        """test_bulk_resolution asserts that rows, then a whole table, are resolved in bulk with a single commit."""
+        rows = self.client.get(self.url, self.params).json()["results"]
+        theirs = rows[:2]
+        resolutions = [{"table": "dcim_manufacturer", "take": "theirs", "keys": [row["key"] for row in theirs]}]
+        response = self.resolve(resolutions)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["resolved"], {"dcim_manufacturer": 2})
+        self.assertEqual(response.json()["conflicts"], 3)
+        self.assertIsNone(response.json()["commit"])
+        self.assertEqual(len(self.client.get(self.url, self.params).json()["results"]), 3)
+
+        resolutions = [{"table": "dcim_manufacturer", "take": "ours"}]
+        response = self.resolve(resolutions)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["conflicts"], 0)
+        self.assertIsNotNone(response.json()["commit"])
+
+        # the source branch was fast-forwarded to the resolved merge, and now merges cleanly
+        src = Branch.objects.get(name="paged-conflicts")
+        self.assertEqual(src.hash, response.json()["commit"])
+        self.assertEqual(get_conflicts_count_for_merge(src, self.main), 0)
+        src.checkout()
+        descriptions = dict(Manufacturer.objects.filter(name__in=self.names).values_list("name", "description"))
+        self.main.checkout()
+        self.assertEqual({descriptions[row["id"]] for row in theirs}, {"other"})
+        self.assertEqual(sorted(descriptions.values()), ["main"] * 3 + ["other"] * 2)
+
+    def test_resolution_after_head_moved(self):
+        """test_resolution_after_head_moved asserts that conflicts are resolved on the merge of the current heads."""
+        key = self.client.get(self.url, self.params).json()["results"][0]["key"]
+        response = self.resolve([{"table": "dcim_manufacturer", "take": "theirs", "keys": [key]}])
+        self.assertEqual(response.json()["conflicts"], 4)
+
+        # main moves, the partially resolved merge candidate is rebuilt from the new heads
+        Manufacturer.objects.filter(name=self.names[0]).update(description="other")
+        Commit(message="take other on main").save(user=self.user)
+        response = self.resolve([{"table": "dcim_manufacturer", "take": "ours"}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["resolved"], {"dcim_manufacturer": 4})
+        self.assertIsNotNone(response.json()["commit"])
+        main = Branch.objects.get(name=self.default)
+        src = Branch.objects.get(name="paged-conflicts")
+        self.assertEqual(Commit.merge_base(src.hash, main.hash), main.hash)
+
+    def test_resolution_requires_known_table(self):
+        """test_resolution_requires_known_table asserts that only tables with conflicts are resolved."""
+        resolutions = [{"table": "dcim_device; DROP TABLE dcim_device", "take": "ours"}]
+        response = self.resolve(resolutions)
+        self.assertEqual(response.status_code, 400)
+
 
 @override_settings(DATABASE_ROUTERS=["nautobot_version_control.routers.GlobalStateRouter"])
 class TestPullRequestReviewsApi(DoltApiTestCase, APIViewTestCases):
@@ -377,3 +729,41 @@ class TestCommitsApi(DoltApiTestCase, APIViewTestCases):
         response = self.client.get(f"{url}?format=api", **self.header)
 
         self.assertEqual(response.status_code, 200)
+
+
+@override_settings(DATABASE_ROUTERS=["nautobot_version_control.routers.GlobalStateRouter"])
+class TestActiveBranchQueries(DoltTestCase):
+    """TestActiveBranchQueries tests that pages know the active branch without querying it."""
+
+    default = DOLT_DEFAULT_BRANCH
+
+    def setUp(self):
+        """setUp is ran before every testcase."""
+        self.user, _ = User.objects.get_or_create(
+            username="active-branch-test", email="active-branch-test@example.com", is_superuser=True
+        )
+        self.client.force_login(self.user)
+        for i in range(3):
+            Branch(name=f"active-branch-{i}", starting_branch=self.default).save()
+
+    def tearDown(self):
+        """tearDown is ran after every testcase."""
+        Branch.objects.get(name=self.default).checkout()
+        # Branch QuerySet deletes are not supported, delete branches individually.
+        for branch in Branch.objects.exclude(name=self.default):
+            branch.delete()
+
+    def assert_no_active_branch_queries(self, url):
+        """Asserts that rendering `url` does not query the active branch."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([q["sql"] for q in queries.captured_queries if "active_branch()" in q["sql"]], [])
+
+    def test_branch_list(self):
+        """test_branch_list asserts that the branch list does not query the active branch once per row."""
+        self.assert_no_active_branch_queries(reverse("plugins:nautobot_version_control:branch_list"))
+
+    def test_commit_list(self):
+        """test_commit_list asserts that the commit list does not query the active branch."""
+        self.assert_no_active_branch_queries(reverse("plugins:nautobot_version_control:commit_list"))
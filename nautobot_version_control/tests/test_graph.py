@@ -0,0 +1,61 @@
+"""Tests for the commit graph index of the nautobot version control plugin."""
+
+from django.test import SimpleTestCase
+
+from nautobot_version_control.graph import CommitGraph
+
+
+class TestCommitGraph(SimpleTestCase):
+    """TestCommitGraph tests graph queries against a commit graph loaded in memory."""
+
+    # a -- b -- c -- e -- g   main
+    #       \        /
+    #        d ---- f -- h    feature
+    parents = {
+        "a": [],
+        "b": ["a"],
+        "c": ["b"],
+        "d": ["b"],
+        "f": ["d"],
+        "e": ["c", "f"],
+        "g": ["e"],
+        "h": ["f"],
+    }
+
+    def setUp(self):
+        """setUp loads the commit graph from (commit, parent, parent_index) rows."""
+        self.graph = CommitGraph()
+        rows = []
+        for commit, parents in self.parents.items():
+            rows.extend((commit, parent, index) for index, parent in enumerate(parents))
+            if not parents:
+                rows.append((commit, None, 0))
+        # rows are not ordered by Dolt
+        self.graph._add(reversed(rows))  # pylint: disable=protected-access
+        for commit in self.parents:
+            self.graph._generation(self.graph._ids[commit])  # pylint: disable=protected-access
+
+    def merge_base(self, left, right):
+        """Returns the merge base of two commits in the test graph."""
+        ids, hashes = self.graph._ids, self.graph._hashes  # pylint: disable=protected-access
+        bases = self.graph._merge_bases(ids[left], ids[right])  # pylint: disable=protected-access
+        return hashes[bases[0]]
+
+    def only(self, include, exclude):
+        """Returns the commits reachable from include but not exclude in the test graph."""
+        ids, hashes = self.graph._ids, self.graph._hashes  # pylint: disable=protected-access
+        return [hashes[n] for n in self.graph._only(ids[include], ids[exclude])]  # pylint: disable=protected-access
+
+    def test_merge_base(self):
+        """test_merge_base asserts that the newest common ancestor is returned."""
+        self.assertEqual(self.merge_base("g", "h"), "f")
+        self.assertEqual(self.merge_base("c", "d"), "b")
+        self.assertEqual(self.merge_base("g", "c"), "c")
+        self.assertEqual(self.merge_base("a", "a"), "a")
+
+    def test_only(self):
+        """test_only asserts that commits reachable from both commits are excluded, newest first."""
+        self.assertEqual(self.only("h", "g"), ["h"])
+        self.assertEqual(self.only("g", "h"), ["g", "e", "c"])
+        self.assertEqual(self.only("c", "g"), [])
+        self.assertEqual(self.only("g", "a"), ["g", "e", "f", "c", "d", "b"])
@@ -0,0 +1,180 @@
+"""Tests for the merge queue of pull requests."""
+
+from datetime import timedelta
+from unittest import mock
+
+from django.test import override_settings
+from django.utils import timezone
+
+from nautobot.dcim.models import Manufacturer
+from nautobot.users.models import User
+
+from nautobot_version_control.constants import DOLT_DEFAULT_BRANCH
+from nautobot_version_control.merge import compute_merge_summary
+from nautobot_version_control.merge_queue import enqueue_merge, MERGE_QUEUE_BATCH_PREFIX, process_queue, queue_stats
+from nautobot_version_control.metrics import metric_merge_queue
+from nautobot_version_control.models import Branch, Commit, MergeCandidate, MergeQueueEntry, PullRequest
+from nautobot_version_control.tests.test_doltapi import DoltTestCase
+
+
+@mock.patch("nautobot_version_control.merge_queue.schedule_merge_queue")
+class TestMergeQueue(DoltTestCase):
+    """TestMergeQueue tests the serialized and batched merges of queued pull requests."""
+
+    default = DOLT_DEFAULT_BRANCH
+
+    def setUp(self):
+        """setUp opens two pull requests, each adding a Manufacturer on its own branch."""
+        self.user, _ = User.objects.get_or_create(
+            username="merge-queue-test", email="merge-queue-test@example.com", is_superuser=True
+        )
+        self.main = Branch.objects.get(name=self.default)
+        self.pull_requests = [self.make_pull_request(name, f"m-{name}") for name in ("queue-a", "queue-b")]
+
+    def tearDown(self):
+        """tearDown is ran after every testcase."""
+        self.main.checkout()
+        MergeQueueEntry.objects.all().delete()
+        PullRequest.objects.all().delete()
+        MergeCandidate.objects.all().delete()
+        # Branch QuerySet deletes are not supported, delete branches individually.
+        for branch in Branch.objects.exclude(name=self.default):
+            branch.delete()
+
+    def make_pull_request(self, name, manufacturer, description=""):
+        """Creates a branch setting the description of a Manufacturer, and a pull request into main."""
+        Branch(name=name, starting_branch=self.default).save()
+        Branch.objects.get(name=name).checkout()
+        Manufacturer.objects.update_or_create(name=manufacturer, defaults={"description": description})
+        Commit(message=f"change {manufacturer}").save(user=self.user)
+        self.main.checkout()
+        return PullRequest.objects.create(
+            title=name, source_branch=name, destination_branch=self.default, creator=self.user
+        )
+
+    def enqueue_all(self):
+        """Enqueues the merge of every pull request, returns their entries."""
+        return [enqueue_merge(pull_request, user=self.user) for pull_request in self.pull_requests]
+
+    def test_serial_merges(self, schedule):
+        """test_serial_merges asserts that queued pull requests are merged in order, one merge commit each."""
+        entries = self.enqueue_all()
+        self.assertEqual(schedule.call_count, 2)
+        self.assertEqual([entry.position for entry in entries], [1, 2])
+        self.assertEqual(enqueue_merge(self.pull_requests[0]).pk, entries[0].pk)
+        self.assertEqual(queue_stats()["depth"], {self.default: 2})
+
+        self.assertEqual(process_queue(), 2)
+        entries = list(MergeQueueEntry.objects.order_by("id"))
+        self.assertEqual([entry.state for entry in entries], [MergeQueueEntry.MERGED] * 2)
+        self.assertNotEqual(entries[0].commit_hash, entries[1].commit_hash)
+        self.assertEqual(Branch.objects.get(name=self.default).hash, entries[1].commit_hash)
+        self.assertEqual(set(PullRequest.objects.values_list("state", flat=True)), {PullRequest.MERGED})
+        self.assertEqual(Manufacturer.objects.filter(name__in=["m-queue-a", "m-queue-b"]).count(), 2)
+
+        stats = queue_stats()
+        self.assertEqual(stats["depth"], {})
+        self.assertEqual(stats["merging"], 0)
+        self.assertEqual(stats["processed"][MergeQueueEntry.MERGED]["count"], 2)
+
+    @override_settings(PLUGINS_CONFIG={"nautobot_version_control": {"merge_queue_batch_size": 2}})
+    def test_batched_merge(self, schedule):  # pylint: disable=unused-argument
+        """test_batched_merge asserts that a batch of pull requests is merged with a single merge commit."""
+        self.enqueue_all()
+        self.assertEqual(process_queue(), 2)
+        commits = set(MergeQueueEntry.objects.values_list("commit_hash", flat=True))
+        self.assertEqual(len(commits), 1)
+        self.assertEqual(Branch.objects.get(name=self.default).hash, commits.pop())
+        self.assertEqual(Manufacturer.objects.filter(name__in=["m-queue-a", "m-queue-b"]).count(), 2)
+        self.assertFalse(Branch.objects.filter(name__startswith=MERGE_QUEUE_BATCH_PREFIX).exists())
+
+    @override_settings(PLUGINS_CONFIG={"nautobot_version_control": {"merge_queue_batch_size": 2}})
+    def test_deferred_batch_entry(self, schedule):  # pylint: disable=unused-argument
+        """test_deferred_batch_entry asserts that a pull request conflicting with its batch is merged on its own."""
+        Manufacturer.objects.create(name="m-shared", description="base")
+        Commit(message="commit m-shared").save(user=self.user)
+        self.pull_requests = [
+            self.make_pull_request(name, "m-shared", description=name) for name in ("queue-first", "queue-second")
+        ]
+        first, second = self.enqueue_all()
+
+        # the second is queued again, then fails its pre-check against the merged first
+        self.assertEqual(process_queue(), 2)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.state, MergeQueueEntry.MERGED)
+        self.assertEqual(second.state, MergeQueueEntry.FAILED)
+        self.assertIn("conflicts", second.error)
+        self.assertEqual(Manufacturer.objects.get(name="m-shared").description, "queue-first")
+        self.assertFalse(Branch.objects.filter(name__startswith=MERGE_QUEUE_BATCH_PREFIX).exists())
+
+    def test_precheck_error(self, schedule):  # pylint: disable=unused-argument
+        """test_precheck_error asserts that an unexpected pre-check error fails its entry without blocking the queue."""
+
+        def summary(src, dest):
+            if src.name == "queue-a":
+                raise RuntimeError("pre-check exploded")
+            return compute_merge_summary(src, dest)
+
+        first, second = self.enqueue_all()
+        with mock.patch("nautobot_version_control.merge_queue.compute_merge_summary", side_effect=summary):
+            self.assertEqual(process_queue(), 2)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.state, MergeQueueEntry.FAILED)
+        self.assertIn("pre-check exploded", first.error)
+        self.assertEqual(second.state, MergeQueueEntry.MERGED)
+        self.assertFalse(MergeQueueEntry.objects.filter(state=MergeQueueEntry.MERGING).exists())
+
+    def test_missing_destination(self, schedule):  # pylint: disable=unused-argument
+        """test_missing_destination asserts that entries into a deleted branch fail, and the queue moves on."""
+        PullRequest.objects.filter(pk=self.pull_requests[0].pk).update(destination_branch="queue-deleted")
+        self.pull_requests[0].refresh_from_db()
+        first, second = self.enqueue_all()
+
+        self.assertEqual(process_queue(), 2)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.state, MergeQueueEntry.FAILED)
+        self.assertIn("no longer exists", first.error)
+        self.assertEqual(second.state, MergeQueueEntry.MERGED)
+
+    def test_merging_entries_requeued(self, schedule):  # pylint: disable=unused-argument
+        """test_merging_entries_requeued asserts that only entries whose worker's heartbeat stopped are merged again."""
+        alive, dead = self.enqueue_all()
+        now = timezone.now()
+        MergeQueueEntry.objects.filter(pk=alive.pk).update(state=MergeQueueEntry.MERGING, heartbeat_at=now)
+        MergeQueueEntry.objects.filter(pk=dead.pk).update(
+            state=MergeQueueEntry.MERGING, heartbeat_at=now - timedelta(hours=1)
+        )
+
+        self.assertEqual(process_queue(), 1)
+        alive.refresh_from_db()
+        dead.refresh_from_db()
+        self.assertEqual(alive.state, MergeQueueEntry.MERGING)
+        self.assertEqual(dead.state, MergeQueueEntry.MERGED)
+
+    def test_conflicting_pull_request(self, schedule):  # pylint: disable=unused-argument
+        """test_conflicting_pull_request asserts that a pull request conflicting with main fails its pre-check."""
+        Manufacturer.objects.create(name="m-conflict", description="base")
+        Commit(message="commit m-conflict").save(user=self.user)
+        pull_request = self.make_pull_request("queue-conflict", "m-conflict", description="theirs")
+        Manufacturer.objects.filter(name="m-conflict").update(description="ours")
+        Commit(message="change m-conflict on main").save(user=self.user)
+        head = Branch.objects.get(name=self.default).hash
+
+        entry = enqueue_merge(pull_request, user=self.user)
+        self.assertEqual(process_queue(), 1)
+        entry.refresh_from_db()
+        pull_request.refresh_from_db()
+        self.assertEqual(entry.state, MergeQueueEntry.FAILED)
+        self.assertIn("conflicts", entry.error)
+        self.assertEqual(pull_request.state, PullRequest.OPEN)
+        self.assertEqual(Branch.objects.get(name=self.default).hash, head)
+
+        metrics = {family.name: family for family in metric_merge_queue()}
+        wait = metrics["nautobot_version_control_merge_queue_wait_seconds"]
+        self.assertEqual(
+            [(sample.name, sample.labels, sample.value) for sample in wait.samples if sample.name.endswith("_count")],
+            [("nautobot_version_control_merge_queue_wait_seconds_count", {"state": MergeQueueEntry.FAILED}, 1)],
+        )
@@ -0,0 +1,105 @@
+"""Tests for the retention policy of merge candidate branches."""
+
+from datetime import timedelta
+
+from django.utils import timezone
+
+from nautobot.users.models import User
+
+from nautobot_version_control.constants import DOLT_DEFAULT_BRANCH
+from nautobot_version_control.merge import MERGE_CANDIDATE_PREFIX
+from nautobot_version_control.models import Branch, MergeCandidate, PullRequest
+from nautobot_version_control.retention import collect_merge_candidates
+from nautobot_version_control.tests.test_doltapi import DoltTestCase
+
+
+class TestMergeCandidateRetention(DoltTestCase):
+    """TestMergeCandidateRetention tests the deletion of merge candidate branches."""
+
+    default = DOLT_DEFAULT_BRANCH
+
+    def setUp(self):
+        """setUp creates merge candidates for recent, old and closed pull requests, and one without metadata."""
+        self.user, _ = User.objects.get_or_create(username="retention-test", is_superuser=True)
+        for name, state in (("recent", PullRequest.OPEN), ("old", PullRequest.OPEN), ("closed", PullRequest.CLOSED)):
+            Branch(name=name, starting_branch=self.default).save()
+            PullRequest.objects.create(
+                title=name, state=state, source_branch=name, destination_branch=self.default, creator=self.user
+            )
+            self.make_candidate(name)
+        MergeCandidate.objects.filter(source_branch="old").update(built_at=timezone.now() - timedelta(days=30))
+        Branch(name=f"{MERGE_CANDIDATE_PREFIX}orphan--{self.default}", starting_branch=self.default).save()
+
+    def tearDown(self):
+        """tearDown is ran after every testcase."""
+        PullRequest.objects.all().delete()
+        MergeCandidate.objects.all().delete()
+        # Branch QuerySet deletes are not supported, delete branches individually.
+        for branch in Branch.objects.exclude(name=self.default):
+            branch.delete()
+
+    def make_candidate(self, src):
+        """Creates a merge candidate branch from `src` into main, and its metadata."""
+        name = f"{MERGE_CANDIDATE_PREFIX}{src}--{self.default}"
+        Branch(name=name, starting_branch=self.default).save()
+        head = Branch.objects.get(name=self.default).hash
+        MergeCandidate.objects.create(
+            branch=name,
+            source_branch=src,
+            destination_branch=self.default,
+            source_hash=head,
+            destination_hash=head,
+            built=True,
+        )
+        return name
+
+    def candidates(self):
+        """Returns the names of the merge candidate branches."""
+        return set(Branch.objects.filter(name__startswith=MERGE_CANDIDATE_PREFIX).values_list("name", flat=True))
+
+    def test_retention_policy(self):
+        """test_retention_policy asserts that old and closed merge candidates are deleted in batches, not orphans."""
+        recent = f"{MERGE_CANDIDATE_PREFIX}recent--{self.default}"
+        orphan = f"{MERGE_CANDIDATE_PREFIX}orphan--{self.default}"
+        dry_run = collect_merge_candidates(max_count=10, max_age=24 * 60 * 60, grace_period=0, dry_run=True)
+        self.assertEqual(len(dry_run["deleted"]), 2)
+        self.assertEqual(len(self.candidates()), 4)
+
+        result = collect_merge_candidates(max_count=10, max_age=24 * 60 * 60, grace_period=0, batch_size=2)
+        self.assertEqual(set(result["deleted"]), set(dry_run["deleted"]))
+        self.assertEqual(result["failed"], [])
+        self.assertIsNone(result["bytes"])
+        self.assertEqual(self.candidates(), {recent, orphan})
+        self.assertEqual(list(MergeCandidate.objects.values_list("branch", flat=True)), [recent])
+
+    def test_max_count(self):
+        """test_max_count asserts that no built merge candidate is kept with a max count of 0."""
+        collect_merge_candidates(max_count=0, max_age=None, grace_period=0)
+        self.assertEqual(self.candidates(), {f"{MERGE_CANDIDATE_PREFIX}orphan--{self.default}"})
+        self.assertFalse(MergeCandidate.objects.exists())
+
+    def test_grace_period(self):
+        """test_grace_period asserts that merge candidates built during the grace period are kept."""
+        collect_merge_candidates(max_count=0, max_age=None, grace_period=60 * 60)
+        self.assertEqual(
+            self.candidates(),
+            {f"{MERGE_CANDIDATE_PREFIX}{name}--{self.default}" for name in ("recent", "closed", "orphan")},
+        )
+        self.assertEqual(MergeCandidate.objects.count(), 2)
+
+    def test_partly_resolved(self):
+        """test_partly_resolved asserts that partly resolved merge candidates of open pull requests are kept."""
+        MergeCandidate.objects.update(resolving=True)
+        collect_merge_candidates(max_count=0, max_age=None, grace_period=0)
+        self.assertEqual(
+            self.candidates(),
+            {f"{MERGE_CANDIDATE_PREFIX}{name}--{self.default}" for name in ("recent", "old", "orphan")},
+        )
+
+    def test_not_built(self):
+        """test_not_built asserts that the branches of merge candidates not recorded as built are kept."""
+        old = f"{MERGE_CANDIDATE_PREFIX}old--{self.default}"
+        MergeCandidate.objects.filter(branch=old).update(built=False)
+        collect_merge_candidates(max_count=10, max_age=24 * 60 * 60, grace_period=0)
+        self.assertIn(old, self.candidates())
+        self.assertTrue(MergeCandidate.objects.filter(branch=old).exists())
@@ -0,0 +1,79 @@
+"""Tests for the database routing of the nautobot version control plugin."""
+
+from unittest import mock
+
+from django.db import connections
+from django.test import override_settings, SimpleTestCase
+
+from nautobot.dcim.models import Manufacturer
+from nautobot.extras.models import Job
+
+import nautobot_version_control
+from nautobot_version_control import is_versioned_model, register_versioned_models
+from nautobot_version_control.constants import GLOBAL_DB
+from nautobot_version_control.routers import GlobalStateRouter
+from nautobot_version_control.time_travel import branch_connections
+from nautobot_version_control.utils import active_branch, route_to_branch
+
+ALIAS_ROUTING = {"nautobot_version_control": {"branch_routing": "alias"}}
+
+
+class TestBranchAliasRouting(SimpleTestCase):
+    """TestBranchAliasRouting tests routing versioned models to a database alias per branch."""
+
+    def setUp(self):
+        """setUp is ran before every testcase."""
+        self.router = GlobalStateRouter()
+
+    def tearDown(self):
+        """tearDown is ran after every testcase."""
+        branch_connections.clear()
+
+    @override_settings(PLUGINS_CONFIG=ALIAS_ROUTING)
+    def test_versioned_models_use_branch_alias(self):
+        """test_versioned_models_use_branch_alias asserts that versioned models are routed without a checkout."""
+        with route_to_branch("feature"):
+            self.assertEqual(self.router.db_for_read(Manufacturer), "nautobot/feature")
+            self.assertEqual(self.router.db_for_write(Manufacturer), "nautobot/feature")
+            self.assertEqual(self.router.db_for_read(Job), GLOBAL_DB)
+            # the routed branch is known without a query
+            self.assertEqual(active_branch(), "feature")
+        self.assertEqual(connections.databases["nautobot/feature"]["NAME"], "nautobot/feature")
+        self.assertIsNone(self.router.db_for_read(Manufacturer))
+
+    @override_settings(PLUGINS_CONFIG=ALIAS_ROUTING)
+    def test_routing_mode_read_once(self):
+        """test_routing_mode_read_once asserts that routing to a registered alias doesn't read settings or evict."""
+        # the settings are read by the routing mode in utils, and by the alias pool in time_travel
+        read_routing = mock.patch("nautobot_version_control.utils.get_plugin_setting")
+        read_pool = mock.patch("nautobot_version_control.time_travel.get_plugin_setting")
+        with route_to_branch("feature"):
+            self.assertEqual(self.router.db_for_read(Manufacturer), "nautobot/feature")
+            with read_routing as utils_setting, read_pool as pool_setting:
+                with mock.patch.object(branch_connections, "_evict") as evict:
+                    self.assertEqual(self.router.db_for_read(Manufacturer), "nautobot/feature")
+        utils_setting.assert_not_called()
+        pool_setting.assert_not_called()
+        evict.assert_not_called()
+
+    def test_checkout_routing(self):
+        """test_checkout_routing asserts that versioned models use the checked out 'default' database by default."""
+        with route_to_branch("feature"):
+            self.assertIsNone(self.router.db_for_read(Manufacturer))
+
+
+class TestVersionedModelLookup(SimpleTestCase):
+    """TestVersionedModelLookup tests the compiled lookup of versioned models."""
+
+    def test_register_recompiles_lookup(self):
+        """test_register_recompiles_lookup asserts that registering models updates the compiled lookup."""
+        self.assertIs(nautobot_version_control.__VERSIONED_MODEL_LOOKUP__[Manufacturer], True)
+        self.assertIs(nautobot_version_control.__VERSIONED_MODEL_LOOKUP__[Job], False)
+
+        extras = nautobot_version_control.__VERSIONED_MODEL_REGISTRY___["extras"]
+        # restores the registry afterwards
+        with mock.patch.dict(nautobot_version_control.__VERSIONED_MODEL_REGISTRY___):
+            register_versioned_models({"extras": {**extras, "job": True}})
+            self.assertTrue(is_versioned_model(Job))
+        nautobot_version_control.compile_versioned_models()
+        self.assertFalse(is_versioned_model(Job))
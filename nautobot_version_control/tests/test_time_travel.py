@@ -0,0 +1,99 @@
+"""Tests for the time-travel database aliases of the nautobot version control plugin."""
+
+import threading
+from unittest import mock
+
+from django.db import connections
+from django.test import override_settings, SimpleTestCase
+
+from nautobot_version_control.metrics import metric_database_aliases
+from nautobot_version_control.time_travel import TimeTravelConnections
+
+
+@override_settings(
+    PLUGINS_CONFIG={"nautobot_version_control": {"time_travel_max_aliases": 2, "time_travel_idle_timeout": 60}}
+)
+class TestTimeTravelConnections(SimpleTestCase):
+    """TestTimeTravelConnections tests the eviction policy of time-travel aliases."""
+
+    hashes = [str(i) * 32 for i in range(3)]
+
+    def setUp(self):
+        """setUp is ran before every testcase."""
+        self.time_travel = TimeTravelConnections()
+
+    def tearDown(self):
+        """tearDown is ran after every testcase."""
+        self.time_travel.clear()
+
+    def test_lru_eviction(self):
+        """test_lru_eviction asserts that the least-recently-used alias is unregistered first."""
+        self.time_travel.alias(self.hashes[0])
+        self.time_travel.alias(self.hashes[1])
+        # touch the first alias, so the second becomes the least-recently-used alias
+        self.time_travel.alias(self.hashes[0])
+        self.time_travel.alias(self.hashes[2])
+
+        self.assertIn(self.hashes[0], connections.databases)
+        self.assertNotIn(self.hashes[1], connections.databases)
+        self.assertEqual(connections.databases[self.hashes[2]]["NAME"], f"nautobot/{self.hashes[2]}")
+        self.assertEqual(self.time_travel.stats(), {"aliases": 2, "hits": 1, "misses": 3, "evictions": 1})
+
+    def test_idle_eviction(self):
+        """test_idle_eviction asserts that aliases unused for the idle timeout are unregistered."""
+        with mock.patch("nautobot_version_control.time_travel.time.monotonic", return_value=0):
+            self.time_travel.alias(self.hashes[0])
+        with mock.patch("nautobot_version_control.time_travel.time.monotonic", return_value=61):
+            self.time_travel.alias(self.hashes[1])
+
+        self.assertNotIn(self.hashes[0], connections.databases)
+        self.assertIn(self.hashes[1], connections.databases)
+
+    def test_eviction_waits_for_holders(self):
+        """test_eviction_waits_for_holders asserts that an alias evicted while another thread holds it stays usable."""
+        opened, evicted, closed = threading.Event(), threading.Event(), threading.Event()
+        registered = []
+
+        def hold():
+            self.time_travel.alias(self.hashes[0])
+            opened.set()
+            evicted.wait(5)
+            # the thread can still look up the evicted alias
+            registered.append(self.hashes[0] in connections.databases)
+            self.time_travel.close_evicted()
+            closed.set()
+
+        thread = threading.Thread(target=hold)
+        thread.start()
+        opened.wait(5)
+        self.time_travel.alias(self.hashes[1])
+        self.time_travel.alias(self.hashes[2])
+        self.assertEqual(self.time_travel.stats()["evictions"], 1)
+        self.assertIn(self.hashes[0], connections.databases)
+        evicted.set()
+        closed.wait(5)
+        thread.join(5)
+        self.assertEqual(registered, [True])
+        self.assertNotIn(self.hashes[0], connections.databases)
+
+    def test_invalid_hash(self):
+        """test_invalid_hash asserts that branch names are rejected."""
+        with self.assertRaises(Exception):
+            self.time_travel.alias("main")
+
+    def test_alias_metrics(self):
+        """test_alias_metrics asserts that alias hits, misses and evictions are exported as metrics."""
+        with mock.patch("nautobot_version_control.metrics.time_travel", self.time_travel):
+            self.time_travel.alias(self.hashes[0])
+            self.time_travel.alias(self.hashes[0])
+            metrics = {family.name: family for family in metric_database_aliases()}
+
+        samples = {
+            (sample.name, sample.labels["kind"]): sample.value
+            for family in metrics.values()
+            for sample in family.samples
+        }
+        self.assertEqual(samples[("nautobot_version_control_database_aliases", "commit")], 1)
+        self.assertEqual(samples[("nautobot_version_control_database_alias_hits_total", "commit")], 1)
+        self.assertEqual(samples[("nautobot_version_control_database_alias_misses_total", "commit")], 1)
+        self.assertIn(("nautobot_version_control_database_alias_evictions_total", "branch"), samples)
@@ -0,0 +1,200 @@
+"""Time_travel.py manages the database aliases used to query the database as of a commit or branch."""
+
+from copy import deepcopy
+import threading
+import time
+
+from django.db import connections
+
+from nautobot_version_control.constants import DB_NAME
+from nautobot_version_control.utils import get_plugin_setting, is_commit_hash
+
+
+class TimeTravelConnections:
+    """
+    TimeTravelConnections registers a database alias for each commit that is queried, e.g. "nautobot/<hash>".
+
+    At most `time_travel_max_aliases` aliases are registered at once. The least-recently-used
+    alias is evicted when a new one is needed, as is any alias unused for `time_travel_idle_timeout`
+    seconds. Django connections are per-thread, so each thread closes its own connections to
+    evicted aliases the next time it registers an alias, or when its request finishes. An evicted
+    alias stays in `connections.databases` until every thread that opened it has closed it, so
+    that a thread still querying it doesn't lose its database.
+
+    Asking for an alias the thread already holds is on the path of every routed query, so it
+    neither takes the lock nor evicts aliases, and the settings are only read once.
+    """
+
+    max_aliases_setting = "time_travel_max_aliases"
+
+    def __init__(self):
+        """Inits the class vars."""
+        self._lock = threading.Lock()
+        # alias -> the time it was last used
+        self._aliases = {}
+        # the aliases each thread has opened connections for
+        self._opened = threading.local()
+        # the number of threads that opened each alias
+        self._holders = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._max_aliases = None
+        self._idle_timeout = None
+
+    @property
+    def max_aliases(self):
+        """Returns the maximum number of registered aliases."""
+        if self._max_aliases is None:
+            self._max_aliases = get_plugin_setting(self.max_aliases_setting)
+        return self._max_aliases
+
+    @property
+    def idle_timeout(self):
+        """Returns the number of seconds an unused alias stays registered."""
+        if self._idle_timeout is None:
+            self._idle_timeout = get_plugin_setting("time_travel_idle_timeout")
+        return self._idle_timeout
+
+    def load_settings(self, setting="PLUGINS_CONFIG", **kwargs):  # pylint: disable=unused-argument
+        """Reads the settings again on next use, connected to `setting_changed`."""
+        if setting == "PLUGINS_CONFIG":
+            self._max_aliases = None
+            self._idle_timeout = None
+
+    def alias(self, commit):
+        """Returns the database alias of `commit`, registering it if needed."""
+        revision = str(commit)
+        alias = self.alias_name(revision)
+        if alias in self._aliases and alias in self._opened_aliases():
+            # the time of last use is updated in place, evictions pick the least-recently-used
+            # alias by time. If the alias was evicted meanwhile, this thread still holds it and
+            # registers it again. Hits are counted without the lock, and may be undercounted.
+            self._aliases[alias] = time.monotonic()
+            self.hits += 1
+            return alias
+
+        self.validate(revision)
+        with self._lock:
+            if alias in self._aliases:
+                self.hits += 1
+            else:
+                self.misses += 1
+                if alias not in connections.databases:
+                    # an evicted alias is still registered while a thread holds it
+                    database = deepcopy(connections.databases["default"])
+                    database["id"] = alias
+                    database["NAME"] = f"{DB_NAME}/{revision}"
+                    connections.databases[alias] = database
+            self._aliases[alias] = time.monotonic()
+            opened = self._opened_aliases()
+            if alias not in opened:
+                opened.add(alias)
+                self._holders[alias] = self._holders.get(alias, 0) + 1
+        self.close_evicted()
+        return alias
+
+    @staticmethod
+    def validate(revision):
+        """Raises an exception if `revision` is not a commit hash."""
+        if not is_commit_hash(revision):
+            raise Exception("commit hash length is incorrect")
+
+    @staticmethod
+    def alias_name(revision):
+        """Returns the database alias of a revision."""
+        return revision
+
+    def close_evicted(self, **kwargs):  # pylint: disable=unused-argument
+        """Closes the current thread's connections to evicted aliases, also connected to `request_finished`."""
+        with self._lock:
+            self._evict()
+            opened = self._opened_aliases()
+            evicted = {alias for alias in opened if alias not in self._aliases}
+        for alias in evicted:
+            self._close(alias)
+
+    def _close(self, alias):
+        """Closes the current thread's connection to an alias, unregistering it once no thread holds it."""
+        connection = getattr(connections._connections, alias, None)  # pylint: disable=protected-access
+        if connection is not None:
+            if connection.in_atomic_block:
+                # don't break a transaction, close the connection once it is done
+                return
+            connection.close()
+            del connections[alias]
+        self._opened_aliases().discard(alias)
+        with self._lock:
+            holders = self._holders.pop(alias, 1) - 1
+            if holders > 0:
+                self._holders[alias] = holders
+            elif alias not in self._aliases:
+                connections.databases.pop(alias, None)
+
+    def stats(self):
+        """Returns the number of registered aliases, hits, misses and evictions."""
+        return {
+            "aliases": len(self._aliases),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def clear(self):
+        """Evicts every alias."""
+        with self._lock:
+            for alias in list(self._aliases):
+                self._remove(alias)
+        self.close_evicted()
+
+    def _opened_aliases(self):
+        if not hasattr(self._opened, "aliases"):
+            self._opened.aliases = set()
+        return self._opened.aliases
+
+    def _evict(self):
+        """Evicts idle aliases, then the least-recently-used aliases over the limit. Must hold the lock."""
+        idle_since = time.monotonic() - self.idle_timeout
+        # hits update the time of last use without the lock, iterate over a copy
+        last_used = dict(self._aliases)
+        for alias, used in list(last_used.items()):
+            if used < idle_since:
+                self._remove(alias)
+                del last_used[alias]
+        while last_used and len(self._aliases) > self.max_aliases:
+            alias = min(last_used, key=last_used.get)
+            self._remove(alias)
+            del last_used[alias]
+
+    def _remove(self, alias):
+        self._aliases.pop(alias, None)
+        if not self._holders.get(alias):
+            # otherwise unregistered by the last thread holding it, see `_close`
+            connections.databases.pop(alias, None)
+        self.evictions += 1
+
+
+class BranchConnections(TimeTravelConnections):
+    """
+    BranchConnections registers a database alias for each branch that is queried, e.g. "nautobot/<branch>".
+
+    Queries on a branch alias read and write the branch without checking it out, see the
+    "alias" `branch_routing` mode. At most `branch_max_aliases` aliases are registered at once.
+    """
+
+    max_aliases_setting = "branch_max_aliases"
+
+    @staticmethod
+    def validate(revision):
+        """Raises an exception if `revision` is not a branch name."""
+        if not revision:
+            raise ValueError("branch name is empty")
+
+    @staticmethod
+    def alias_name(revision):
+        """Returns the database alias of a branch, unlike commit hash aliases it contains a slash."""
+        return f"{DB_NAME}/{revision}"
+
+
+time_travel = TimeTravelConnections()
+branch_connections = BranchConnections()
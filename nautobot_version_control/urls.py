@@ -54,6 +54,11 @@ urlpatterns = [
     ),
     # Diffs
     path("diffs/", views.ActiveBranchDiffs.as_view(), name="active_branch_diffs"),
+    path(
+        "diffs/<str:from_commit>/<str:to_commit>/<str:app_label>/<str:model>/",
+        views.DiffTableView.as_view(),
+        name="diff_table",
+    ),
     # Pull Requests
     path("pull-request/", views.PullRequestListView.as_view(), name="pull_request_list"),
     path(
@@ -91,6 +96,11 @@ urlpatterns = [
         views.PullRequestConflictView.as_view(),
         name="pull_request_conflicts",
     ),
+    path(
+        "pull-request/<str:pk>/conflicts/resolve",
+        views.PullRequestResolveConflictsView.as_view(),
+        name="pull_request_resolve",
+    ),
     path(
         "pull-request/<str:pk>/reviews",
         views.PullRequestReviewListView.as_view(),
@@ -1,12 +1,27 @@
 """Utility methods used throughout the plugin."""
 
 
+from collections import namedtuple
 from contextlib import contextmanager
-from copy import deepcopy
+from contextvars import ContextVar
 
-from django.db import connection, connections
+from django.conf import settings
+from django.db import connection, DEFAULT_DB_ALIAS
 
-from nautobot_version_control.constants import DB_NAME, DOLT_BRANCH_KEYWORD
+from nautobot_version_control.constants import DOLT_BRANCH_KEYWORD, PLUGIN_NAME
+
+
+# the active branch of the request being served, set by `DoltBranchMiddleware`. In the
+# "alias" `branch_routing` mode, versioned models are also routed to this branch.
+_active_branch = ContextVar("nautobot_version_control_active_branch", default=None)
+
+# whether versioned models are routed to a database alias per branch, read from the
+# `branch_routing` setting once the app is ready rather than on every routed query.
+_ROUTES_BY_BRANCH_ALIAS = None
+
+# the row returned by `CALL dolt_merge(...)`: the new head, whether the merge
+# fast-forwarded, the number of conflicts, and a message.
+DoltMergeResult = namedtuple("DoltMergeResult", ["hash", "fast_forward", "conflicts", "message"])
 
 
 class DoltError(Exception):
@@ -29,6 +44,37 @@ def author_from_user(user):
     return "unknown <unknown@nautobot.invalid>"
 
 
+def get_plugin_setting(name):
+    """Returns a setting from `PLUGINS_CONFIG`, falling back to the plugin's default value."""
+    plugin_settings = settings.PLUGINS_CONFIG.get(PLUGIN_NAME, {})
+    if name in plugin_settings:
+        return plugin_settings[name]
+    from nautobot_version_control import config  # pylint: disable=import-outside-toplevel
+
+    return config.default_settings[name]
+
+
+def is_commit_hash(value):
+    """Returns `True` if `value` looks like a Dolt commit hash rather than a branch name."""
+    # Dolt commit hashes are 32 characters of base32 (0-9, a-v)
+    cm_hash = str(value)
+    return len(cm_hash) == 32 and set(cm_hash) <= set("0123456789abcdefghijklmnopqrstuv")
+
+
+def is_branch_name(*names):
+    """Returns `True` if a branch is named after any of `names`, even names that look like commit hashes."""
+    names = [str(name) for name in names]
+    with connection.cursor() as cursor:
+        placeholders = ", ".join(["%s"] * len(names))
+        cursor.execute(f"SELECT 1 FROM dolt_branches WHERE name IN ({placeholders}) LIMIT 1", names)
+        return cursor.fetchone() is not None
+
+
+def dolt_merge_result(cursor):
+    """Returns the result of the `CALL dolt_merge(...)` last executed on `cursor` as a DoltMergeResult."""
+    return DoltMergeResult(*cursor.fetchone()[: len(DoltMergeResult._fields)])
+
+
 def is_dolt_model(model):
     """Returns `True` if `instance` is an instance of a model from the Dolt plugin."""
     app_label = model._meta.app_label
@@ -42,8 +88,59 @@ def alter_session_branch(sess=None, branch=None):
     sess[DOLT_BRANCH_KEYWORD] = branch
 
 
+def load_branch_routing(setting="PLUGINS_CONFIG", **kwargs):  # pylint: disable=unused-argument
+    """Reads the `branch_routing` setting, called when the app is ready and connected to `setting_changed`."""
+    global _ROUTES_BY_BRANCH_ALIAS  # pylint: disable=global-statement
+    if setting == "PLUGINS_CONFIG":
+        _ROUTES_BY_BRANCH_ALIAS = get_plugin_setting("branch_routing") == "alias"
+
+
+def routes_by_branch_alias():
+    """Returns `True` if versioned models are routed to a database alias per branch, rather than checked out."""
+    if _ROUTES_BY_BRANCH_ALIAS is None:
+        load_branch_routing()
+    return _ROUTES_BY_BRANCH_ALIAS
+
+
+def routed_branch():
+    """Returns the branch that versioned models are routed to, or `None` if they use the "default" database."""
+    if not routes_by_branch_alias():
+        return None
+    return _active_branch.get()
+
+
+def set_active_branch(branch):
+    """Sets the active branch of the current request, returns a token for `reset_active_branch`."""
+    return _active_branch.set(str(branch) if branch else None)
+
+
+def reset_active_branch(token):
+    """Restores the active branch from before `set_active_branch`."""
+    _active_branch.reset(token)
+
+
+@contextmanager
+def route_to_branch(branch):
+    """Sets the active branch, and routes versioned models to it in the "alias" mode, for the duration of the block."""
+    token = set_active_branch(branch)
+    try:
+        yield
+    finally:
+        reset_active_branch(token)
+
+
+def active_branch_db():
+    """Returns the database alias that versioned models are routed to."""
+    branch = routed_branch()
+    return db_for_branch(branch) if branch else DEFAULT_DB_ALIAS
+
+
 def active_branch():
     """Returns the current active_branch from dolt."""
+    # within a request, the branch checked out by `DoltBranchMiddleware` is known without a query
+    branch = _active_branch.get()
+    if branch:
+        return branch
     with connection.cursor() as cursor:
         cursor.execute("SELECT active_branch();")
         return cursor.fetchone()[0]
@@ -51,22 +148,35 @@ def active_branch():
 
 def db_for_commit(commit):
     """Uses "database-revision" syntax adds a database entry for the commit e.g. "nautobot/3a5mqdgao8029bf8ji0huobbskq1n1l5"."""
-    cm_hash = str(commit)
-    if len(cm_hash) != 32:
-        raise Exception("commit hash length is incorrect")
-    database = deepcopy(connections.databases["default"])
-    database["id"] = cm_hash
-    database["NAME"] = f"{DB_NAME}/{cm_hash}"
-    connections.databases[cm_hash] = database
-    return cm_hash
+    from nautobot_version_control.time_travel import time_travel  # pylint: disable=import-outside-toplevel
+
+    return time_travel.alias(commit)
+
+
+def note_checkout(branch):
+    """Updates the active branch of the current request, if any, after `branch` was checked out."""
+    if _active_branch.get():
+        _active_branch.set(str(branch))
+
+
+def db_for_branch(branch):
+    """Uses "database-revision" syntax adds a database entry for the branch e.g. "nautobot/my-branch"."""
+    from nautobot_version_control.time_travel import branch_connections  # pylint: disable=import-outside-toplevel
+
+    return branch_connections.alias(branch)
 
 
 @contextmanager
 def query_on_branch(branch):
     """Checkout to another branch, runs a query, and checkouts back to main."""
     # TODO: remove in favor of db_for_commit
+    if routes_by_branch_alias():
+        with route_to_branch(branch):
+            yield
+        return
     with connection.cursor() as cursor:
         prev = active_branch()
         cursor.execute(f"""CALL dolt_checkout("{branch}");""")  # TODO: not safe
-        yield
+        with route_to_branch(branch):
+            yield
         cursor.execute(f"""CALL dolt_checkout("{prev}");""")  # TODO: not safe
@@ -2,10 +2,13 @@
 
 from datetime import datetime
 import logging
+from urllib.parse import urlencode
 
 from django.contrib import messages
 from django.contrib.contenttypes.models import ContentType
-from django.http import JsonResponse
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import EmptyPage, PageNotAnInteger
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, get_list_or_404, render, redirect
 from django.urls import reverse
 from django.utils.safestring import mark_safe
@@ -16,10 +19,19 @@ from nautobot.dcim.models.locations import Location
 from nautobot.core.forms import ConfirmationForm
 from nautobot.core.utils.permissions import get_permission_for_model
 from nautobot.core.views.mixins import GetReturnURLMixin, ObjectPermissionRequiredMixin
+from nautobot.core.views.paginator import EnhancedPaginator, get_paginate_count
 
-from nautobot_version_control import diffs, filters, forms, merge, tables
+from nautobot_version_control import diffs, filters, forms, merge, merge_queue, resolution, tables
+from nautobot_version_control.catalogue import catalogue
 from nautobot_version_control.constants import DOLT_DEFAULT_BRANCH
-from nautobot_version_control.utils import alter_session_branch, db_for_commit, active_branch
+from nautobot_version_control.utils import (
+    alter_session_branch,
+    db_for_commit,
+    active_branch,
+    DoltError,
+    get_plugin_setting,
+    is_commit_hash,
+)
 from nautobot_version_control.models import (
     Branch,
     BranchMeta,
@@ -90,7 +102,7 @@ class BranchView(DoltObjectView):
     def get_extra_context(self, request, instance):  # pylint: disable=W0613,C0116 # noqa: D102
         merge_base = Commit.merge_base(DOLT_DEFAULT_BRANCH, instance.name)
         head = instance.hash
-        return {"results": diffs.two_dot_diffs(from_commit=merge_base, to_commit=head)}
+        return {"results": diffs.diff_summaries(from_commit=merge_base, to_commit=head)}
 
 
 class BranchListView(generic.ObjectListView):
@@ -246,6 +258,15 @@ class BranchBulkDeleteView(generic.BulkDeleteView):
 #
 
 
+def conflict_page_params(request):
+    """Returns the table, and the cursors of the pages of its conflicts and violations, requested in the query."""
+    return {
+        "table": request.GET.get("table"),
+        "conflicts_after": request.GET.get("conflicts_after"),
+        "violations_after": request.GET.get("violations_after"),
+    }
+
+
 class BranchMergeFormView(GetReturnURLMixin, View):
     """BranchMergeFormView is used to confirm a merge."""
 
@@ -319,8 +340,8 @@ class BranchMergePreView(GetReturnURLMixin, View):
         merge_base_c = Commit.merge_base(src, dest)
         source_head = src.hash
         return {
-            "results": diffs.two_dot_diffs(from_commit=merge_base_c, to_commit=source_head),
-            "conflicts": merge.get_conflicts_for_merge(src, dest),
+            "results": diffs.diff_summaries(from_commit=merge_base_c, to_commit=source_head),
+            "conflicts": merge.get_conflicts_for_merge(src, dest, **conflict_page_params(request)),
             "back_btn_url": reverse("plugins:nautobot_version_control:branch_merge", args=[src.name]),
         }
 
@@ -343,7 +364,7 @@ class CommitView(DoltObjectView):
         instance = self.queryset.using(database).get(commit_hash=anc.commit_hash)
 
         if anc.parent_hash:
-            diff = diffs.two_dot_diffs(from_commit=anc.parent_hash, to_commit=instance)
+            diff = diffs.diff_summaries(from_commit=anc.parent_hash, to_commit=instance)
         else:
             # init commit has no parents
             diff = {}
@@ -485,6 +506,38 @@ class ActiveBranchDiffs(View):
         )
 
 
+class DiffTableView(View):
+    """DiffTableView renders one page of the diff rows of a single model between a from and to commit."""
+
+    template_name = "nautobot_version_control/diff_table.html"
+
+    def get(self, request, *args, **kwargs):  # pylint: disable=W0613,C0116 # noqa: D102
+        content_type = get_object_or_404(ContentType, app_label=kwargs["app_label"], model=kwargs["model"])
+        if not catalogue.diff_table(content_type.model_class()):
+            raise Http404(f"{content_type} can't be diffed")
+        if not request.user.has_perm(get_permission_for_model(content_type.model_class(), "view")):
+            raise PermissionDenied()
+        for commit in (kwargs["from_commit"], kwargs["to_commit"]):
+            if not is_commit_hash(commit):
+                raise Http404(f"{commit} is not a commit hash")
+        diff = diffs.table_diff(content_type, kwargs["from_commit"], kwargs["to_commit"])
+        if not diff:
+            raise Http404(f"no diffs found for {content_type}")
+
+        table = diff["table"]
+        # rows are always ordered by primary key
+        table.orderable = False
+        try:
+            table.paginate(
+                paginator_class=EnhancedPaginator,
+                page=request.GET.get("page", 1),
+                per_page=get_paginate_count(request),
+            )
+        except (EmptyPage, PageNotAnInteger) as err:
+            raise Http404(str(err)) from err
+        return render(request, self.template_name, {"table": table})
+
+
 class DiffDetailView(View):
     """DiffDetailView is used to render complex diff between a from and to commit."""
 
@@ -639,12 +692,16 @@ class PullRequestBase(DoltObjectView):
 
     def get_extra_context(self, request, obj, **kwargs):  # pylint: disable=W0613,C0116,W0237 # noqa: D102
         src, dest = obj.get_src_dest_branches()
+        # `None` while the merge candidate is computed in the background
+        summary = merge.get_merge_summary(src, dest)
         return {
             "counts": {
-                "num_conflicts": merge.get_conflicts_count_for_merge(src, dest),
+                "num_conflicts": summary["conflicts"] + summary["violations"] if summary is not None else None,
                 "num_reviews": obj.num_reviews,
                 "num_commits": obj.num_commits,
-            }
+            },
+            # the latest attempt to merge the pull request through the merge queue
+            "merge_queue_entry": obj.merge_queue_entries.order_by("-id").first(),
         }
 
 
@@ -660,7 +717,7 @@ class PullRequestDiffView(PullRequestBase):
         ctx.update(
             {
                 "active_tab": "diffs",
-                "results": diffs.two_dot_diffs(from_commit=merge_base, to_commit=head),
+                "results": diffs.diff_summaries(from_commit=merge_base, to_commit=head),
             }
         )
         return ctx
@@ -673,17 +730,70 @@ class PullRequestConflictView(PullRequestBase):
 
     def get_extra_context(self, request, obj, **kwargs):  # pylint: disable=W0613,C0116 # noqa: D102
         ctx = super().get_extra_context(request, obj, **kwargs)
-        src = Branch.objects.get(name=obj.source_branch)
-        dest = Branch.objects.get(name=obj.destination_branch)
+        computing = ctx["counts"]["num_conflicts"] is None
+        conflicts = {}
+        if not computing:
+            src = Branch.objects.get(name=obj.source_branch)
+            dest = Branch.objects.get(name=obj.destination_branch)
+            conflicts = merge.get_conflicts_for_merge(src, dest, resolvable=True, **conflict_page_params(request))
         ctx.update(
             {
                 "active_tab": "conflicts",
-                "conflicts": merge.get_conflicts_for_merge(src, dest),
+                "computing": computing,
+                "conflicts": conflicts,
+                "resolve_url": reverse("plugins:nautobot_version_control:pull_request_resolve", args=[obj.pk]),
             }
         )
         return ctx
 
 
+class PullRequestResolveConflictsView(generic.ObjectEditView):
+    """PullRequestResolveConflictsView resolves the conflicts of a pull request in bulk."""
+
+    queryset = PullRequest.objects.all()
+
+    def get(self, request, pk):  # pylint: disable=W0613,C0116,W0221 # noqa: D102
+        return redirect("plugins:nautobot_version_control:pull_request_conflicts", pk=pk)
+
+    def post(self, request, pk):  # pylint: disable=W0221 # noqa: D102
+        pull_request = get_object_or_404(self.queryset, pk=pk)
+        conflicts_url = reverse("plugins:nautobot_version_control:pull_request_conflicts", args=[pull_request.pk])
+        if pull_request.state != PullRequest.OPEN:
+            messages.error(request, f"""Pull request "{pull_request}" is not open, its conflicts can't be resolved.""")
+            return redirect(conflicts_url)
+
+        # e.g. "theirs" resolves the selected conflicts, "theirs-table" every conflict of the table
+        take, _, scope = request.POST.get("resolve", "").partition("-")
+        table = request.POST.get("table", "")
+        return_url = f"{conflicts_url}?{urlencode({'table': table})}"
+        keys = None if scope == "table" else request.POST.getlist("key")
+        if keys == []:
+            messages.warning(request, "No conflicts were selected.")
+            return redirect(return_url)
+
+        src, dest = pull_request.get_src_dest_branches()
+        try:
+            resolutions = [{"table": table, "take": take, "keys": keys}]
+            result = resolution.resolve_conflicts(src, dest, resolutions, user=request.user)
+        except DoltError as err:
+            messages.error(request, str(err))
+            return redirect(return_url)
+
+        num_resolved = sum(result["resolved"].values())
+        if result["commit"]:
+            messages.success(
+                request,
+                f"""Resolved {num_resolved} conflicts, "{src}" now includes the resolved merge of "{dest}".""",
+            )
+        else:
+            messages.info(
+                request,
+                f"Resolved {num_resolved} conflicts, {result['conflicts']} conflicts "
+                f"and {result['violations']} violations are left.",
+            )
+        return redirect(return_url)
+
+
 class PullRequestReviewListView(PullRequestBase):
     """PullRequestReviewListView renders a list of pull requests."""
 
@@ -823,8 +933,8 @@ class PullRequestMergeView(generic.ObjectEditView):
                 "pull_request": pull_request,
                 "form": self.form,
                 "return_url": pull_request.get_absolute_url(),
-                "conflicts": merge.get_conflicts_for_merge(src, dest),
-                "diffs": diffs.three_dot_diffs(from_commit=dest.hash, to_commit=src.hash),
+                "conflicts": merge.get_conflicts_for_merge(src, dest, **conflict_page_params(request)),
+                "diffs": diffs.diff_summaries(from_commit=Commit.merge_base(dest.hash, src.hash), to_commit=src.hash),
             },
         )
 
@@ -836,6 +946,20 @@ class PullRequestMergeView(generic.ObjectEditView):
             squash_param = True
 
         if form.is_valid():
+            if get_plugin_setting("merge_queue"):
+                try:
+                    entry = merge_queue.enqueue_merge(pull_request, user=request.user, squash=squash_param)
+                except DoltError as err:
+                    messages.error(request, str(err))
+                    return redirect("plugins:nautobot_version_control:pull_request", pk=pull_request.pk)
+                position = entry.position
+                status = f"is number {position} in the merge queue" if position else "is being merged"
+                messages.success(
+                    request,
+                    mark_safe(f"""Pull Request <strong>"{pull_request}"</strong> {status}."""),
+                )
+                return redirect("plugins:nautobot_version_control:pull_request", pk=pull_request.pk)
+
             pull_request.merge(user=request.user, squash=squash_param)
             messages.success(
                 request,